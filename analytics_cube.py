@@ -0,0 +1,445 @@
+"""
+Outcome analytics cube over historical cases
+
+Every case is reduced to dictionary-encoded codes for the cube's dimensions
+(court, case type, judge, filing year), an outcome code and the days from
+filing to judgment. The cube keeps one row per observed combination of
+dimension codes, with NumPy columns for case, pending and per-outcome
+counts and time-to-judgment sums and a histogram. A query masks cells by
+code and groups them with np.unique and bincount, so its cost depends on
+the number of cells, not cases.
+
+Refresh is incremental: new and changed cases are queued as signed deltas
+(a changed case retracts its previous facts) and folded into the cells on
+the next query. The cube is a read-model view on the cases collection;
+deletes and change-stream reloads schedule a rebuild from the source, run
+in the background at most every REBUILD_INTERVAL seconds while the
+previous snapshot keeps serving. The first build runs the same way, so
+queries see an empty cube (plus live cases) until it is in.
+"""
+
+import datetime
+import logging
+import threading
+import time
+
+import numpy as np
+
+import tracing
+from case_data import CASES_CSV, iter_case_rows
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('court', 'case_type', 'judge', 'year')
+UNKNOWN = 'Unknown'
+# Left edges (days) of the time-to-judgment histogram; the last bin is open-ended
+DAY_BINS = np.array([0, 15, 30, 45, 60, 90, 120, 150, 180, 240, 300, 365, 455, 545, 730, 910, 1095, 1460,
+                     1825, 2555, 3650])
+REBUILD_INTERVAL = 600
+
+
+class Dictionary:
+    """Maps dimension values to dense integer codes in order of first appearance"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        return self.codes.get(value)
+
+
+def _date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.datetime.strptime(str(value)[:10], '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
+def case_facts(record):
+    """(case key, court, case type, judge, filing year, outcome or None, days to judgment or None)
+
+    Accepts cases.csv rows and cases collection documents.
+    """
+    if 'case_number' in record or 'details' in record:
+        details = record.get('details') or {}
+        key = record.get('case_number')
+        court, case_type, judge = details.get('court_name'), record.get('case_type'), details.get('judge_name')
+        filed, decided, outcome = record.get('filing_date'), record.get('judgment_date'), record.get('outcome')
+    else:
+        key = record.get('Case ID')
+        court, case_type, judge = record.get('Court Name'), record.get('Case Type'), record.get('Judge Name')
+        filed, decided, outcome = record.get('Date Filed'), record.get('Date of Judgment'), record.get('Case Outcome')
+    filed, decided = _date(filed), _date(decided)
+    days = (decided - filed).days if filed and decided and decided >= filed else None
+    return (str(key or '').strip(), court or UNKNOWN, case_type or UNKNOWN, judge or UNKNOWN,
+            filed.year if filed else 0, outcome or None, days)
+
+
+class _Cells:
+    """Immutable cube state: one row per observed dimension combination"""
+
+    def __init__(self, codes, cases, outcomes, timed, days_sum, days_squares, histogram):
+        self.codes = codes                # cells x len(DIMENSIONS), dictionary codes
+        self.cases = cases                # cells
+        self.outcomes = outcomes          # cells x outcomes seen so far
+        self.timed = timed                # cells, decided cases with both dates
+        self.days_sum = days_sum
+        self.days_squares = days_squares
+        self.histogram = histogram        # cells x len(DAY_BINS)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, len(DIMENSIONS)), dtype=np.int64), np.zeros(0), np.zeros((0, 0)), np.zeros(0),
+                   np.zeros(0), np.zeros(0), np.zeros((0, len(DAY_BINS))))
+
+    def __len__(self):
+        return len(self.cases)
+
+
+class _Snapshot:
+    """Cells together with the dictionaries their codes were assigned from, swapped in as one"""
+
+    def __init__(self, cells, dictionaries, outcome_names):
+        self.cells = cells
+        self.dictionaries = dictionaries  # dimension -> (value -> code, values by code)
+        self.outcome_names = outcome_names
+
+    @classmethod
+    def empty(cls):
+        return cls(_Cells.empty(), {dimension: ({}, []) for dimension in DIMENSIONS}, [])
+
+
+class OutcomeCube:
+    """Court x case type x judge x year aggregates of outcomes and time to judgment"""
+
+    def __init__(self, source=None, rebuild_interval=REBUILD_INTERVAL):
+        # source() yields cases.csv rows or cases documents for a full rebuild
+        self.source = source
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._reset()
+        self._stale = source is not None
+        self._rebuilding = False
+        self._rebuilt_at = None
+        # Cases added while a rebuild reads the source, counted again into the rebuilt cube
+        self._replay = None
+
+    def _reset(self):
+        self.dictionaries = {dimension: Dictionary() for dimension in DIMENSIONS}
+        self.outcome_names = Dictionary()
+        # case key -> the facts it currently contributes, so an update can retract them
+        self._facts = {}
+        self._deltas = []
+        self._cells = _Cells.empty()
+        self._snapshot = _Snapshot.empty()
+
+    def __len__(self):
+        return len(self._facts)
+
+    # Ingestion
+
+    def add(self, record):
+        """Count a case, replacing what it contributed before if it was already counted"""
+        key, *values = case_facts(record)
+        with self._lock:
+            self._add(key, values)
+            if self._replay is not None:
+                self._replay.append((key, values))
+
+    def _add(self, key, values):
+        court, case_type, judge, year, outcome, days = values
+        facts = (tuple(self.dictionaries[dimension].encode(value) for dimension, value in
+                       zip(DIMENSIONS, (court, case_type, judge, year))),
+                 -1 if outcome is None else self.outcome_names.encode(outcome),
+                 -1 if days is None else days)
+        previous = self._facts.get(key) if key else None
+        if previous == facts:
+            return
+        if previous is not None:
+            self._deltas.append((-1,) + previous)
+        if key:
+            self._facts[key] = facts
+        self._deltas.append((1,) + facts)
+
+    # Read-model view interface
+
+    def apply(self, doc):
+        self.add(doc)
+
+    def remove(self, doc_id):
+        self._stale = self.source is not None
+
+    def clear(self):
+        self._stale = self.source is not None
+
+    def resync(self):
+        # Polling already delivers new cases through apply(); recounting every case each minute is not worth it
+        pass
+
+    # Refresh
+
+    def refresh(self):
+        """Fold queued deltas into the cells; returns the current snapshot"""
+        with self._refresh_lock:
+            with self._lock:
+                deltas, self._deltas = self._deltas, []
+                if not deltas:
+                    return self._snapshot
+                # Every code in the cells and the deltas is in the dictionaries as they are now
+                dictionaries = {dimension: (dict(self.dictionaries[dimension].codes),
+                                            list(self.dictionaries[dimension].values)) for dimension in DIMENSIONS}
+                outcome_names = list(self.outcome_names.values)
+                cells = self._cells
+            sizes = tuple(len(dictionaries[dimension][1]) for dimension in DIMENSIONS)
+            with tracing.span('analytics_cube.refresh', deltas=len(deltas), cells=len(cells)):
+                cells = self._merge(cells, deltas, sizes, len(outcome_names))
+            snapshot = _Snapshot(cells, dictionaries, outcome_names)
+            with self._lock:
+                self._cells = cells
+                self._snapshot = snapshot
+            return snapshot
+
+    @staticmethod
+    def _merge(cells, deltas, sizes, outcome_count):
+        started = time.perf_counter()
+        signs = np.fromiter((d[0] for d in deltas), dtype=np.float64, count=len(deltas))
+        codes = np.array([d[1] for d in deltas], dtype=np.int64).reshape(-1, len(DIMENSIONS))
+        outcomes = np.fromiter((d[2] for d in deltas), dtype=np.int64, count=len(deltas))
+        days = np.fromiter((d[3] for d in deltas), dtype=np.int64, count=len(deltas))
+
+        # Cell keys under the current dictionary sizes; existing cells are unique among themselves
+        all_codes = np.concatenate([cells.codes, codes])
+        keys = np.ravel_multi_index(all_codes.T, sizes) if len(all_codes) else np.zeros(0, dtype=np.int64)
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        count = len(unique)
+        old, new = inverse[:len(cells)], inverse[len(cells):]
+
+        def combine(existing, values, mask=None, width=None):
+            # Existing cell measures plus the deltas' signed contributions, per merged cell
+            if width is None:
+                merged = np.zeros(count)
+                merged[old] = existing
+                merged += np.bincount(new[mask] if mask is not None else new,
+                                      weights=signs[mask] * values[mask] if mask is not None else signs * values,
+                                      minlength=count)
+                return merged
+            merged = np.zeros((count, width))
+            merged[old, :existing.shape[1]] = existing
+            flat = new[mask] * width + values[mask]
+            merged += np.bincount(flat, weights=signs[mask], minlength=count * width).reshape(count, width)
+            return merged
+
+        decided = outcomes >= 0
+        timed = days >= 0
+        bins = np.searchsorted(DAY_BINS, np.maximum(days, 0), side='right') - 1
+        merged = _Cells(
+            codes=all_codes[first],
+            cases=combine(cells.cases, np.ones(len(deltas))),
+            outcomes=combine(cells.outcomes, outcomes, decided, width=max(outcome_count, 1)),
+            timed=combine(cells.timed, np.ones(len(deltas)), timed),
+            days_sum=combine(cells.days_sum, days.astype(np.float64), timed),
+            days_squares=combine(cells.days_squares, days.astype(np.float64) ** 2, timed),
+            histogram=combine(cells.histogram, bins, timed, width=len(DAY_BINS))
+        )
+        live = merged.cases > 0
+        if not live.all():
+            merged = _Cells(*(column[live] for column in (merged.codes, merged.cases, merged.outcomes, merged.timed,
+                                                          merged.days_sum, merged.days_squares, merged.histogram)))
+        logger.debug("Analytics cube merged %d deltas into %d cells in %.1f ms",
+                     len(deltas), len(merged), (time.perf_counter() - started) * 1000)
+        return merged
+
+    def rebuild(self):
+        """Recount every case from the source into a new cube, then swap it in"""
+        started = time.perf_counter()
+        self._stale = False
+        self._rebuilt_at = time.monotonic()
+        with self._lock:
+            self._replay = []
+        fresh = OutcomeCube()
+        try:
+            for record in self.source():
+                fresh.add(record)
+        except BaseException:
+            with self._lock:
+                self._replay = None
+            raise
+        snapshot = fresh.refresh()
+        with self._refresh_lock, self._lock:
+            # The source may have been read before these arrived; they are folded in on the next refresh
+            for key, values in self._replay:
+                fresh._add(key, values)
+            self._replay = None
+            for name in ('dictionaries', 'outcome_names', '_facts', '_deltas', '_cells', '_snapshot'):
+                setattr(self, name, getattr(fresh, name))
+        logger.info("Analytics cube built from %d cases (%d cells) in %.2fs",
+                    len(fresh), len(snapshot.cells), time.perf_counter() - started)
+        return snapshot
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            logger.error("Analytics cube rebuild failed: %s", e)
+        finally:
+            self._rebuilding = False
+
+    def start(self):
+        """Build the cube in the background so the first queries do not wait for it"""
+        self.snapshot()
+        return self
+
+    def snapshot(self):
+        """Current snapshot with queued deltas folded in; a stale cube is rebuilt in the background"""
+        with self._lock:
+            rebuild = self._stale and not self._rebuilding and (
+                self._rebuilt_at is None or time.monotonic() - self._rebuilt_at >= self.rebuild_interval)
+            if rebuild:
+                self._rebuilding = True
+        if rebuild:
+            tracing.start_thread(self._background_rebuild, name='analytics-cube-rebuild')
+        return self.refresh()
+
+    # Queries
+
+    def dimensions(self):
+        """Every value of each dimension, for building drill-down filters"""
+        snapshot = self.snapshot()
+        values = {dimension: sorted(v, key=lambda x: (x == 0, x) if dimension == 'year' else str(x).lower())
+                  for dimension, (_, v) in snapshot.dictionaries.items()}
+        values['outcome'] = sorted(snapshot.outcome_names)
+        return values
+
+    def query(self, group_by=(), filters=None, year_from=None, year_to=None, limit=None):
+        """Aggregates for each combination of the group_by dimensions among the cells matching filters
+
+        filters maps a dimension to the values to keep; year_from and year_to
+        bound the filing year. Groups come back largest first.
+        """
+        unknown = [dimension for dimension in list(group_by) + list(filters or {}) if dimension not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimension: {', '.join(unknown)}")
+        snapshot = self.snapshot()
+        cells, dictionaries, outcome_names = snapshot.cells, snapshot.dictionaries, snapshot.outcome_names
+
+        mask = np.ones(len(cells), dtype=bool)
+        for dimension, wanted in (filters or {}).items():
+            codes, _ = dictionaries[dimension]
+            wanted = [int(v) if dimension == 'year' and str(v).isdigit() else v for v in wanted]
+            mask &= np.isin(cells.codes[:, DIMENSIONS.index(dimension)],
+                            [codes[v] for v in wanted if v in codes])
+        if year_from is not None or year_to is not None:
+            years = np.asarray(dictionaries['year'][1], dtype=np.int64)[cells.codes[:, DIMENSIONS.index('year')]]
+            mask &= (years >= (year_from or 0)) & (years <= (year_to or 9999))
+        selected = np.flatnonzero(mask)
+
+        columns = [DIMENSIONS.index(dimension) for dimension in group_by]
+        if columns:
+            sizes = [len(dictionaries[DIMENSIONS[c]][1]) for c in columns]
+            keys = np.ravel_multi_index(cells.codes[selected][:, columns].T, sizes)
+            group_keys, groups = np.unique(keys, return_inverse=True)
+        else:
+            group_keys, groups = np.zeros(1 if len(selected) else 0, dtype=np.int64), np.zeros(len(selected), np.int64)
+        count = len(group_keys)
+
+        def total(column):
+            if column.ndim == 1:
+                return np.bincount(groups, weights=column[selected], minlength=count)
+            out = np.zeros((count, column.shape[1]))
+            np.add.at(out, groups, column[selected])
+            return out
+
+        cases, timed = total(cells.cases), total(cells.timed)
+        outcomes, histogram = total(cells.outcomes), total(cells.histogram)
+        days_sum, days_squares = total(cells.days_sum), total(cells.days_squares)
+        order = np.argsort(-cases, kind='stable')[:limit]
+        group_codes = np.array(np.unravel_index(group_keys, sizes)).T if columns else np.zeros((count, 0), np.int64)
+
+        results = []
+        for g in order:
+            row = {DIMENSIONS[c]: dictionaries[DIMENSIONS[c]][1][group_codes[g, i]] for i, c in enumerate(columns)}
+            decided = outcomes[g].sum()
+            row.update({
+                'cases': int(cases[g]),
+                'decided': int(decided),
+                'pending': int(cases[g] - decided),
+                'outcomes': {name: int(outcomes[g, i]) for i, name in enumerate(outcome_names) if outcomes[g, i]},
+                'outcome_rates': {name: round(float(outcomes[g, i] / decided), 4)
+                                  for i, name in enumerate(outcome_names) if outcomes[g, i]},
+                'time_to_judgment': _time_summary(timed[g], days_sum[g], days_squares[g], histogram[g])
+            })
+            results.append(row)
+        return results
+
+    def stats(self):
+        return {
+            'cases': len(self._facts),
+            'cells': len(self._cells),
+            'queued_deltas': len(self._deltas),
+            'dimension_values': {dimension: len(self.dictionaries[dimension]) for dimension in DIMENSIONS},
+            'stale': self._stale,
+            'rebuilding': self._rebuilding
+        }
+
+
+def _percentile(histogram, fraction):
+    """Day value below which fraction of the cases fall, interpolated within histogram bins"""
+    total = histogram.sum()
+    if not total:
+        return None
+    cumulative = np.cumsum(histogram)
+    b = int(np.searchsorted(cumulative, fraction * total))
+    if b >= len(DAY_BINS) - 1:
+        return int(DAY_BINS[-1])
+    before = cumulative[b] - histogram[b]
+    share = (fraction * total - before) / histogram[b] if histogram[b] else 0.0
+    return int(round(DAY_BINS[b] + share * (DAY_BINS[b + 1] - DAY_BINS[b])))
+
+
+def _time_summary(timed, days_sum, days_squares, histogram):
+    if not timed:
+        return {'cases': 0}
+    mean = days_sum / timed
+    return {
+        'cases': int(timed),
+        'mean_days': round(float(mean), 1),
+        'std_days': round(float(np.sqrt(max(days_squares / timed - mean ** 2, 0.0))), 1),
+        'p50_days': _percentile(histogram, 0.5),
+        'p90_days': _percentile(histogram, 0.9),
+        'histogram': [{'from_days': int(start), 'to_days': int(end) if end is not None else None, 'cases': int(n)}
+                      for start, end, n in zip(DAY_BINS, list(DAY_BINS[1:]) + [None], histogram) if n]
+    }
+
+
+def build_outcome_cube(db=None, csv_path=CASES_CSV):
+    """Cube over the historical dataset and the cases collection, rebuilt from them in the background"""
+    def source():
+        try:
+            yield from iter_case_rows(csv_path)
+        except FileNotFoundError:
+            logger.warning("Dataset %s not found, analytics cube built from the cases collection only", csv_path)
+        if db is not None:
+            try:
+                # Cases imported from the dataset replace their CSV rows (same case number)
+                yield from db.cases.find({}, {'case_number': 1, 'case_type': 1, 'filing_date': 1,
+                                              'judgment_date': 1, 'outcome': 1, 'details.court_name': 1,
+                                              'details.judge_name': 1})
+            except Exception as e:
+                logger.error("Error loading cases for the analytics cube: %s", e)
+    return OutcomeCube(source)
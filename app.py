@@ -1,27 +1,52 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
-import requests
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, send_file, abort
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
-import pandas as pd
-import joblib
 from functools import wraps
 import jwt
 import datetime
 import secrets
 import sys
+import re
+import io
+import math
+import threading
+import time
 from pymongo import MongoClient
 from bson import ObjectId
 from werkzeug.security import generate_password_hash, check_password_hash
 import logging
+from logging_pipeline import configure_logging
+from legal_search import LegalResourceSearch
+from party_names import build_party_index
+from citation_graph import build_citation_graph
+from precedent_index import build_precedent_index
+from analytics_cube import build_outcome_cube, DIMENSIONS as CUBE_DIMENSIONS
+from hearing_index import HearingIndex, HearingConflict, CalendarBusy, DEFAULT_DURATION_MINUTES, ACTIVE_STATUSES
+from hearing_scheduler import (start_background_job, get_job, default_judges, parse_courtrooms, SchedulerBusy,
+                               ensure_indexes as ensure_scheduler_indexes)
+from case_numbers import CaseNumberAllocator
+from document_store import (DocumentStore, DocumentRejected, UploadSink, make_request_class, attachment_disposition,
+                            download_name)
+import document_indexer
+from filings import FilingStore, FilingError, build_filing
+from read_models import ReadModels, RecentDocuments, UpcomingHearings
+from cache import create_cache, default_cache_type
+from config import config as app_configs
+import metrics
+import tracing
+import profiling
+import bulk_export
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: records are written as JSON lines by a background thread
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Request tracing, enabled when TRACE_EXPORT names a file or collector URL
+tracing.configure()
+
 # Debug: Print loaded environment variables (remove in production)
 print(f"GOOGLE_API_KEY loaded: {'Yes' if os.getenv('GOOGLE_API_KEY') else 'No'}")
 print(f"MONGODB_URL loaded: {'Yes' if os.getenv('MONGODB_URL') else 'No'}")
@@ -35,7 +60,8 @@ def setup_mongodb():
             return None, None
         
         print("Connecting to MongoDB...")
-        client = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000)
+        client = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000,
+                             event_listeners=[metrics.MongoCommandMetrics(), tracing.MongoCommandTracer()])
         
         # Test connection
         client.server_info()
@@ -59,6 +85,10 @@ def setup_mongodb():
             collections['users'].create_index("username", unique=True)
             collections['cases'].create_index("case_number", unique=True)
             collections['hearings'].create_index([("case_id", 1), ("date", 1)])
+            collections['hearings'].create_index([("status", 1), ("date", 1)])
+            collections['cases'].create_index("filed_by")
+            collections['cases'].create_index("plaintiff.id")
+            collections['cases'].create_index("defendant.id")
             print("Database indexes created successfully!")
         except Exception as e:
             print(f"Warning: Error creating indexes: {str(e)}")
@@ -94,12 +124,23 @@ if db is not None:
     
     # Create indexes for new collections
     case_filings_collection.create_index([("case_number", 1)], unique=True)
+    case_filings_collection.create_index([("status", 1), ("filing_date", 1)])
     hearing_schedules_collection.create_index([("case_id", 1), ("hearing_date", 1)])
+    hearing_schedules_collection.create_index([("status", 1), ("hearing_date", 1)])
     legal_resources_collection.create_index([("title", "text"), ("content", "text")])
+    document_indexer.ensure_indexes(db)
+    ensure_scheduler_indexes(db)
     print("Database collections initialized")
 else:
     print("Warning: Application running without database connection")
 
+# Largest batch accepted by the bulk filing import API
+BULK_IMPORT_LIMIT = 1000
+
+# Filings shown per page of /cases, and the fields that page renders
+CASES_PAGE_SIZE = 50
+CASE_LIST_FIELDS = {'case_number': 1, 'case_type': 1, 'plaintiff': 1, 'defendant': 1, 'filing_date': 1, 'status': 1}
+
 # Set default secret keys
 DEFAULT_SECRET_KEY = secrets.token_hex(32)
 DEFAULT_JWT_SECRET = secrets.token_hex(32)
@@ -112,6 +153,22 @@ print(f"JWT_SECRET_KEY: {DEFAULT_JWT_SECRET[:10]}...")
 
 def create_app():
     app = Flask(__name__)
+
+    # Cache settings come from the config classes in config.py
+    app_config = app_configs[os.getenv('FLASK_CONFIG', 'default')]
+    app.config.update({name: getattr(app_config, name) for name in dir(app_config) if name.startswith('CACHE_')})
+    app.config['CACHE_TYPE'] = app.config['CACHE_TYPE'] or default_cache_type()
+    # File-backed caches default to a private directory under instance/
+    cache = create_cache(app.config, default_dir=os.path.join(app.instance_path, 'cache'))
+    cache.observer = lambda namespace, hit: metrics.CACHE_LOOKUPS.inc(
+        namespace=namespace, result='hit' if hit else 'miss')
+
+    # Request latency histograms and the Prometheus /metrics endpoint
+    metrics.init_app(app)
+    tracing.init_app(app)
+
+    # Admins can profile a single request by sending an X-Profile header
+    request_profiles = profiling.init_app(app, lambda: session.get('role') == 'admin')
     
     # Set secret keys
     app.secret_key = os.getenv("FLASK_SECRET_KEY", DEFAULT_SECRET_KEY)
@@ -128,48 +185,139 @@ def create_app():
     # File upload configuration
     app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max file size
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'uploads')
+    app.config['PRECEDENT_INDEX_DIR'] = os.getenv('PRECEDENT_INDEX_DIR', os.path.join(app.root_path, 'precedent_index'))
     
     # Create uploads directory if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    # Document downloads: X-Sendfile hands the transfer to the front-end server,
+    # X-Accel-Redirect does the same for nginx internal locations
+    app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+    app.config['DOCUMENT_ACCEL_PREFIX'] = os.getenv('DOCUMENT_ACCEL_PREFIX')
+
+    # Uploaded files stream into a content-addressed store while the form is parsed
+    document_store = DocumentStore(app.config['UPLOAD_FOLDER'], max_file_size=app.config['MAX_CONTENT_LENGTH'])
+    app.request_class = make_request_class(document_store, endpoints=('submit_case_filing',))
+
+    # Text extraction runs off the request path in a small worker pool
+    text_indexer = document_indexer.DocumentIndexer(db, app.config['UPLOAD_FOLDER']).start() if db is not None else None
+
+    @app.teardown_request
+    def discard_uncommitted_uploads(exc):
+        for sink in getattr(request, 'upload_sinks', ()):
+            sink.discard()
     
     # Configure Gemini API - Updated to Gemini 2.0 Flash
+    # The SDK takes about half a second to import, so the model is created on first use
     api_key = os.getenv("GOOGLE_API_KEY")
-    model = None
-    if api_key:
-        try:
-            genai.configure(api_key=api_key)
-            # Use Gemini 2.0 Flash for better performance
-            model = genai.GenerativeModel("gemini-2.0-flash-exp")
-            print("Gemini 2.0 Flash model loaded successfully!")
-        except Exception as e:
-            print(f"Error loading Gemini 2.0 Flash: {e}")
-            try:
-                # Fallback to Gemini 1.5 Pro if 2.0 fails
-                model = genai.GenerativeModel("gemini-1.5-pro")
-                print("Fallback to Gemini 1.5 Pro model loaded!")
-            except Exception as e2:
-                print(f"Error loading Gemini 1.5 Pro: {e2}")
+    gemini = {}
+    gemini_lock = threading.Lock()
+
+    def get_model():
+        if not api_key:
+            return None
+        with gemini_lock:
+            if 'model' not in gemini:
+                import google.generativeai as genai
                 model = None
-    else:
+                try:
+                    genai.configure(api_key=api_key)
+                    # Use Gemini 2.0 Flash for better performance
+                    model = genai.GenerativeModel("gemini-2.0-flash-exp")
+                    print("Gemini 2.0 Flash model loaded successfully!")
+                except Exception as e:
+                    print(f"Error loading Gemini 2.0 Flash: {e}")
+                    try:
+                        # Fallback to Gemini 1.5 Pro if 2.0 fails
+                        model = genai.GenerativeModel("gemini-1.5-pro")
+                        print("Fallback to Gemini 1.5 Pro model loaded!")
+                    except Exception as e2:
+                        print(f"Error loading Gemini 1.5 Pro: {e2}")
+                        model = None
+                gemini['model'] = model
+            return gemini['model']
+
+    if not api_key:
         print("Warning: GOOGLE_API_KEY not found. AI features will be disabled.")
 
+    # Ranked search over legal resources, served from the text index; the
+    # autocomplete trie starts building in the background now
+    resource_search = LegalResourceSearch(
+        legal_resources_collection,
+        cache=cache.namespace('legal_search', tags=('legal_resources',))
+    ).start() if db is not None else None
+
+    # Fuzzy index over known party names for lookups and canonicalization
+    party_index = build_party_index(db, csv_path=os.path.join(app.root_path, 'cases.csv'))
+
+    # Precedent citation graph (PageRank authority, co-citation), loaded in the background
+    citation_graph = build_citation_graph(db, csv_path=os.path.join(app.root_path, 'cases.csv')).start()
+
+    # Similar decided cases for grounding predictions; opened on first query, rebuilt in the background if outdated
+    precedent_index = build_precedent_index(db, csv_path=os.path.join(app.root_path, 'cases.csv'),
+                                            path=app.config['PRECEDENT_INDEX_DIR'])
+
+    # Outcome and time-to-judgment aggregates by court, case type, judge and year, built in the background
+    outcome_cube = build_outcome_cube(db, csv_path=os.path.join(app.root_path, 'cases.csv')).start()
+
+    # Judge and courtroom bookings, used to reject overlapping hearings
+    hearing_index = HearingIndex(hearing_schedules_collection) if db is not None else None
+
+    # Case numbers come from per-day counters, leased to this process in blocks
+    case_numbers = CaseNumberAllocator(db.counters) if db is not None else None
+    filing_store = FilingStore(db, case_numbers) if db is not None else None
+
+    # Recent filings, recent predictions and the hearing docket are served from
+    # memory, kept current by a change stream (or polling on standalone servers)
+    read_models = ReadModels(db) if db is not None else None
+    if read_models is not None:
+        recent_filings_view = read_models.register(
+            'case_filings', RecentDocuments(case_filings_collection, sort_field='filing_date'))
+        recent_predictions_view = read_models.register('predictions', RecentDocuments(
+            predictions_collection, projection=['case_id', 'case_type', 'status', 'created_at']))
+        docket_view = read_models.register('hearing_schedules', UpcomingHearings(hearing_schedules_collection))
+        read_models.register('cases', citation_graph)
+        read_models.register('cases', precedent_index)
+        read_models.register('cases', outcome_cube)
+        read_models.start()
+
     def token_required(f):
         @wraps(f)
         def decorated(*args, **kwargs):
             if 'token' not in session:
-                print("No token in session")
+                logger.debug("No token in session for %s", request.path)
                 return redirect(url_for('login'))
             
             try:
-                jwt.decode(session['token'], app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
-                print("Token verified successfully")
-                return f(*args, **kwargs)
+                with tracing.span('auth.jwt_decode'):
+                    jwt.decode(session['token'], app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
             except Exception as e:
-                print(f"Token verification error: {str(e)}")
+                logger.info("Token verification failed: %s", e)
                 session.clear()
                 return redirect(url_for('login'))
+            # Errors raised by the view itself (e.g. abort(403)) must not log the user out
+            return f(*args, **kwargs)
         return decorated
 
+    # One page of the filings list per cache entry, so no worker holds the whole collection
+    @cache.memoize('case_filings_list', tags=('filings',))
+    def load_case_filings(page=1):
+        return list(case_filings_collection.find({}, CASE_LIST_FIELDS).sort('filing_date', -1)
+                    .skip((page - 1) * CASES_PAGE_SIZE).limit(CASES_PAGE_SIZE))
+
+    @cache.memoize('ml_predict', timeout=3600)
+    def predict_outcome_cached(case_type, court_name, plaintiff, defendant, date_filed):
+        import pandas as pd
+        from predict import predict_outcome
+        input_data = pd.DataFrame({
+            'Case Type': [case_type],
+            'Court Name': [court_name],
+            'Plaintiff': [plaintiff],
+            'Defendant': [defendant],
+            'Date Filed': [date_filed]
+        })
+        return str(predict_outcome(input_data)[0])
+
     # Test connection route
     @app.route('/test-connection')
     def test_connection():
@@ -192,9 +340,10 @@ def create_app():
             results['mongodb'] = 'Not connected'
         
         # Test Gemini API
+        model = get_model()
         if model:
             try:
-                test_response = model.generate_content("Hello, this is a test.")
+                test_response = metrics.timed_generate(model, "Hello, this is a test.", 'test')
                 results['gemini'] = 'Connected successfully'
             except Exception as e:
                 results['gemini_error'] = str(e)
@@ -248,12 +397,12 @@ def create_app():
                 }
 
                 users_collection.insert_one(new_user)
-                logger.info(f"New user registered: {username}")
+                logger.info("New user registered: %s", username)
                 flash('Registration successful! Please login.', 'success')
                 return redirect(url_for('login'))
 
             except Exception as e:
-                logger.error(f"Registration error: {str(e)}")
+                logger.error("Registration error: %s", e)
                 flash('Registration failed. Please try again.', 'error')
                 return render_template('register.html')
 
@@ -307,14 +456,14 @@ def create_app():
                     session['user_id'] = str(user['_id'])
                     session['role'] = user['role']
                     
-                    print(f"User {username} logged in successfully")
+                    logger.info("User %s logged in", username)
                     return redirect(url_for('welcome'))
                     
                 else:
                     flash('Invalid username or password', 'error')
                     
             except Exception as e:
-                print(f"Login error: {str(e)}")
+                logger.error("Login error: %s", e)
                 session.clear()
                 flash('Login error. Please try again.', 'error')
         
@@ -325,7 +474,7 @@ def create_app():
         username = session.get('username', 'Unknown')
         session.clear()
         flash('Logged out successfully!', 'success')
-        print(f"User {username} logged out")
+        logger.info("User %s logged out", username)
         return redirect(url_for('login'))
 
     @app.route('/welcome')
@@ -333,7 +482,17 @@ def create_app():
     def welcome():
         if 'username' not in session:
             return redirect(url_for('login'))
-        return render_template('homepage.html', username=session['username'])
+        dashboard = {}
+        if read_models is not None:
+            try:
+                dashboard = {
+                    'recent_filings': recent_filings_view.get(session.get('user_id'))[:3],
+                    'recent_predictions': recent_predictions_view.get(session.get('user_id'))[:3],
+                    'todays_docket': docket_view.on_day()
+                }
+            except Exception as e:
+                logger.error("Error loading dashboard: %s", e)
+        return render_template('homepage.html', username=session['username'], **dashboard)
         
     @app.route('/about')
     @token_required
@@ -350,15 +509,16 @@ def create_app():
     def cases():
         try:
             # Fetch all cases from MongoDB
+            page = max(request.args.get('page', 1, type=int), 1)
             logger.info("Fetching cases from MongoDB")
-            cases = list(case_filings_collection.find({}).sort('filing_date', -1))
-            logger.info(f"Found {len(cases)} cases")
-            logger.debug(f"Cases data: {cases}")
-            return render_template('cases.html', cases=cases)
+            cases = load_case_filings(page)
+            logger.info("Found %d cases", len(cases))
+            return render_template('cases.html', cases=cases, page=page,
+                                   has_next=len(cases) == CASES_PAGE_SIZE)
         except Exception as e:
-            logger.error(f"Error fetching cases: {str(e)}")
+            logger.error("Error fetching cases: %s", e)
             flash("Error fetching case data", "error")
-            return render_template('cases.html', cases=[])
+            return render_template('cases.html', cases=[], page=1, has_next=False)
 
     @app.route('/contact')
     @token_required
@@ -368,18 +528,13 @@ def create_app():
     @app.route('/ai_model')
     @token_required
     def ai_model():
-        print(f"AI Model page accessed by user: {session.get('username')}")
         # Get recent predictions for this user
         recent_predictions = []
         if db is not None:
             try:
-                predictions = predictions_collection.find(
-                    {'user_id': session.get('user_id')},
-                    {'_id': 1, 'case_id': 1, 'case_type': 1, 'status': 1, 'created_at': 1}
-                ).sort('created_at', -1).limit(5)
-                recent_predictions = list(predictions)
+                recent_predictions = recent_predictions_view.get(session.get('user_id'))
             except Exception as e:
-                logger.error(f"Error fetching predictions: {str(e)}")
+                logger.error("Error fetching predictions: %s", e)
         return render_template('ai.html', recent_predictions=recent_predictions)
 
     @app.route('/prediction/<prediction_id>')
@@ -403,7 +558,7 @@ def create_app():
             return render_template('prediction_details.html', prediction=prediction)
             
         except Exception as e:
-            logger.error(f"Error retrieving prediction: {str(e)}")
+            logger.error("Error retrieving prediction: %s", e)
             flash('Error retrieving prediction details', 'error')
             return redirect(url_for('ai_model'))
 
@@ -415,25 +570,9 @@ def create_app():
         recent_filings = []
         if db is not None:
             try:
-                user_id = session.get('user_id')
-                logger.info(f"Fetching recent filings for user_id: {user_id}")
-                
-                # Debug: Print total number of documents in collection
-                total_docs = case_filings_collection.count_documents({})
-                logger.info(f"Total documents in case_filings collection: {total_docs}")
-                
-                # Get recent filings
-                recent_filings = case_filings_collection.find(
-                    {'user_id': user_id}
-                ).sort('filing_date', -1).limit(5)
-                
-                recent_filings = list(recent_filings)
-                logger.info(f"Found {len(recent_filings)} recent filings")
-                
+                recent_filings = recent_filings_view.get(session.get('user_id'))
             except Exception as e:
-                logger.error(f"Error fetching recent filings: {str(e)}")
-                import traceback
-                logger.error(traceback.format_exc())
+                logger.exception("Error fetching recent filings: %s", e)
         else:
             logger.error("Database is not connected")
             
@@ -447,88 +586,181 @@ def create_app():
             return redirect(url_for('case_filing'))
 
         try:
-            # Log form data for debugging
-            logger.info(f"Received case filing form data: {request.form}")
-            
-            # Generate unique case number
-            case_number = f"CASE-{datetime.datetime.now().strftime('%Y%m%d')}-{secrets.randbelow(10000):04d}"
-            logger.info(f"Generated case number: {case_number}")
-            
-            # Create case filing document
-            filing_data = {
-                'case_number': case_number,
-                'case_type': request.form.get('case_type'),
-                'filing_date': datetime.datetime.strptime(request.form.get('filing_date'), '%Y-%m-%d'),
-                'plaintiff_name': request.form.get('plaintiff_name'),
-                'defendant_name': request.form.get('defendant_name'),
-                'case_description': request.form.get('case_description'),
-                'court_name': request.form.get('court_name'),
-                'lawyer_name': request.form.get('lawyer_name'),
-                'user_id': session.get('user_id'),
-                'username': session.get('username'),
-                'status': 'pending',
-                'created_at': datetime.datetime.utcnow()
-            }
+            # Create case filing document; the case number is assigned when it is saved
+            filing_data = build_filing(request.form, session.get('user_id'), session.get('username'))
 
-            # Handle file uploads
-            if 'documents' in request.files:
-                files = request.files.getlist('documents')
-                document_ids = []
-                for file in files:
-                    if file and file.filename:
-                        # Save file details in documents collection
-                        doc_data = {
-                            'filename': file.filename,
-                            'case_number': case_number,
-                            'content_type': file.content_type,
-                            'uploaded_at': datetime.datetime.utcnow(),
-                            'user_id': session.get('user_id')
-                        }
-                        result = documents_collection.insert_one(doc_data)
-                        document_ids.append(str(result.inserted_id))
-                        
-                        # Save file to filesystem
-                        file.save(os.path.join(app.config['UPLOAD_FOLDER'], str(result.inserted_id)))
-                
-                filing_data['document_ids'] = document_ids
+            # Handle file uploads - files were hashed and size/type checked while being received
+            document_records = []
+            for file in request.files.getlist('documents'):
+                if file and file.filename and isinstance(file.stream, UploadSink):
+                    # Identical content is stored once and shared between filings
+                    stored = document_store.commit(file.stream)
+                    document_records.append({
+                        'filename': file.filename,
+                        'content_type': file.content_type,
+                        'sha256': stored['sha256'],
+                        'size': stored['size'],
+                        'storage_path': stored['storage_path'],
+                        'uploaded_at': datetime.datetime.utcnow(),
+                        'user_id': session.get('user_id')
+                    })
+
+            # One filing insert plus one documents insert_many, transactional when available
+            filing_store.save(filing_data, document_records)
+            read_models.notify('case_filings', filing_data)
+            cache.invalidate_tags('filings')
+            case_number = filing_data['case_number']
+            logger.info("Case filing %s stored with %s documents", case_number, len(document_records))
+
+            party_index.add(filing_data['plaintiff_name'])
+            party_index.add(filing_data['defendant_name'])
+
+            if filing_data.get('document_ids'):
+                text_indexer.wake()
 
-            # Insert filing data
-            logger.info(f"Attempting to insert case filing: {filing_data}")
-            result = case_filings_collection.insert_one(filing_data)
-            
-            # Verify the insertion
-            inserted_id = result.inserted_id
-            logger.info(f"Document inserted with ID: {inserted_id}")
-            
-            # Verify we can retrieve the inserted document
-            inserted_doc = case_filings_collection.find_one({'_id': inserted_id})
-            if inserted_doc:
-                logger.info("Successfully verified document insertion")
-            else:
-                logger.error("Failed to verify document insertion")
-            
             flash(f'Case filing submitted successfully. Case Number: {case_number}', 'success')
             return redirect(url_for('case_filing'))
 
+        except (DocumentRejected, FilingError) as e:
+            flash(str(e), 'error')
+            return redirect(url_for('case_filing'))
         except Exception as e:
-            logger.error(f"Error submitting case filing: {str(e)}")
+            logger.error("Error submitting case filing: %s", e)
             flash('Error submitting case filing. Please try again.', 'error')
             return redirect(url_for('case_filing'))
         
+    @app.route('/api/case-filings/bulk', methods=['POST'])
+    @token_required
+    def bulk_import_case_filings():
+        if session.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+
+        payload = request.get_json(silent=True) or {}
+        entries = payload.get('filings') if isinstance(payload, dict) else payload
+        if not isinstance(entries, list) or not entries:
+            return jsonify({'error': 'Expected a JSON list of filings'}), 400
+        if len(entries) > BULK_IMPORT_LIMIT:
+            return jsonify({'error': f'At most {BULK_IMPORT_LIMIT} filings per request'}), 413
+
+        filings = []
+        # Position in the request of each built filing, for reporting write errors
+        entry_indexes = []
+        rejected = []
+        for index, entry in enumerate(entries):
+            try:
+                filings.append(build_filing(entry if isinstance(entry, dict) else {},
+                                            session.get('user_id'), session.get('username')))
+                entry_indexes.append(index)
+            except FilingError as e:
+                rejected.append({'index': index, 'error': str(e)})
+
+        try:
+            saved, failed = filing_store.bulk_import(filings)
+        except Exception as e:
+            logger.error("Error in bulk filing import: %s", e)
+            return jsonify({'error': 'Bulk import failed'}), 500
+
+        if saved:
+            cache.invalidate_tags('filings')
+        for filing in saved:
+            read_models.notify('case_filings', filing)
+            party_index.add(filing['plaintiff_name'])
+            party_index.add(filing['defendant_name'])
+        logger.info("Bulk import stored %s filings, %s rejected", len(saved), len(rejected) + len(failed))
+
+        return jsonify({
+            'imported': len(saved),
+            'case_numbers': [filing['case_number'] for filing in saved],
+            'rejected': sorted(rejected + [{'index': entry_indexes[f['index']], 'error': f['error']} for f in failed],
+                               key=lambda r: r['index'])
+        }), 201 if saved else 400
+
+    @app.route('/documents/<document_id>')
+    @token_required
+    def download_document(document_id):
+        if db is None:
+            abort(503)
+
+        try:
+            document = documents_collection.find_one(
+                {'_id': ObjectId(document_id)},
+                {'filename': 1, 'content_type': 1, 'user_id': 1, 'sha256': 1, 'storage_path': 1}
+            )
+        except Exception:
+            abort(404)
+        if document is None:
+            abort(404)
+        if document.get('user_id') != session.get('user_id') and session.get('role') != 'admin':
+            abort(403)
+
+        # Files stored before content addressing live at uploads/<document_id>
+        relative_path = document.get('storage_path') or str(document['_id'])
+        path = os.path.join(app.config['UPLOAD_FOLDER'], relative_path)
+        if not os.path.isfile(path):
+            logger.error("Document %s missing from storage at %s", document_id, relative_path)
+            abort(404)
+
+        etag = document.get('sha256')
+        accel_prefix = app.config.get('DOCUMENT_ACCEL_PREFIX')
+        if accel_prefix:
+            response = app.response_class(status=200, mimetype=document.get('content_type'))
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{relative_path}"
+            response.headers['Content-Disposition'] = attachment_disposition(document.get('filename') or relative_path)
+            if etag:
+                response.set_etag(etag)
+            return response.make_conditional(request)
+
+        # conditional=True answers Range and If-None-Match/If-Modified-Since;
+        # the body goes out via wsgi.file_wrapper (sendfile) when the server has one
+        return send_file(
+            path,
+            mimetype=document.get('content_type') or None,
+            as_attachment=True,
+            download_name=download_name(document.get('filename'), fallback=relative_path),
+            conditional=True,
+            etag=etag if etag else True,
+            max_age=3600
+        )
+
+    @app.route('/api/case-documents/search')
+    @token_required
+    def search_case_documents():
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+
+        query = request.args.get('q', '').strip()
+        if len(query) < 2:
+            return jsonify({'results': []})
+
+        user_id = None if session.get('role') == 'admin' else session.get('user_id')
+        try:
+            chunks = document_indexer.search_chunks(db, query, user_id=user_id,
+                                                    case_number=request.args.get('case_number') or None)
+        except Exception as e:
+            logger.error("Error searching case documents: %s", e)
+            return jsonify({'error': 'Search failed'}), 500
+
+        return jsonify({'results': [{
+            'document_id': str(chunk['document_id']),
+            'case_number': chunk.get('case_number'),
+            'filename': chunk.get('filename'),
+            'chunk_index': chunk.get('chunk_index'),
+            'text': chunk.get('text'),
+            'score': round(chunk.get('score', 0.0), 4)
+        } for chunk in chunks]})
+
     @app.route('/hearing-schedule', methods=['GET'])
     @token_required
     def hearing_schedule():
         upcoming_hearings = []
         if db is not None:
             try:
-                # Get hearings scheduled for today or future
-                today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                upcoming_hearings = hearing_schedules_collection.find({
-                    'hearing_date': {'$gte': today}
-                }).sort('hearing_date', 1).limit(10)
-                upcoming_hearings = list(upcoming_hearings)
+                # Hearings scheduled for today or later, from the in-memory docket
+                upcoming_hearings = docket_view.upcoming(10)
             except Exception as e:
-                logger.error(f"Error fetching upcoming hearings: {str(e)}")
+                logger.error("Error fetching upcoming hearings: %s", e)
         return render_template('hearing_schedule.html', upcoming_hearings=upcoming_hearings)
 
     @app.route('/submit-hearing', methods=['POST'])
@@ -551,6 +783,7 @@ def create_app():
                 'hearing_type': request.form.get('hearing_type'),
                 'hearing_date': datetime.datetime.strptime(request.form.get('hearing_date'), '%Y-%m-%d'),
                 'hearing_time': datetime.datetime.strptime(request.form.get('hearing_time'), '%H:%M'),
+                'duration_minutes': int(request.form.get('duration_minutes') or DEFAULT_DURATION_MINUTES),
                 'judge_name': request.form.get('judge_name'),
                 'courtroom': request.form.get('courtroom'),
                 'user_id': session.get('user_id'),
@@ -559,27 +792,342 @@ def create_app():
                 'status': 'scheduled'
             }
 
-            # Insert hearing data
-            result = hearing_schedules_collection.insert_one(hearing_data)
+            # Insert hearing data, rejecting double bookings
+            try:
+                hearing_index.book(hearing_data)
+            except HearingConflict as e:
+                flash(f'{str(e)}. Please choose another slot.', 'error')
+                return redirect(url_for('hearing_schedule'))
+            except CalendarBusy:
+                flash('Another hearing is being booked for this judge or courtroom. Please try again.', 'error')
+                return redirect(url_for('hearing_schedule'))
+            read_models.notify('hearing_schedules', hearing_data)
             
             flash('Hearing scheduled successfully', 'success')
             return redirect(url_for('hearing_schedule'))
 
         except Exception as e:
-            logger.error(f"Error scheduling hearing: {str(e)}")
+            logger.error("Error scheduling hearing: %s", e)
             flash('Error scheduling hearing. Please try again.', 'error')
             return redirect(url_for('hearing_schedule'))
         
+    @app.route('/api/hearings/free-slots')
+    @token_required
+    def hearing_free_slots():
+        if hearing_index is None:
+            return jsonify({'error': 'Database connection error'}), 503
+
+        judge = request.args.get('judge', '').strip()
+        courtroom = request.args.get('courtroom', '').strip()
+        if not judge and not courtroom:
+            return jsonify({'error': 'judge or courtroom is required'}), 400
+
+        try:
+            duration = int(request.args.get('duration', DEFAULT_DURATION_MINUTES))
+            count = min(int(request.args.get('n', 5)), 50)
+            after = request.args.get('after')
+            after = datetime.datetime.strptime(after, '%Y-%m-%dT%H:%M') if after else None
+        except ValueError:
+            return jsonify({'error': 'Invalid duration, n or after parameter'}), 400
+        if duration <= 0 or count <= 0:
+            return jsonify({'error': 'duration and n must be positive'}), 400
+
+        slots = hearing_index.free_slots(duration, n=count, judge=judge or None,
+                                         courtroom=courtroom or None, after=after)
+        return jsonify({'slots': [
+            {'hearing_date': start.strftime('%Y-%m-%d'), 'hearing_time': start.strftime('%H:%M'),
+             'end_time': end.strftime('%H:%M')}
+            for start, end in slots
+        ]})
+
+    @app.route('/api/hearings/<hearing_id>/status', methods=['POST'])
+    @token_required
+    def update_hearing_status(hearing_id):
+        if hearing_index is None:
+            return jsonify({'error': 'Database connection error'}), 503
+
+        status = (request.form.get('status') or (request.get_json(silent=True) or {}).get('status') or '').strip()
+        if status not in ACTIVE_STATUSES | {'completed', 'postponed', 'cancelled'}:
+            return jsonify({'error': 'Invalid status'}), 400
+        if not ObjectId.is_valid(hearing_id):
+            return jsonify({'error': 'Hearing not found'}), 404
+
+        try:
+            # Only admins and whoever booked the hearing may change it
+            if session.get('role') != 'admin':
+                hearing = hearing_schedules_collection.find_one({'_id': ObjectId(hearing_id)}, {'user_id': 1})
+                if hearing is None:
+                    return jsonify({'error': 'Hearing not found'}), 404
+                if hearing.get('user_id') is None or hearing.get('user_id') != session.get('user_id'):
+                    return jsonify({'error': 'Not allowed to change this hearing'}), 403
+            if not hearing_index.set_status(hearing_id, status):
+                return jsonify({'error': 'Hearing not found'}), 404
+            read_models.invalidate('hearing_schedules')
+            return jsonify({'hearing_id': hearing_id, 'status': status})
+        except HearingConflict as e:
+            return jsonify({'error': str(e), 'conflict_with': e.hearing_id}), 409
+        except CalendarBusy as e:
+            return jsonify({'error': str(e)}), 409
+        except Exception as e:
+            logger.error("Error updating hearing status: %s", e)
+            return jsonify({'error': 'Error updating hearing status'}), 500
+
+    @app.route('/admin/schedule-pending', methods=['POST'])
+    @token_required
+    def schedule_pending_cases():
+        if session.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+
+        try:
+            judges = request.form.get('judges', '').strip()
+            judges = [j.strip() for j in judges.split(',') if j.strip()] if judges else \
+                default_judges(os.path.join(app.root_path, 'cases.csv'))
+            courtrooms = parse_courtrooms(request.form.get('courtrooms', '10').strip())
+            options = {
+                'duration_minutes': int(request.form.get('duration_minutes') or DEFAULT_DURATION_MINUTES),
+                'gap_minutes': int(request.form.get('gap_minutes') or 15),
+                'min_notice_days': int(request.form.get('min_notice_days') or 7)
+            }
+        except ValueError:
+            return jsonify({'error': 'Invalid scheduler options'}), 400
+
+        # Reload the booking index once the new hearings are written
+        try:
+            job_id = start_background_job(db, judges, courtrooms, hearing_index=hearing_index,
+                                          on_complete=lambda result: (hearing_index.load(),
+                                                                      read_models.invalidate('hearing_schedules')),
+                                          **options)
+        except SchedulerBusy as e:
+            return jsonify({'error': str(e)}), 409
+        logger.info("Started hearing scheduler job %s", job_id)
+        return jsonify({'job_id': job_id, 'status': 'running'}), 202
+
+    @app.route('/admin/schedule-pending/<job_id>')
+    @token_required
+    def schedule_pending_status(job_id):
+        if session.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        job = get_job(db, job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+
     @app.route('/case-lookup')
     @token_required
     def case_lookup():
         return render_template('case_lookup.html')
+
+    @app.route('/api/case-lookup')
+    @token_required
+    @cache.cached_view('case_lookup', timeout=60, tags=('filings',))
+    def api_case_lookup():
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+
+        try:
+            query = {}
+            case_number = request.args.get('case_number', '').strip()
+            party = request.args.get('party', '').strip()
+            lawyer = request.args.get('lawyer', '').strip()
+            status = request.args.get('status', '').strip()
+            date_from = request.args.get('date_from', '').strip()
+            date_to = request.args.get('date_to', '').strip()
+
+            if case_number:
+                query['case_number'] = {'$regex': '^' + re.escape(case_number.upper())}
+            if party:
+                # Partial names as typed, plus every known spelling of the party
+                pattern = {'$regex': re.escape(party), '$options': 'i'}
+                names = party_index.variants(party)
+                query['$or'] = [
+                    {'plaintiff_name': pattern},
+                    {'defendant_name': pattern}
+                ]
+                if names:
+                    query['$or'] += [
+                        {'plaintiff_name': {'$in': names}},
+                        {'defendant_name': {'$in': names}}
+                    ]
+            if lawyer:
+                query['lawyer_name'] = {'$regex': re.escape(lawyer), '$options': 'i'}
+            if status:
+                query['status'] = status
+            if date_from or date_to:
+                query['filing_date'] = {}
+                if date_from:
+                    query['filing_date']['$gte'] = datetime.datetime.strptime(date_from, '%Y-%m-%d')
+                if date_to:
+                    query['filing_date']['$lte'] = datetime.datetime.strptime(date_to, '%Y-%m-%d')
+
+            projection = {
+                'case_number': 1, 'case_type': 1, 'plaintiff_name': 1, 'defendant_name': 1,
+                'lawyer_name': 1, 'status': 1, 'filing_date': 1, 'case_description': 1,
+                'created_at': 1
+            }
+            filings = case_filings_collection.find(query, projection).sort('filing_date', -1).limit(100)
+
+            results = []
+            for filing in filings:
+                results.append({
+                    'case_number': filing.get('case_number'),
+                    'case_type': filing.get('case_type'),
+                    'plaintiff_name': filing.get('plaintiff_name'),
+                    'defendant_name': filing.get('defendant_name'),
+                    'lawyer_name': filing.get('lawyer_name'),
+                    'status': filing.get('status'),
+                    'filing_date': filing['filing_date'].strftime('%Y-%m-%d') if filing.get('filing_date') else None,
+                    'last_updated': filing['created_at'].strftime('%Y-%m-%d') if filing.get('created_at') else None,
+                    'case_description': filing.get('case_description')
+                })
+
+            response = {'results': results}
+            if party:
+                response['party_matches'] = party_index.match(party, k=5, min_score=0.3)
+            return jsonify(response)
+
+        except ValueError:
+            return jsonify({'error': 'Invalid date format, expected YYYY-MM-DD'}), 400
+        except Exception as e:
+            logger.error("Error in case lookup: %s", e)
+            return jsonify({'error': 'Case lookup failed'}), 500
         
     @app.route('/legal-resources')
     @token_required
     def legal_resources():
         return render_template('legal_resources.html')
 
+    @app.route('/api/legal-resources/search')
+    @token_required
+    def search_legal_resources():
+        query = request.args.get('q', '').strip()
+        category = request.args.get('category') or None
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), 50)
+        except ValueError:
+            limit = 20
+
+        if resource_search is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        if len(query) < 2:
+            return jsonify({'query': query, 'results': []})
+
+        try:
+            results = resource_search.search(query, limit=limit, category=category)
+            return jsonify({'query': query, 'results': results})
+        except Exception as e:
+            logger.error("Error searching legal resources: %s", e)
+            return jsonify({'error': 'Search failed'}), 500
+
+    @app.route('/api/legal-resources/suggest')
+    @token_required
+    def suggest_legal_resources():
+        prefix = request.args.get('q', '')
+        if resource_search is None:
+            return jsonify({'suggestions': []})
+        try:
+            return jsonify({'suggestions': resource_search.suggest(prefix)})
+        except Exception as e:
+            logger.error("Error building suggestions: %s", e)
+            return jsonify({'suggestions': []})
+
+    @app.route('/api/precedents')
+    @token_required
+    def api_precedents():
+        case_type = request.args.get('case_type', '').strip() or None
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        except ValueError:
+            limit = 10
+        try:
+            return jsonify({'case_type': case_type, 'precedents': citation_graph.authoritative(case_type, limit)})
+        except Exception as e:
+            logger.error("Error ranking precedents: %s", e)
+            return jsonify({'error': 'Precedent ranking failed'}), 500
+
+    @app.route('/api/precedents/co-cited')
+    @token_required
+    def api_co_cited_precedents():
+        precedent = request.args.get('precedent', '').strip()
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        except ValueError:
+            limit = 10
+        if not precedent:
+            return jsonify({'error': 'precedent is required'}), 400
+        try:
+            return jsonify({'precedent': precedent, 'co_cited': citation_graph.co_cited(precedent, limit)})
+        except Exception as e:
+            logger.error("Error finding co-cited precedents: %s", e)
+            return jsonify({'error': 'Co-citation lookup failed'}), 500
+
+    @app.route('/api/precedents/similar')
+    @token_required
+    def api_similar_precedents():
+        query = request.args.get('q', '').strip()
+        case_type = request.args.get('case_type', '').strip() or None
+        try:
+            limit = min(max(int(request.args.get('limit', 5)), 1), 50)
+        except ValueError:
+            limit = 5
+        if len(query) < 2:
+            return jsonify({'query': query, 'results': []})
+        try:
+            return jsonify({'query': query, 'results': precedent_index.search(query, limit, case_type)})
+        except Exception as e:
+            logger.error("Error searching similar precedents: %s", e)
+            return jsonify({'error': 'Precedent search failed'}), 500
+
+    @app.route('/api/precedents/features', methods=['POST'])
+    @token_required
+    def api_precedent_features():
+        data = request.get_json(silent=True) or {}
+        try:
+            return jsonify(citation_graph.features(data.get('cited_precedents'), data.get('precedents_applied')))
+        except Exception as e:
+            logger.error("Error computing precedent features: %s", e)
+            return jsonify({'error': 'Precedent features failed'}), 500
+
+    @app.route('/api/analytics/outcomes')
+    @token_required
+    def api_outcome_analytics():
+        group_by = [d.strip() for d in request.args.get('group_by', '').split(',') if d.strip()]
+        filters = {d: request.args.getlist(d) for d in CUBE_DIMENSIONS if request.args.getlist(d)}
+        try:
+            year_from = int(request.args['year_from']) if request.args.get('year_from') else None
+            year_to = int(request.args['year_to']) if request.args.get('year_to') else None
+            limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+        except ValueError:
+            return jsonify({'error': 'year_from, year_to and limit must be integers'}), 400
+        try:
+            groups = outcome_cube.query(group_by, filters, year_from, year_to, limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error("Error querying outcome analytics: %s", e)
+            return jsonify({'error': 'Analytics query failed'}), 500
+        return jsonify({
+            'group_by': group_by,
+            'filters': filters,
+            'year_from': year_from,
+            'year_to': year_to,
+            # Dimensions left to drill into from these groups
+            'drill_down': [d for d in CUBE_DIMENSIONS if d not in group_by and d not in filters],
+            'groups': groups
+        })
+
+    @app.route('/api/analytics/dimensions')
+    @token_required
+    def api_analytics_dimensions():
+        try:
+            return jsonify(outcome_cube.dimensions())
+        except Exception as e:
+            logger.error("Error listing analytics dimensions: %s", e)
+            return jsonify({'error': 'Analytics query failed'}), 500
+
     @app.route('/predict', methods=['POST'])
     @token_required
     def predict_case():
@@ -621,9 +1169,10 @@ def create_app():
             }
 
             # Use Gemini AI for prediction if available
+            model = get_model()
             if model:
                 try:
-                    print(f"Using Gemini model for prediction")
+                    logger.debug("Using Gemini model for prediction")
                     
                     # Create prompt for IPC sections
                     ipc_prompt = f"""
@@ -643,6 +1192,22 @@ def create_app():
                     Format your response in a clear, professional manner suitable for legal documentation.
                     """
                     
+                    try:
+                        precedents = citation_graph.prompt_context(case_type)
+                    except Exception as e:
+                        logger.error("Error ranking precedents for prediction: %s", e)
+                        precedents = ''
+                    precedent_section = (f"Most authoritative precedents in {case_type} cases "
+                                         f"(by citation PageRank):\n{precedents}\n") if precedents else ''
+                    try:
+                        similar = precedent_index.prompt_context(
+                            ' '.join([plaintiff_args, defendant_args, legal_principles]), case_type)
+                    except Exception as e:
+                        logger.error("Error retrieving similar precedents for prediction: %s", e)
+                        similar = ''
+                    if similar:
+                        precedent_section += f"Decided cases with similar facts:\n{similar}\n"
+
                     # Create prompt for judgment
                     judgment_prompt = f"""
                     You are a senior judge with extensive experience in {case_type} cases. Analyze the following case and provide a comprehensive judgment prediction:
@@ -658,6 +1223,7 @@ def create_app():
                     - Judge: {judge_name}
                     - Court: {court_name}
 
+                    {precedent_section}
                     Please provide:
                     1. Case Analysis: Brief overview of the legal issues
                     2. Applicable Laws: Relevant legal principles and precedents
@@ -668,13 +1234,15 @@ def create_app():
                     Format your response as a professional legal judgment summary.
                     """
                     
-                    print("Sending IPC prompt to Gemini...")
-                    ipc_response = model.generate_content(ipc_prompt).text
-                    print("IPC response received")
+                    logger.debug("Sending IPC prompt to Gemini")
+                    with tracing.span('gemini.generate', call='ipc', prompt_chars=len(ipc_prompt)):
+                        ipc_response = metrics.timed_generate(model, ipc_prompt, 'ipc').text
+                    logger.debug("IPC response received")
                     
-                    print("Sending judgment prompt to Gemini...")
-                    judgment_response = model.generate_content(judgment_prompt).text
-                    print("Judgment response received")
+                    logger.debug("Sending judgment prompt to Gemini")
+                    with tracing.span('gemini.generate', call='judgment', prompt_chars=len(judgment_prompt)):
+                        judgment_response = metrics.timed_generate(model, judgment_prompt, 'judgment').text
+                    logger.debug("Judgment response received")
                     
                     # Update prediction data with AI responses
                     prediction_data.update({
@@ -685,9 +1253,7 @@ def create_app():
                     })
                     
                 except Exception as e:
-                    print(f"AI API Error: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception("AI API error: %s", e)
                     ipc_response = f"AI prediction error: {str(e)}"
                     judgment_response = f"AI prediction error: {str(e)}"
                     
@@ -711,11 +1277,13 @@ def create_app():
             # Store prediction in database
             if db is not None:
                 try:
-                    result = predictions_collection.insert_one(prediction_data)
+                    with tracing.span('predictions.insert', status=prediction_data.get('status')):
+                        result = predictions_collection.insert_one(prediction_data)
+                    read_models.notify('predictions', prediction_data)
                     prediction_data['_id'] = str(result.inserted_id)
-                    logger.info(f"Prediction stored with ID: {result.inserted_id}")
+                    logger.info("Prediction stored with ID: %s", result.inserted_id)
                 except Exception as e:
-                    logger.error(f"Error storing prediction: {str(e)}")
+                    logger.error("Error storing prediction: %s", e)
 
             return jsonify({
                 'prediction_id': str(prediction_data.get('_id')),
@@ -725,9 +1293,7 @@ def create_app():
             })
             
         except Exception as e:
-            print(f"General error in predict_case: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("General error in predict_case: %s", e)
             return jsonify({'error': str(e)}), 500
 
     @app.route('/ml_predict', methods=['POST'])
@@ -746,27 +1312,118 @@ def create_app():
             if not all([case_type, court_name, plaintiff, defendant, date_filed]):
                 return jsonify({'error': 'All fields are required.'}), 400
 
-            # Create input DataFrame
-            input_data = pd.DataFrame({
-                'Case Type': [case_type],
-                'Court Name': [court_name],
-                'Plaintiff': [plaintiff],
-                'Defendant': [defendant],
-                'Date Filed': [date_filed]
-            })
-
-            # Try to use ML model if available
+            # Try to use ML model if available; identical inputs are answered from the cache
             try:
-                from predict import predict_outcome
-                outcome = predict_outcome(input_data)
-                return jsonify({'prediction': str(outcome[0])})
+                outcome = predict_outcome_cached(case_type, court_name, plaintiff, defendant, date_filed)
+                return jsonify({'prediction': outcome})
             except Exception as e:
                 return jsonify({'error': f'ML model error: {str(e)}'}), 500
 
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/admin/cache-stats')
+    @token_required
+    def cache_stats():
+        if session.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        return jsonify({'backend': app.config['CACHE_TYPE'], 'namespaces': cache.stats()})
+
+    @app.route('/admin/profile')
+    @token_required
+    def sample_profile():
+        """Sample every thread of this worker for ?seconds= and return the hot stacks"""
+        if session.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        try:
+            seconds = float(request.args.get('seconds', 5))
+            interval = float(request.args.get('interval', profiling.DEFAULT_INTERVAL))
+            limit = int(request.args.get('limit', 25))
+        except ValueError:
+            return jsonify({'error': 'Invalid profiler options'}), 400
+        # nan would never reach the deadline and inf never stop; both are rejected
+        if not (math.isfinite(seconds) and math.isfinite(interval)) or seconds <= 0 or interval <= 0 or limit <= 0:
+            return jsonify({'error': 'seconds, interval and limit must be positive numbers'}), 400
+        seconds = min(seconds, profiling.MAX_SECONDS)
+        interval = min(max(interval, 0.001), 1.0)
+
+        profiler = profiling.SamplingProfiler(interval, include_idle=request.args.get('idle') == '1',
+                                              thread_filter=request.args.get('thread'))
+        try:
+            profiler.run(seconds)
+        except profiling.ProfilerBusy as e:
+            return jsonify({'error': str(e)}), 409
+        logger.info("Sampled %s stacks over %.1fs", profiler.samples, profiler.duration)
+
+        if request.args.get('format') == 'collapsed':
+            # Input for flamegraph.pl or speedscope
+            return app.response_class(profiler.collapsed() + '\n', mimetype='text/plain', headers={
+                'Content-Disposition': f'attachment; filename="profile-{os.getpid()}.collapsed"'})
+        return jsonify(dict(profiler.summary(limit), pid=os.getpid(), collapsed=profiler.collapsed()))
+
+    @app.route('/admin/profile/requests')
+    @token_required
+    def list_request_profiles():
+        if session.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        return jsonify({'pid': os.getpid(), 'profiles': request_profiles.list()})
+
+    @app.route('/admin/profile/requests/<profile_id>')
+    @token_required
+    def request_profile(profile_id):
+        if session.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        entry = request_profiles.get(profile_id)
+        if entry is None:
+            # Profiles live in the worker that served the request
+            return jsonify({'error': 'Profile not found'}), 404
+        if request.args.get('format') == 'pstats':
+            return send_file(io.BytesIO(profiling.dump_stats(entry['profile'])), as_attachment=True,
+                             download_name=f"request-{profile_id}.prof", mimetype='application/octet-stream')
+        sort = request.args.get('sort', 'cumulative')
+        try:
+            limit = int(request.args.get('limit', 40))
+        except ValueError:
+            limit = None
+        if limit is None or sort not in profiling.SORT_KEYS:
+            return jsonify({'error': 'Invalid profile options'}), 400
+        return app.response_class(profiling.format_stats(entry['profile'], sort, limit), mimetype='text/plain')
+
+    @app.route('/admin/export/<collection_name>')
+    @token_required
+    def admin_export(collection_name):
+        if session.get('role') != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        fmt = request.args.get('format', 'csv')
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        stats = {}
+        try:
+            chunks = bulk_export.export_chunks(db, collection_name, fmt, compress,
+                                               bulk_export.parse_date(request.args.get('since')),
+                                               bulk_export.parse_date(request.args.get('until')), stats=stats)
+        except bulk_export.ExportError as e:
+            return jsonify({'error': str(e)}), 400
+
+        username = session.get('username')
+
+        def stream():
+            started = time.perf_counter()
+            yield from chunks
+            logger.info("Export of %d %s as %s for %s took %.1fs", stats['rows'], collection_name, fmt,
+                        username, time.perf_counter() - started)
+
+        filename = bulk_export.export_filename(collection_name, fmt, compress)
+        return app.response_class(stream(), mimetype='application/gzip' if compress else bulk_export.FORMATS[fmt],
+                                  headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                                           'Cache-Control': 'no-store'})
+
     # Error handlers
+    @app.errorhandler(DocumentRejected)
+    def document_rejected(error):
+        return jsonify({'error': str(error)}), 400
+
     @app.errorhandler(404)
     def not_found_error(error):
         return render_template('404.html'), 404 if os.path.exists('templates/404.html') else ("Page not found", 404)
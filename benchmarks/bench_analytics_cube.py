@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Analytics cube build, incremental refresh and drill-down query times
+
+Synthetic cases.csv rows (synthetic_data.py) are loaded into the cube, then
+a batch of new and re-decided cases is folded in, and typical drill-down
+queries are timed against the same breakdown done with a pandas groupby
+over every case, which is what answering per request would cost:
+    python -m benchmarks.bench_analytics_cube --cases 1000000
+"""
+
+import argparse
+import resource
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics_cube import OutcomeCube
+from synthetic_data import DatasetProfile, SyntheticData, plan_counts
+
+CHUNK = 10000
+
+
+def synthetic_rows(data, start, count):
+    for offset in range(start, start + count, CHUNK):
+        size = min(CHUNK, start + count - offset)
+        yield from data.dataset_rows(np.random.default_rng([data.seed, offset]), offset, size)
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[max(int(len(timings) * 0.99) - 1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the outcome analytics cube")
+    parser.add_argument('--cases', type=int, default=1000000)
+    parser.add_argument('--updates', type=int, default=10000, help="New plus re-decided cases per refresh")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    data = SyntheticData(DatasetProfile.from_csv(), plan_counts(args.cases))
+    rows = list(synthetic_rows(data, 0, args.cases))
+    cube = OutcomeCube()
+    started = time.perf_counter()
+    for row in rows:
+        cube.add(row)
+    ingest = time.perf_counter() - started
+    started = time.perf_counter()
+    cube.refresh()
+    first = time.perf_counter() - started
+    stats = cube.stats()
+    print(f"{args.cases:,} cases, {stats['cells']:,} cells, dimension values {stats['dimension_values']}")
+    print(f"ingest {ingest:7.2f} s   first refresh {first * 1000:8.1f} ms   "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MiB")
+
+    # Half new cases, half existing cases whose outcome changed
+    fresh = list(synthetic_rows(data, args.cases, args.updates // 2))
+    changed = [dict(row, **{'Case Outcome': 'Settled'}) for row in rows[:args.updates - len(fresh)]]
+    for row in fresh + changed:
+        cube.add(row)
+    started = time.perf_counter()
+    cube.refresh()
+    print(f"incremental refresh of {args.updates:,} cases {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+    court = rows[0]['Court Name']
+    case_type = rows[0]['Case Type']
+    frame = pd.DataFrame(rows + fresh, columns=['Court Name', 'Case Type', 'Judge Name', 'Date Filed',
+                                                'Date of Judgment', 'Case Outcome'])
+    frame['year'] = frame['Date Filed'].str[:4]
+    frame['days'] = (pd.to_datetime(frame['Date of Judgment'], errors='coerce')
+                     - pd.to_datetime(frame['Date Filed'], errors='coerce')).dt.days
+
+    def pandas_drill_down():
+        subset = frame[(frame['Court Name'] == court) & (frame['Case Type'] == case_type)]
+        return subset.groupby(['Judge Name', 'year']).agg(cases=('Case Outcome', 'size'),
+                                                          days=('days', 'mean'))
+
+    queries = (
+        ('all cases', lambda: cube.query()),
+        ('by court', lambda: cube.query(['court'])),
+        ('court x case_type', lambda: cube.query(['court', 'case_type'])),
+        ('judge x year in court+type', lambda: cube.query(['judge', 'year'],
+                                                          {'court': [court], 'case_type': [case_type]})),
+        ('by judge, years 2018-2019', lambda: cube.query(['judge'], year_from=2018, year_to=2019)),
+        ('pandas judge x year in c+t', pandas_drill_down),
+    )
+    for name, fn in queries:
+        p50, p99 = timed(fn, args.repeat if not name.startswith('pandas') else 5)
+        print(f"{name:30s} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Citation graph build, refresh and query times at scale
+
+Generates a citation network where each case cites a few earlier cases,
+picked with a heavy-tailed preference for already-popular ones, then times
+ingestion, the first full refresh (CSR build plus PageRank for every case
+type), an incremental refresh after new cases arrive, and the queries:
+    python -m benchmarks.bench_citation_graph --cases 1000000
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from citation_graph import CitationGraph
+
+CASE_TYPES = ['IP', 'Corporate Dispute', 'Tort', 'Contract', 'Arbitration']
+
+
+def citations(rng, cases, mean_citations):
+    """Per case, the indexes of the earlier cases it cites"""
+    counts = rng.poisson(mean_citations, size=cases)
+    # Zipf ranks over earlier cases: most citations go to a small set of landmark cases
+    ranks = rng.zipf(1.6, size=int(counts.sum()))
+    cited = []
+    offset = 0
+    for case, count in enumerate(counts):
+        picks = ranks[offset:offset + count]
+        offset += count
+        cited.append([int(p - 1) for p in picks if p - 1 < case])
+    return cited
+
+
+def timed(fn, repeat=200):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the precedent citation graph")
+    parser.add_argument('--cases', type=int, default=1000000)
+    parser.add_argument('--citations', type=float, default=3.0, help="Mean precedents cited per case")
+    parser.add_argument('--increment', type=int, default=1000, help="Cases added before the incremental refresh")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    cited = citations(rng, args.cases + args.increment, args.citations)
+    types = rng.integers(len(CASE_TYPES), size=args.cases + args.increment)
+    title = lambda i: f"Party {i} vs Party {i + 1}"
+
+    graph = CitationGraph()
+    started = time.perf_counter()
+    for case in range(args.cases):
+        graph.add_case(f"C-{case}", title(case), CASE_TYPES[types[case]],
+                       cited='; '.join(title(p) for p in cited[case]))
+    ingest = time.perf_counter() - started
+
+    started = time.perf_counter()
+    snapshot = graph.refresh()
+    first = time.perf_counter() - started
+    print(f"{args.cases:,} cases, {len(snapshot.graph.indices):,} edges, {len(CASE_TYPES) + 1} PageRank columns")
+    print(f"ingest {ingest:8.2f} s   first refresh {first:6.2f} s ({snapshot.iterations} iterations)")
+
+    for case in range(args.cases, args.cases + args.increment):
+        graph.add_case(f"C-{case}", title(case), CASE_TYPES[types[case]],
+                       cited='; '.join(title(p) for p in cited[case]))
+    started = time.perf_counter()
+    snapshot = graph.refresh()
+    print(f"incremental refresh after {args.increment:,} cases {time.perf_counter() - started:6.2f} s "
+          f"({snapshot.iterations} iterations, warm start)")
+
+    ranked = graph.authoritative(limit=100)
+    landmark, typical = ranked[0]['precedent'], ranked[-1]['precedent']
+    for name, fn in (('authoritative(case_type, 10)', lambda: graph.authoritative('Tort', 10)),
+                     ('features(3 precedents)', lambda: graph.features([title(1), title(2), title(3)])),
+                     ('prompt_context(case_type)', lambda: graph.prompt_context('IP')),
+                     ('co_cited(top precedent)', lambda: graph.co_cited(landmark, 10)),
+                     ('co_cited(100th precedent)', lambda: graph.co_cited(typical, 10))):
+        p50, p99 = timed(fn)
+        print(f"{name:32s} p50 {p50:8.3f} ms  p99 {p99:8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark models.get_upcoming_hearings against a seeded local mongod
+
+Run from the project root (seeding 1M hearings takes a few minutes once):
+    python -m benchmarks.bench_dashboard --seed --hearings 1000000
+    python -m benchmarks.bench_dashboard
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient, monitoring
+
+from config import TestingConfig
+import models
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server, i.e. network round trips"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def seed(db, users, cases, hearings, batch_size=10000):
+    print(f"Seeding {users} users, {cases} cases, {hearings} hearings...")
+    rng = random.Random(7)
+    db.cases.drop()
+    db.hearings.drop()
+
+    user_ids = [f"user-{i}" for i in range(users)]
+    case_ids = []
+    batch = []
+    for i in range(cases):
+        doc = models.create_case(f"CASE-{i:07d}", f"Case {i}", 'civil',
+                                 {'id': rng.choice(user_ids)}, {'id': rng.choice(user_ids)},
+                                 rng.choice(user_ids))
+        batch.append(doc)
+        if len(batch) == batch_size:
+            case_ids.extend(db.cases.insert_many(batch, ordered=False).inserted_ids)
+            batch = []
+    if batch:
+        case_ids.extend(db.cases.insert_many(batch, ordered=False).inserted_ids)
+
+    now = datetime.utcnow()
+    batch = []
+    for i in range(hearings):
+        doc = models.create_hearing(rng.choice(case_ids), now + timedelta(days=rng.randrange(-180, 180)),
+                                    'Justice A', f"Courtroom {rng.randrange(20)}", 'Hearing')
+        if rng.random() < 0.2:
+            doc['status'] = 'completed'
+        batch.append(doc)
+        if len(batch) == batch_size:
+            db.hearings.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.hearings.insert_many(batch, ordered=False)
+
+    db.cases.create_index("case_number", unique=True)
+    db.cases.create_index("filed_by")
+    db.cases.create_index("plaintiff.id")
+    db.cases.create_index("defendant.id")
+    db.hearings.create_index([("case_id", 1), ("date", 1)])
+    db.hearings.create_index([("status", 1), ("date", 1)])
+
+
+def legacy_upcoming_hearings(db, user_id, days=30):
+    """The previous implementation, with the $in fixed to pass ids instead of documents"""
+    cases = list(db.cases.find(models.user_cases_filter(user_id)).sort('filing_date', -1))
+    now = datetime.utcnow()
+    query = {
+        'date': {'$gte': now, '$lte': now + timedelta(days=days)},
+        'status': 'scheduled',
+        'case_id': {'$in': [c['_id'] for c in cases]}
+    }
+    return list(db.hearings.find(query).sort('date', 1))
+
+
+def measure(fn, db, user_ids, counter):
+    timings = []
+    before = counter.count
+    for user_id in user_ids:
+        started = time.perf_counter()
+        fn(db, user_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'p50_ms': statistics.median(timings),
+        'p95_ms': timings[int(len(timings) * 0.95) - 1],
+        'round_trips': (counter.count - before) / len(user_ids)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dashboard query implementations")
+    parser.add_argument('--mongodb-url', default=TestingConfig.MONGODB_URL)
+    parser.add_argument('--seed', action='store_true', help="Drop and reseed cases and hearings")
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--cases', type=int, default=100000)
+    parser.add_argument('--hearings', type=int, default=1000000)
+    parser.add_argument('--samples', type=int, default=200)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = MongoClient(args.mongodb_url, event_listeners=[counter])
+    db = client.get_default_database('court_test')
+
+    if args.seed:
+        seed(db, args.users, args.cases, args.hearings)
+
+    user_ids = [f"user-{i}" for i in random.Random(1).sample(range(args.users), args.samples)]
+    print(f"Hearings in collection: {db.hearings.estimated_document_count()}")
+    for name, fn in (('legacy find + $in', legacy_upcoming_hearings),
+                     ('aggregation', lambda d, u: models.get_upcoming_hearings(d, u))):
+        result = measure(fn, db, user_ids, counter)
+        print(f"{name:20s} p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  "
+              f"round trips {result['round_trips']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
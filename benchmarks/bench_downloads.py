@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the document download endpoint
+
+Start the app (ideally behind a sendfile-capable server), upload a large PDF
+through case filing, then run from the project root:
+    python -m benchmarks.bench_downloads --document-id <id> --username admin --password ...
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+
+def login(base_url, username, password):
+    session = requests.Session()
+    response = session.post(f"{base_url}/login", data={'username': username, 'password': password},
+                            allow_redirects=False)
+    if response.status_code != 302 or 'session' not in session.cookies:
+        raise SystemExit("❌ Login failed")
+    return session
+
+
+def run(base_url, cookies, document_id, requests_per_worker, headers, results, lock):
+    session = requests.Session()
+    session.cookies.update(cookies)
+    url = f"{base_url}/documents/{document_id}"
+    latencies = []
+    transferred = 0
+    for _ in range(requests_per_worker):
+        started = time.perf_counter()
+        with session.get(url, headers=headers, stream=True) as response:
+            for chunk in response.iter_content(256 * 1024):
+                transferred += len(chunk)
+            status = response.status_code
+        latencies.append(time.perf_counter() - started)
+        if status not in (200, 206, 304):
+            print(f"⚠️  Unexpected status {status}")
+    with lock:
+        results.append((latencies, transferred))
+
+
+def benchmark(base_url, cookies, document_id, concurrency, per_worker, headers):
+    results = []
+    lock = threading.Lock()
+    threads = [threading.Thread(target=run, args=(base_url, cookies, document_id, per_worker, headers, results, lock))
+               for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for batch, _ in results for l in batch)
+    transferred = sum(t for _, t in results)
+    return {
+        'requests_per_second': len(latencies) / elapsed,
+        'megabytes_per_second': transferred / elapsed / (1024 * 1024),
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent download throughput benchmark")
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--document-id', required=True)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help="Requests per worker")
+    args = parser.parse_args()
+
+    session = login(args.base_url, args.username, args.password)
+    etag = session.head(f"{args.base_url}/documents/{args.document_id}").headers.get('ETag')
+
+    scenarios = [
+        ('full download', {}),
+        ('range 1MB', {'Range': 'bytes=0-1048575'}),
+        ('If-None-Match', {'If-None-Match': etag} if etag else {})
+    ]
+    for name, headers in scenarios:
+        result = benchmark(args.base_url, session.cookies, args.document_id,
+                           args.concurrency, args.requests, headers)
+        print(f"{name:15s} {result['requests_per_second']:8.1f} req/s  {result['megabytes_per_second']:8.1f} MB/s  "
+              f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
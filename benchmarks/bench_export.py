@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Bulk export throughput and peak memory against document count
+
+Each export runs in its own process so its peak RSS is its own. Documents
+are synthetic predictions (synthetic_data.py) with ipc_analysis and
+judgment_prediction padded to --text-chars, served on demand in _id order,
+so the source itself holds one batch at a time; pass --mongodb-url to
+export a seeded court_db instead:
+    python -m benchmarks.bench_export --cases 100000,1000000
+
+Peak memory should be flat across sizes. The in-memory row loads every
+document before writing, for comparison, at --in-memory-cases.
+"""
+
+import argparse
+import csv
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from bson import ObjectId
+
+import bulk_export
+from synthetic_data import DatasetProfile, SyntheticData, object_id, plan_counts
+
+
+class GeneratedCollection:
+    """Predictions generated on demand for the range queries bulk_export issues
+
+    A pool of TEMPLATES synthetic predictions is generated once and replayed
+    under fresh _ids, so the benchmark measures the export rather than the
+    generator.
+    """
+
+    TEMPLATES = 1000
+
+    def __init__(self, count, text_chars):
+        self.count = count
+        data = SyntheticData(DatasetProfile.from_csv(), plan_counts(self.TEMPLATES * 2))
+        self.templates = data.generate('predictions', 0, self.TEMPLATES)
+        for doc in self.templates:
+            for field in ('ipc_analysis', 'judgment_prediction'):
+                text = doc[field] + ' '
+                doc[field] = (text * (text_chars // len(text) + 1))[:text_chars]
+
+    def find(self, query=None, projection=None):
+        return _GeneratedCursor(self, query or {})
+
+    def documents(self, start, stop):
+        for index in range(start, stop):
+            yield dict(self.templates[index % self.TEMPLATES], _id=object_id('predictions', index))
+
+
+class _GeneratedCursor:
+    def __init__(self, collection, query):
+        self.collection = collection
+        after = query.get('_id', {}).get('$gt')
+        self.start = int.from_bytes(ObjectId(after).binary[1:], 'big') + 1 if after is not None else 0
+        self.stop = collection.count
+
+    def sort(self, key, direction):
+        return self
+
+    def limit(self, size):
+        self.stop = min(self.stop, self.start + size)
+        return self
+
+    def __iter__(self):
+        return self.collection.documents(self.start, self.stop)
+
+
+def source(args):
+    if args.mongodb_url:
+        from pymongo import MongoClient
+        return MongoClient(args.mongodb_url).court_db
+    return {'predictions': GeneratedCollection(args.cases_single, args.text_chars)}
+
+
+def child(args):
+    db = source(args)
+    started = time.perf_counter()
+    written = 0
+    stats = {}
+    if args.in_memory:
+        # What the export would cost without streaming: load everything, then write it out
+        docs = list(db['predictions'].find({}).sort('_id', 1).limit(args.cases_single))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        fields = bulk_export.COLLECTIONS['predictions']
+        writer.writerow(fields)
+        writer.writerows([bulk_export._cell(doc.get(name)) for name in fields] for doc in docs)
+        written = len(buffer.getvalue().encode('utf-8'))
+        stats['rows'] = len(docs)
+    else:
+        for chunk in bulk_export.export_chunks(db, 'predictions', args.format, args.gzip, stats=stats):
+            written += len(chunk)
+    print(json.dumps({'rows': stats['rows'], 'bytes': written, 'seconds': time.perf_counter() - started,
+                      'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming bulk export")
+    parser.add_argument('--cases', default='100000,1000000', help="Comma-separated document counts")
+    parser.add_argument('--formats', default='csv,ndjson,ndjson+gzip', help="Formats to run (+gzip to compress)")
+    parser.add_argument('--text-chars', type=int, default=3000, help="Length of each generated analysis text")
+    parser.add_argument('--in-memory-cases', type=int, default=50000)
+    parser.add_argument('--mongodb-url')
+    # Internal: run one export in this process and report
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--cases-single', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--format', default='csv', help=argparse.SUPPRESS)
+    parser.add_argument('--gzip', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--in-memory', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    runs = [(fmt, count, False) for fmt in args.formats.split(',') for count in map(int, args.cases.split(','))]
+    if args.in_memory_cases:
+        runs.append(('csv', args.in_memory_cases, True))
+    for fmt, count, in_memory in runs:
+        name, _, compress = fmt.partition('+')
+        command = [sys.executable, '-m', 'benchmarks.bench_export', '--child', '--cases-single', str(count),
+                   '--format', name, '--text-chars', str(args.text_chars)]
+        command += ['--gzip'] if compress else []
+        command += ['--in-memory'] if in_memory else []
+        command += ['--mongodb-url', args.mongodb_url] if args.mongodb_url else []
+        result = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+        label = f"{fmt}{' (in memory)' if in_memory else ''}"
+        print(f"{label:20s} {result['rows']:>9,} docs  {result['bytes'] / 2 ** 20:9,.0f} MiB  "
+              f"{result['seconds']:7.1f} s  {result['rows'] / result['seconds']:8,.0f} docs/s  "
+              f"peak RSS {result['peak_rss_mib']:7,.0f} MiB", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Request latency with the old eager logging versus the queued JSON pipeline
+
+Runs a small Flask app shaped like the /cases view (a token check, then a
+listing of filings) through the test client, once with the previous logging
+calls and once with lazy calls through logging_pipeline:
+    python -m benchmarks.bench_logging --filings 500 --requests 2000
+"""
+
+import argparse
+import contextlib
+import datetime
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from bson import ObjectId
+from flask import Flask, jsonify
+
+import logging_pipeline
+
+logger = logging.getLogger('bench.cases')
+
+
+def sample_filings(n):
+    now = datetime.datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'case_number': f"CASE-20240101-{i:04d}",
+        'case_type': 'civil',
+        'plaintiff_name': f"Plaintiff {i}",
+        'defendant_name': f"Defendant {i}",
+        'case_description': 'Breach of contract over delayed delivery of goods ' * 4,
+        'filing_date': now,
+        'status': 'pending'
+    } for i in range(n)]
+
+
+def make_app(filings, eager):
+    app = Flask(__name__)
+
+    @app.route('/cases')
+    def cases():
+        if eager:
+            print("Token verified successfully")
+            logger.info(f"Found {len(filings)} cases")
+            logger.debug(f"Cases data: {filings}")
+        else:
+            logger.debug("Token verified for %s", 'bench-user')
+            logger.info("Found %d cases", len(filings))
+        return jsonify({'count': len(filings)})
+
+    return app
+
+
+def measure(app, requests):
+    client = app.test_client()
+    for _ in range(50):
+        client.get('/cases')
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client.get('/cases')
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request latency under each logging setup")
+    parser.add_argument('--filings', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    filings = sample_filings(args.filings)
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'app.log')
+        with open(log_path, 'a') as log_file, contextlib.redirect_stdout(log_file):
+            # Before: synchronous handler on the request thread, f-strings built eagerly
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            handler = logging.StreamHandler(log_file)
+            root.addHandler(handler)
+            root.setLevel(logging.INFO)
+            before = measure(make_app(filings, eager=True), args.requests)
+            root.removeHandler(handler)
+
+            # After: lazy arguments, records formatted as JSON on the writer thread
+            logging_pipeline.configure_logging(level='INFO', fmt='json', stream=log_file)
+            after = measure(make_app(filings, eager=False), args.requests)
+            logging_pipeline.shutdown_logging()
+
+    for name, (p50, p95, mean) in (('eager + sync', before), ('lazy + queued', after)):
+        print(f"{name:14s} p50 {p50:7.3f} ms  p95 {p95:7.3f} ms  mean {mean:7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
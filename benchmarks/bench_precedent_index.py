@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Precedent index build time, query latency and IVF recall at scale
+
+Synthetic cases.csv rows (synthetic_data.py, vocabulary and text lengths
+from the real dataset) are indexed into a temporary directory, then queried
+with the facts of held-out synthetic cases:
+    python -m benchmarks.bench_precedent_index --cases 1000000
+
+Recall is the share of the exact top-k (a full scan of the same vectors)
+that the IVF search returns. Real case law clusters by subject, so each
+synthetic case is given one of --topics subjects and draws most of its
+words from that subject's vocabulary; --topics 0 keeps the independently
+drawn words of synthetic_data.py, which have no neighbourhood structure at
+all and are the worst case for IVF.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+import precedent_index
+from precedent_index import PrecedentIndex, build
+from synthetic_data import DatasetProfile, SyntheticData, plan_counts
+
+CHUNK = 10000
+TOPIC_WORDS = 40
+TOPIC_SHARE = 0.7
+TEXT_COLUMNS = list(precedent_index.TEXT_FIELDS)
+
+
+def synthetic_rows(data, start, count, topics=0):
+    words = np.asarray(data.profile.words)
+    vocabularies = np.random.default_rng(data.seed).choice(len(words), size=(max(topics, 1), TOPIC_WORDS))
+    for offset in range(start, start + count, CHUNK):
+        size = min(CHUNK, start + count - offset)
+        rng = np.random.default_rng([data.seed, offset])
+        rows = data.dataset_rows(rng, offset, size)
+        if topics:
+            subjects = rng.integers(topics, size=size)
+            for row, subject in zip(rows, subjects):
+                for column in TEXT_COLUMNS[:2]:
+                    text = row[column].rstrip('.').split()
+                    picks = words[vocabularies[subject, rng.integers(TOPIC_WORDS, size=len(text))]]
+                    row[column] = ' '.join(np.where(rng.random(len(text)) < TOPIC_SHARE, picks, text)) + '.'
+        yield from rows
+
+
+def timed(fn, queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[max(int(len(timings) * 0.99) - 1, 0)]
+
+
+def exact_top(files, query, k):
+    scores = np.concatenate([np.asarray(files.vectors[s:s + precedent_index.CHUNK_ROWS], dtype=np.float32) @ query
+                             for s in range(0, len(files), precedent_index.CHUNK_ROWS)])
+    return set(precedent_index._top(scores, k).tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the precedent retrieval index")
+    parser.add_argument('--cases', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--topics', type=int, default=1000, help="Subjects cases are drawn from (0: none)")
+    parser.add_argument('--probes', default='8,16,32,64', help="IVF probe counts to measure")
+    parser.add_argument('--output', help="Index directory to keep (default: a temporary directory)")
+    args = parser.parse_args()
+
+    data = SyntheticData(DatasetProfile.from_csv(), plan_counts(args.cases))
+    workdir = tempfile.mkdtemp(prefix='precedent-bench-')
+    path = args.output or os.path.join(workdir, 'index')
+    try:
+        started = time.perf_counter()
+        build(path, synthetic_rows(data, 0, args.cases, args.topics))
+        built = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        index = PrecedentIndex(path)
+        files = index._index()
+        print(f"{args.cases:,} cases ({args.topics or 'no'} topics), {files.dims} dims, {size / 2 ** 20:,.0f} MiB on disk, "
+              f"{'IVF ' + str(len(files.centroids)) + ' clusters' if files.centroids is not None else 'exact'}")
+        print(f"build {built:8.1f} s ({args.cases / built:,.0f} cases/s)")
+
+        held_out = list(synthetic_rows(data, args.cases, args.queries, args.topics))
+        texts = [row['Summary of Facts'] + ' ' + row['Ratio Decidendi'] for row in held_out]
+        vectors = [index.embed(text) for text in texts]
+        exact = [exact_top(files, vector, args.k) for vector in vectors]
+
+        p50, p99 = timed(lambda q: exact_top(files, q, args.k), vectors[:20])
+        print(f"{'exact full scan':28s} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  recall 1.000")
+        if files.centroids is None:
+            p50, p99 = timed(lambda text: index.search(text, args.k), texts)
+            print(f"{'search()':28s} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms")
+            return
+        for probes in (int(p) for p in args.probes.split(',')):
+            found = []
+            for text, truth in zip(texts, exact):
+                ids = {m['case_id'] for m in index.search(text, args.k, probes=probes)}
+                truth_ids = {files.record(p)['case_id'] for p in truth}
+                found.append(len(ids & truth_ids) / max(len(truth_ids), 1))
+            p50, p99 = timed(lambda text: index.search(text, args.k, probes=probes), texts)
+            print(f"{'search() probes=' + str(probes):28s} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  "
+                  f"recall {statistics.mean(found):.3f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Overhead of the live profilers on request latency
+
+Runs a CPU-bound view shaped like /ml_predict preprocessing (label lookups
+and date parsing over a small frame) through the Flask test client with no
+profiler, with SamplingProfiler running at several intervals, and with the
+per-request cProfile mode switched on by the X-Profile header:
+    python -m benchmarks.bench_profiler --requests 2000
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+import pandas as pd
+from flask import Flask, jsonify
+
+import profiling
+
+CASE_TYPES = [f"Type {i}" for i in range(40)]
+COURTS = [f"Court {i}" for i in range(60)]
+
+
+def make_app(per_request_profile):
+    app = Flask(__name__)
+    codes = {name: i for i, name in enumerate(CASE_TYPES + COURTS)}
+    frame = pd.DataFrame({
+        'Case Type': [CASE_TYPES[i % 40] for i in range(50)],
+        'Court Name': [COURTS[i % 60] for i in range(50)],
+        'Date Filed': ['2024-09-25'] * 50
+    })
+    if per_request_profile:
+        profiling.init_app(app, lambda: True)
+
+    @app.route('/predict')
+    def predict():
+        data = frame.copy()
+        data['Case Type'] = data['Case Type'].map(codes)
+        data['Court Name'] = data['Court Name'].map(codes)
+        data['Date Filed'] = pd.to_datetime(data['Date Filed'], errors='coerce').map(lambda x: x.timestamp())
+        return jsonify({'rows': len(data), 'checksum': float(data.sum(numeric_only=True).sum())})
+
+    return app
+
+
+def measure(app, requests, headers=None):
+    client = app.test_client()
+    for _ in range(50):
+        client.get('/predict', headers=headers)
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client.get('/predict', headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], statistics.mean(timings)
+
+
+def with_sampler(interval, fn):
+    """Run fn while a SamplingProfiler samples the process from another thread"""
+    stop = threading.Event()
+    profiler = profiling.SamplingProfiler(interval)
+
+    def sample():
+        while not stop.is_set():
+            profiler.run(0.5)
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+        return fn()
+    finally:
+        stop.set()
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request latency under each profiling mode")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=3, help="Modes are interleaved; medians are reported")
+    args = parser.parse_args()
+
+    plain = make_app(per_request_profile=False)
+    profiled = make_app(per_request_profile=True)
+    modes = [('no profiler', lambda: measure(plain, args.requests))]
+    for interval in (0.01, 0.005, 0.001):
+        modes.append((f"sampling {interval * 1000:g} ms",
+                      lambda interval=interval: with_sampler(interval, lambda: measure(plain, args.requests))))
+    modes.append(('cProfile/request',
+                  lambda: measure(profiled, args.requests, headers={profiling.PROFILE_HEADER: '1'})))
+
+    # Warm pandas' caches so the baseline is not charged for them
+    measure(plain, args.requests // 4)
+    runs = {name: [] for name, _ in modes}
+    for _ in range(args.rounds):
+        for name, run in modes:
+            runs[name].append(run())
+
+    results = [(name, tuple(statistics.median(values) for values in zip(*runs[name]))) for name, _ in modes]
+    baseline = results[0][1][2]
+    for name, (p50, p95, mean) in results:
+        print(f"{name:17s} p50 {p50:7.3f} ms  p95 {p95:7.3f} ms  mean {mean:7.3f} ms  "
+              f"overhead {100 * (mean - baseline) / baseline:+6.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batch hearing scheduler on a synthetic docket
+
+Run from the project root:
+    python -m benchmarks.bench_scheduler --cases 100000
+"""
+
+import argparse
+import datetime
+import random
+import time
+
+from hearing_scheduler import plan_hearings, CASE_TYPE_PRIORITY, parse_courtrooms
+
+
+def synthetic_docket(n, seed=42, start=datetime.date(2024, 1, 1), days=365):
+    """Pending filings spread over a year with a realistic case-type mix"""
+    rng = random.Random(seed)
+    case_types = list(CASE_TYPE_PRIORITY) + ['other']
+    weights = [5, 30, 20, 40, 5]
+    cases = []
+    for i in range(n):
+        filed = start + datetime.timedelta(days=rng.randrange(days))
+        cases.append({
+            '_id': i,
+            'case_number': f"CASE-{filed:%Y%m%d}-{i:06d}",
+            'case_type': rng.choices(case_types, weights)[0],
+            'filing_date': datetime.datetime.combine(filed, datetime.time())
+        })
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plan_hearings on a synthetic docket")
+    parser.add_argument('--cases', type=int, default=100000)
+    parser.add_argument('--judges', type=int, default=60)
+    parser.add_argument('--courtrooms', default='40')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cases = synthetic_docket(args.cases)
+    judges = [f"Justice {i:03d}" for i in range(args.judges)]
+    courtrooms = parse_courtrooms(args.courtrooms)
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        assignments, unscheduled = plan_hearings(cases, judges, courtrooms,
+                                                 start_date=datetime.date(2024, 1, 15), max_days=3650)
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    print(f"Cases: {args.cases}  Judges: {args.judges}  Courtrooms: {len(courtrooms)}")
+    print(f"Scheduled: {len(assignments)}  Unscheduled: {len(unscheduled)}")
+    print(f"Last hearing: {max(a[3] for a in assignments)}")
+    print(f"Best of {args.repeat}: {best:.3f}s ({args.cases / best:,.0f} cases/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Requests per second on /ml_predict: development server versus the pre-fork server
+
+Starts each server as a subprocess on its own port, logs in once with the
+given credentials, then drives POST /ml_predict from concurrent keep-alive
+clients for a fixed time. Filing dates are varied so most requests miss the
+prediction cache and reach the model. Needs MONGODB_URL and a trained model:
+    python -m benchmarks.bench_serving --username admin --password ... --concurrency 32
+"""
+
+import argparse
+import http.client
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEV_SERVER = ("from app import create_app; "
+              "create_app().run(debug=True, use_reloader=False, host='127.0.0.1', port={port})")
+
+
+def wait_until_up(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/login')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def login(port, username, password):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    body = urllib.parse.urlencode({'username': username, 'password': password})
+    connection.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie')
+    if response.status != 302 or not cookie:
+        raise RuntimeError(f"Login failed with status {response.status}")
+    return cookie.split(';', 1)[0]
+
+
+def drive(port, cookie, concurrency, seconds):
+    timings = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client(seed):
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.monotonic() < deadline:
+            body = urllib.parse.urlencode({
+                'case_type': rng.choice(['Civil', 'Criminal', 'Corporate Dispute']),
+                'court_name': f"Court {rng.randrange(20)}",
+                'plaintiff_name': f"P{rng.randrange(100)}",
+                'defendant_name': f"D{rng.randrange(100)}",
+                'date_filed': f"20{rng.randrange(10, 25)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}"
+            })
+            started = time.perf_counter()
+            try:
+                connection.request('POST', '/ml_predict', body, {
+                    'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+            local.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            timings.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'errors': errors[0],
+        'rps': len(timings) / elapsed,
+        'p50': statistics.median(timings) if timings else 0,
+        'p95': timings[int(len(timings) * 0.95) - 1] if timings else 0
+    }
+
+
+def run(name, command, port, args):
+    process = subprocess.Popen(command, cwd=args.cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               env=dict(os.environ, PYTHONPATH=os.pathsep.join(
+                                   filter(None, [ROOT, os.getenv('PYTHONPATH')]))))
+    try:
+        wait_until_up(port)
+        cookie = login(port, args.username, args.password)
+        drive(port, cookie, args.concurrency, 2)
+        result = drive(port, cookie, args.concurrency, args.seconds)
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+    print(f"{name:28s} {result['rps']:8.1f} req/s  p50 {result['p50']:7.1f} ms  "
+          f"p95 {result['p95']:7.1f} ms  errors {result['errors']}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare /ml_predict throughput of the dev and pre-fork servers")
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--workers', type=int, help="Pre-fork workers (default: server.default_workers())")
+    parser.add_argument('--threads', type=int, help="Threads per worker (default: server.default_threads())")
+    parser.add_argument('--port', type=int, default=5051)
+    parser.add_argument('--cwd', default=ROOT, help="Directory holding models/ (default: project root)")
+    args = parser.parse_args()
+
+    # Same keys in every process so the session cookie from login is accepted everywhere
+    os.environ.setdefault('FLASK_SECRET_KEY', 'bench-flask-secret')
+    os.environ.setdefault('JWT_SECRET_KEY', 'bench-jwt-secret')
+
+    print(f"POST /ml_predict, {args.concurrency} concurrent clients, {args.seconds:g}s each")
+    run('dev server (app.run)', [sys.executable, '-c', DEV_SERVER.format(port=args.port)], args.port, args)
+    serve = [sys.executable, os.path.join(ROOT, 'main.py'), 'serve', '--host', '127.0.0.1',
+             '--port', str(args.port + 1)]
+    if args.workers:
+        serve += ['--workers', str(args.workers)]
+    if args.threads:
+        serve += ['--threads', str(args.threads)]
+    run('pre-fork (main.py serve)', serve, args.port + 1, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Per-module import-time breakdown of the application
+
+Imports a module in a fresh interpreter under `python -X importtime` and
+summarises the result: the slowest modules by cumulative time, and self
+time totalled per top-level package so a dependency's whole cost shows up
+on one line. With --create-app the app factory is also timed.
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --module utlis --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should never be loaded just by starting the web app
+HEAVY_MODULES = ('pandas', 'sklearn', 'joblib', 'google.generativeai', 'tensorflow')
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+created = None
+if {create_app}:
+    {module}.create_app()
+    created = time.perf_counter() - imported
+print('PROBE', imported - started, created, ','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def profile(module='app', create_app=False, env=None):
+    """Run the import probe; returns (entries, import seconds, create_app seconds, heavy modules loaded)"""
+    code = PROBE.format(module=module, create_app=create_app, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True, env=env)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), int(self_us), int(cumulative_us), len(name) - len(name.lstrip())))
+    probe = [line for line in result.stdout.splitlines() if line.startswith('PROBE ')]
+    if not probe:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    _, imported, created, heavy = probe[-1].split(' ', 3)
+    return entries, float(imported), None if created == 'None' else float(created), [m for m in heavy.split(',') if m]
+
+
+def by_package(entries):
+    totals = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show where import time goes")
+    parser.add_argument('--module', default='app', help="Module to import (default: app)")
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--create-app', action='store_true', help="Also time module.create_app()")
+    args = parser.parse_args(argv)
+
+    entries, imported, created, heavy = profile(args.module, args.create_app)
+    print(f"import {args.module}: {imported * 1000:.0f} ms", end='')
+    print(f", create_app(): {created * 1000:.0f} ms" if created is not None else '')
+    print(f"heavy modules loaded: {', '.join(heavy) or 'none'}")
+
+    print("\nSlowest modules (cumulative, including their imports)")
+    for name, _, cumulative_us, depth in sorted(entries, key=lambda e: e[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {'  ' * min(depth // 2, 6)}{name}")
+
+    print("\nSelf time by top-level package")
+    for package, self_us in by_package(entries)[:args.top]:
+        print(f"  {self_us / 1000:9.1f} ms  {package}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
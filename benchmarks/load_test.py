@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Load driver: replays a realistic mix of user traffic against a running app
+
+Virtual users log in as synthetic users (see synthetic_data.py) and then
+pick weighted actions: dashboard and listing pages, case lookups, legal
+resource search, new filings, ML and Gemini predictions. Latency
+percentiles are reported per action and overall:
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --cases 1000000 --users 50 --seconds 120
+    python -m benchmarks.load_test --rate 200 --mix predict=0,cases=1 --json results.json
+
+Without --rate each virtual user runs closed-loop with --think-time pauses.
+With --rate requests start on a fixed schedule and latency is measured from
+the scheduled start, so a stalled server shows up as queueing time rather
+than as fewer, faster requests.
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import queue
+import random
+import threading
+import time
+import urllib.parse
+
+from synthetic_data import (DEFAULT_PASSWORD, FILING_CASE_TYPES, USERNAME_FORMAT, DatasetProfile, object_id,
+                            plan_counts)
+
+# Relative weights of each action
+DEFAULT_MIX = {
+    'login': 3,
+    'welcome': 15,
+    'case_filing': 8,
+    'hearing_schedule': 8,
+    'case_lookup': 15,
+    'legal_search': 10,
+    'legal_suggest': 6,
+    'submit_filing': 8,
+    'ml_predict': 15,
+    'predict': 3,
+    'prediction_detail': 6,
+    # Renders every filing; off by default because it dominates everything else at scale
+    'cases': 0
+}
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+class VirtualUser:
+    """One browser session: its own keep-alive connection and session cookie"""
+
+    def __init__(self, driver, seed):
+        self.driver = driver
+        self.rng = random.Random(seed)
+        self.connection = None
+        self.cookie = None
+        self.prediction_id = None
+
+    def request(self, method, path, fields=None):
+        body = urllib.parse.urlencode(fields) if fields is not None else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body is not None else {}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.driver.host, self.driver.port,
+                                                             timeout=self.driver.timeout)
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    self.close()
+                return response, data
+            except (OSError, http.client.HTTPException):
+                self.close()
+                # A keep-alive connection the server already closed is retried once
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    # Actions: each returns True when the response is what a browser would accept
+
+    def login(self):
+        self.cookie = None
+        username = USERNAME_FORMAT.format(self.rng.randrange(self.driver.user_count))
+        response, _ = self.request('POST', '/login', {'username': username, 'password': self.driver.password})
+        cookie = response.getheader('Set-Cookie')
+        if response.status != 302 or not cookie:
+            return False
+        self.cookie = cookie.split(';', 1)[0]
+        return True
+
+    def _get(self, path):
+        response, _ = self.request('GET', path)
+        return response.status == 200
+
+    def welcome(self):
+        return self._get('/welcome')
+
+    def case_filing(self):
+        return self._get('/case-filing')
+
+    def hearing_schedule(self):
+        return self._get('/hearing-schedule')
+
+    def cases(self):
+        return self._get('/cases')
+
+    def case_lookup(self):
+        params = {'party': self.rng.choice(self.driver.parties)}
+        if self.rng.random() < 0.3:
+            params['status'] = self.rng.choice(['pending', 'scheduled', 'closed'])
+        return self._get('/api/case-lookup?' + urllib.parse.urlencode(params))
+
+    def legal_search(self):
+        words = self.rng.sample(self.driver.words, 2)
+        return self._get('/api/legal-resources/search?' + urllib.parse.urlencode({'q': ' '.join(words)}))
+
+    def legal_suggest(self):
+        word = self.rng.choice(self.driver.words)
+        return self._get('/api/legal-resources/suggest?' + urllib.parse.urlencode({'q': word[:3]}))
+
+    def submit_filing(self):
+        response, _ = self.request('POST', '/submit-case-filing', {
+            'case_type': self.rng.choice(FILING_CASE_TYPES),
+            'filing_date': datetime.date.today().isoformat(),
+            'plaintiff_name': self.rng.choice(self.driver.parties),
+            'defendant_name': self.rng.choice(self.driver.parties),
+            'case_description': 'Load test filing',
+            'lawyer_name': f"Advocate {self.rng.randrange(2000):04d}"
+        })
+        return response.status == 302
+
+    def ml_predict(self):
+        response, _ = self.request('POST', '/ml_predict', {
+            'case_type': self.rng.choice(self.driver.case_types),
+            'court_name': self.rng.choice(self.driver.courts),
+            'plaintiff_name': self.rng.choice(self.driver.parties),
+            'defendant_name': self.rng.choice(self.driver.parties),
+            'date_filed': (datetime.date(2015, 1, 1) + datetime.timedelta(days=self.rng.randrange(3650))).isoformat()
+        })
+        return response.status == 200
+
+    def predict(self):
+        response, data = self.request('POST', '/predict', {
+            'case_id': f"LOAD-{self.rng.randrange(10 ** 9)}",
+            'case_type': self.rng.choice(self.driver.case_types),
+            'plaintiff_name': self.rng.choice(self.driver.parties),
+            'plaintiff_args': 'The defendant failed to deliver the goods within the agreed period.',
+            'defendant_name': self.rng.choice(self.driver.parties),
+            'defendant_args': 'Delivery was delayed by events outside the defendant\'s control.',
+            'date_filed': datetime.date.today().isoformat(),
+            'legal_principles': 'Breach of contract, force majeure',
+            'judge_name': 'Justice Synthetic',
+            'court_name': self.rng.choice(self.driver.courts)
+        })
+        if response.status != 200:
+            return False
+        self.prediction_id = json.loads(data).get('prediction_id')
+        return True
+
+    def prediction_detail(self):
+        # Only the owner may view a prediction; before this user made one, view somebody else's and
+        # measure the redirect, which costs the same lookup
+        prediction_id = self.prediction_id or str(object_id('predictions', self.rng.randrange(
+            self.driver.prediction_count)))
+        response, _ = self.request('GET', f"/prediction/{prediction_id}")
+        return response.status in (200, 302)
+
+
+class LoadDriver:
+    def __init__(self, url, user_count, prediction_count, profile, mix=None, password=DEFAULT_PASSWORD,
+                 timeout=30):
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 80
+        self.user_count = user_count
+        self.prediction_count = prediction_count
+        self.password = password
+        self.timeout = timeout
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+        self.parties = profile.parties.values
+        self.case_types = profile.categorical['Case Type'].values
+        self.courts = profile.categorical['Court Name'].values
+        self.words = [str(word) for word in profile.words[:500] if len(word) > 3]
+        self._lock = threading.Lock()
+        # Logging in happens whatever its weight: a user without a session has to
+        actions = list(self.mix) + ([] if 'login' in self.mix else ['login'])
+        self.timings = {name: [] for name in actions}
+        self.errors = {name: 0 for name in actions}
+
+    def _record(self, action, seconds, ok):
+        with self._lock:
+            self.timings[action].append(seconds)
+            if not ok:
+                self.errors[action] += 1
+
+    def _perform(self, user, action):
+        started = time.perf_counter()
+        try:
+            ok = getattr(user, action)()
+        except (OSError, http.client.HTTPException, ValueError):
+            ok = False
+        return ok, time.perf_counter() - started
+
+    def _pick(self, user):
+        if user.cookie is None:
+            return 'login'
+        return user.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+
+    def run_closed(self, users, seconds, think_time):
+        """Each user acts, pauses for think_time on average, and acts again"""
+        deadline = time.monotonic() + seconds
+
+        def loop(seed):
+            user = VirtualUser(self, seed)
+            while time.monotonic() < deadline:
+                action = self._pick(user)
+                ok, elapsed = self._perform(user, action)
+                self._record(action, elapsed, ok)
+                if think_time:
+                    time.sleep(user.rng.expovariate(1 / think_time))
+            user.close()
+
+        return self._run_threads(users, loop)
+
+    def run_open(self, users, seconds, rate):
+        """Requests start at rate per second whether or not earlier ones finished"""
+        schedule = queue.Queue()
+        started = time.monotonic()
+        total = int(seconds * rate)
+
+        def loop(seed):
+            user = VirtualUser(self, seed)
+            while True:
+                due = schedule.get()
+                if due is None:
+                    break
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                action = self._pick(user)
+                ok, _ = self._perform(user, action)
+                # From the scheduled start: time spent waiting for a free user counts
+                self._record(action, time.monotonic() - due, ok)
+            user.close()
+
+        for i in range(total):
+            schedule.put(started + i / rate)
+        for _ in range(users):
+            schedule.put(None)
+        return self._run_threads(users, loop)
+
+    def _run_threads(self, users, loop):
+        threads = [threading.Thread(target=loop, args=(seed,), daemon=True) for seed in range(users)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        actions = {}
+        everything = []
+        for action, timings in self.timings.items():
+            ordered = sorted(timings)
+            everything.extend(ordered)
+            actions[action] = self._summary(ordered, self.errors[action], elapsed)
+        everything.sort()
+        return {'seconds': elapsed, 'actions': actions,
+                'total': self._summary(everything, sum(self.errors.values()), elapsed)}
+
+    @staticmethod
+    def _summary(ordered, errors, elapsed):
+        summary = {'requests': len(ordered), 'errors': errors, 'rps': len(ordered) / elapsed if elapsed else 0}
+        summary.update({f"p{pct}": percentile(ordered, pct) * 1000 for pct in PERCENTILES})
+        summary['max'] = ordered[-1] * 1000 if ordered else 0.0
+        return summary
+
+
+def parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (value or '').split(',')):
+        name, _, weight = item.partition('=')
+        if name not in mix:
+            raise argparse.ArgumentTypeError(f"Unknown action {name!r}; choose from {', '.join(mix)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a realistic request mix and report latency percentiles")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--cases', type=int, default=100000,
+                        help="--cases the data was generated with; sets how many synthetic users exist")
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--users', type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--think-time', type=float, default=0.5, help="Mean pause between actions (closed loop)")
+    parser.add_argument('--rate', type=float, help="Requests started per second (open loop)")
+    parser.add_argument('--mix', type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="Override weights, e.g. predict=0,cases=1")
+    parser.add_argument('--csv', default='cases.csv', help="Dataset the synthetic data was generated from")
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    counts = plan_counts(args.cases)
+    try:
+        connection = http.client.HTTPConnection(urllib.parse.urlparse(args.url).hostname,
+                                                urllib.parse.urlparse(args.url).port or 80, timeout=10)
+        connection.request('GET', '/login')
+        connection.getresponse().read()
+        connection.close()
+    except OSError as e:
+        print(f"❌ {args.url} is not reachable: {e}")
+        return 1
+    driver = LoadDriver(args.url, counts['users'], counts['predictions'], DatasetProfile.from_csv(args.csv),
+                        mix=args.mix, password=args.password)
+    mode = f"open loop at {args.rate:g} req/s" if args.rate else f"closed loop, {args.think_time:g}s think time"
+    print(f"{args.users} virtual users against {args.url} for {args.seconds:g}s ({mode})")
+    if args.rate:
+        elapsed = driver.run_open(args.users, args.seconds, args.rate)
+    else:
+        elapsed = driver.run_closed(args.users, args.seconds, args.think_time)
+
+    report = driver.report(elapsed)
+    print(f"\n{'action':18s} {'requests':>9s} {'errors':>7s} {'req/s':>8s}"
+          + ''.join(f" {f'p{pct}':>9s}" for pct in PERCENTILES) + f" {'max':>9s}")
+    rows = sorted(((action, summary) for action, summary in report['actions'].items() if summary['requests']),
+                  key=lambda item: -item[1]['requests']) + [('total', report['total'])]
+    for action, summary in rows:
+        print(f"{action:18s} {summary['requests']:9d} {summary['errors']:7d} {summary['rps']:8.1f}"
+              + ''.join(f" {summary[f'p{pct}']:7.1f}ms" for pct in PERCENTILES) + f" {summary['max']:7.1f}ms")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(report, url=args.url, users=args.users, rate=args.rate, mix=driver.mix), f, indent=2)
+    return 1 if report['total']['errors'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Count the server operations one case filing costs, old path versus FilingStore
+
+Uses the MongoDB database profiler (level 2) on a local mongod plus a driver
+command listener, which also sees transaction commits:
+    python -m benchmarks.profile_filing_writes --documents 5
+"""
+
+import argparse
+import datetime
+
+from pymongo import MongoClient, monitoring
+
+from case_numbers import CaseNumberAllocator
+from config import TestingConfig
+from filings import FilingStore, build_filing
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def sample_filing():
+    return build_filing({'case_type': 'civil', 'filing_date': '2024-01-15', 'plaintiff_name': 'Asian Paints',
+                         'defendant_name': 'Infosys', 'court_name': 'high'}, 'bench-user', 'bench')
+
+
+def sample_documents(n):
+    return [{'filename': f"exhibit-{i}.pdf", 'content_type': 'application/pdf', 'sha256': f"{i:064x}",
+             'uploaded_at': datetime.datetime.utcnow(), 'user_id': 'bench-user'} for i in range(n)]
+
+
+def legacy_filing(db, allocator, documents):
+    """The previous submit_case_filing sequence: one insert per document, insert, read-back"""
+    filing = sample_filing()
+    filing['case_number'] = allocator.allocate()
+    document_ids = []
+    for document in documents:
+        document['case_number'] = filing['case_number']
+        document_ids.append(str(db.documents.insert_one(document).inserted_id))
+    filing['document_ids'] = document_ids
+    inserted_id = db.case_filings.insert_one(filing).inserted_id
+    db.case_filings.find_one({'_id': inserted_id})
+
+
+def profiled(db, counter, fn):
+    db.command('profile', 0)
+    db.system.profile.drop()
+    db.command('profile', 2)
+    before = len(counter.commands)
+    fn()
+    db.command('profile', 0)
+    # Ignore the profile command itself
+    ops = [p['op'] for p in db.system.profile.find({'ns': {'$not': {'$regex': r'\.system\.profile$'}},
+                                                   'command.profile': {'$exists': False}})]
+    commands = [c for c in counter.commands[before:] if c != 'profile']
+    return ops, commands
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare round trips per case filing")
+    parser.add_argument('--mongodb-url', default=TestingConfig.MONGODB_URL)
+    parser.add_argument('--documents', type=int, default=5)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = MongoClient(args.mongodb_url, event_listeners=[counter])
+    db = client.get_default_database('court_test')
+    db.case_filings.create_index([("case_number", 1)], unique=True)
+    allocator = CaseNumberAllocator(db.counters, block_size=1000)
+    allocator.allocate()  # lease outside the measured window
+    store = FilingStore(db, allocator)
+    print(f"Transactions available: {store.supports_transactions}")
+
+    for name, fn in (
+        ('legacy', lambda: legacy_filing(db, allocator, sample_documents(args.documents))),
+        ('FilingStore', lambda: store.save(sample_filing(), sample_documents(args.documents)))
+    ):
+        ops, commands = profiled(db, counter, fn)
+        print(f"{name:12s} profiler ops: {len(ops):3d} {sorted(set(ops))}  "
+              f"driver round trips: {len(commands):3d} {commands}")
+
+
+if __name__ == '__main__':
+    main()
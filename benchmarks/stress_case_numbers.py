@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for the case number allocator
+
+Spawns several worker processes, each with several threads, all allocating
+from the same counter collection on a local mongod, then checks that no
+case number was issued twice.
+
+    python -m benchmarks.stress_case_numbers --processes 8 --threads 8 --per-thread 2000
+"""
+
+import argparse
+import multiprocessing
+import threading
+import time
+
+from pymongo import MongoClient
+
+from case_numbers import CaseNumberAllocator
+from config import TestingConfig
+
+
+def worker(mongodb_url, threads, per_thread, block_size, results):
+    client = MongoClient(mongodb_url)
+    allocator = CaseNumberAllocator(client.get_default_database('court_test').stress_counters,
+                                    block_size=block_size)
+    numbers = []
+    lock = threading.Lock()
+
+    def run():
+        local = [allocator.allocate() for _ in range(per_thread)]
+        with lock:
+            numbers.extend(local)
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put((numbers, allocator.leases))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test CaseNumberAllocator for duplicates")
+    parser.add_argument('--mongodb-url', default=TestingConfig.MONGODB_URL)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--per-thread', type=int, default=2000)
+    parser.add_argument('--block-size', type=int, default=100)
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongodb_url)
+    client.get_default_database('court_test').stress_counters.drop()
+
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(args.mongodb_url, args.threads, args.per_thread,
+                                                          args.block_size, results))
+             for _ in range(args.processes)]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    numbers = [n for batch, _ in collected for n in batch]
+    leases = sum(l for _, l in collected)
+    duplicates = len(numbers) - len(set(numbers))
+    print(f"Allocated: {len(numbers)} in {elapsed:.2f}s ({len(numbers) / elapsed:,.0f}/s)")
+    print(f"Counter round trips: {leases} ({len(numbers) / max(leases, 1):.0f} numbers per lease)")
+    print(f"Duplicates: {duplicates}")
+    if duplicates:
+        print("❌ Duplicate case numbers issued")
+        return 1
+    print("✅ No duplicates")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the prediction, filing and listing hot paths
+
+Everything runs in-process against mongomock (default) or a throwaway local
+mongod, with the Gemini SDK replaced by a stub, on a synthetic dataset and
+models trained in a temporary directory. Cases are interleaved over a few
+rounds and the quietest round is kept. Results depend only on the code and
+the machine, are written as JSON per commit, and two result files can be
+compared to spot regressions:
+    python -m benchmarks.suite run                       # -> benchmarks/results/<commit>.json
+    python -m benchmarks.suite run --quick --output head.json
+    python -m benchmarks.suite compare benchmarks/results/1a2b3c4.json head.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+CASE_TYPES = ['Civil', 'Criminal', 'Corporate Dispute', 'Family', 'Property', 'Tax']
+COURTS = [f"{city} High Court" for city in ('Madras', 'Bombay', 'Delhi', 'Calcutta', 'Karnataka', 'Kerala')]
+OUTCOMES = ['Plaintiff Won', 'Defendant Won', 'Settled', 'Dismissed']
+REFERENCE_ROWS = 2000
+BENCH_PASSWORD = 'bench-password'
+
+
+# Measurement
+
+def measure(fn, repeat, warmup=1):
+    """Call fn repeat times after warmup calls; seconds per call"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'median': statistics.median(timings),
+        'p95': timings[max(0, int(len(timings) * 0.95) - 1)],
+        'min': timings[0],
+        'mean': statistics.fmean(timings),
+        'runs': repeat
+    }
+
+
+# Offline fixtures
+
+def write_dataset(path, rows, seed=7):
+    """Synthetic training CSV with the columns train_model expects"""
+    rng = random.Random(seed)
+    start = datetime.date(2015, 1, 1)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('Case Type,Court Name,Plaintiff,Defendant,Date Filed,Outcome\n')
+        for _ in range(rows):
+            filed = start + datetime.timedelta(days=rng.randrange(3650))
+            f.write(f"{rng.choice(CASE_TYPES)},{rng.choice(COURTS)},Plaintiff {rng.randrange(300)},"
+                    f"Defendant {rng.randrange(300)},{filed.isoformat()},{rng.choice(OUTCOMES)}\n")
+
+
+def sample_frame(rows, seed=11):
+    import pandas as pd
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        'Case Type': [rng.choice(CASE_TYPES) for _ in range(rows)],
+        'Court Name': [rng.choice(COURTS) for _ in range(rows)],
+        'Plaintiff': [f"Plaintiff {rng.randrange(300)}" for _ in range(rows)],
+        'Defendant': [f"Defendant {rng.randrange(300)}" for _ in range(rows)],
+        'Date Filed': [f"20{rng.randrange(15, 25)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}"
+                       for _ in range(rows)]
+    })
+
+
+def train(rows):
+    """Train on a fresh synthetic dataset of the given size in the current directory"""
+    from train_model import train_case_outcome_model
+    write_dataset('cases.csv', rows)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not train_case_outcome_model():
+            raise RuntimeError(f"Training on {rows} rows failed")
+
+
+class StubGenerativeModel:
+    """Stands in for genai.GenerativeModel; answers after a fixed delay"""
+
+    latency = 0.0
+
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        usage = types.SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=64)
+        return types.SimpleNamespace(text=f"Stub analysis from {self.name}.", usage_metadata=usage)
+
+
+def install_stub_gemini(latency):
+    StubGenerativeModel.latency = latency
+    stub = types.ModuleType('google.generativeai')
+    stub.configure = lambda **kwargs: None
+    stub.GenerativeModel = StubGenerativeModel
+    try:
+        import google
+    except ImportError:
+        google = sys.modules['google'] = types.ModuleType('google')
+        google.__path__ = []
+    google.generativeai = stub
+    sys.modules['google.generativeai'] = stub
+
+
+def use_mongo(url):
+    """Point the app at mongomock, or at a local mongod; returns the backend name"""
+    if url in (None, 'mock'):
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("❌ mongomock is not installed; pip install mongomock or pass --mongo-url")
+        import pymongo
+
+        class BenchClient(mongomock.MongoClient):
+            def __init__(self, *args, **kwargs):
+                # Command listeners are a pymongo feature mongomock does not have
+                kwargs.pop('event_listeners', None)
+                super().__init__(*args, **kwargs)
+
+        pymongo.MongoClient = BenchClient
+        os.environ['MONGODB_URL'] = 'mongodb://localhost:27017'
+        return 'mongomock'
+    if urlparse(url).hostname not in ('localhost', '127.0.0.1', '::1'):
+        raise SystemExit("❌ The suite writes to court_db; only a local mongod is accepted")
+    os.environ['MONGODB_URL'] = url
+    return 'mongod'
+
+
+# Benchmarks: each returns (name, fn, calls per measurement) cases, set up once
+
+def training_cases(sizes):
+    def timed(rows):
+        # In a directory of its own so the reference model the other cases use is left alone
+        os.makedirs('training', exist_ok=True)
+        os.chdir('training')
+        try:
+            train(rows)
+        finally:
+            os.chdir('..')
+    # Pay for importing pandas and scikit-learn before any clock starts
+    timed(100)
+    return [(f"train.rows_{rows}", lambda rows=rows: timed(rows), 1) for rows in sizes]
+
+
+def model_cases(quick):
+    import predict
+    single = sample_frame(1)
+    few, many = (3, 20) if quick else (10, 100)
+
+    def cold():
+        predict.registry.clear()
+        predict.predict_outcome(single)
+
+    cases = [('predict_outcome.cold', cold, few),
+             ('predict_outcome.warm', lambda: predict.predict_outcome(single), many)]
+    for rows in (1, 100, 10000):
+        frame = sample_frame(rows)
+        cases.append((f"preprocess_input.rows_{rows}", lambda frame=frame: predict.preprocess_input(frame),
+                      few if rows == 10000 else many))
+    return cases
+
+
+def http_cases(quick, filings):
+    """Logged-in test client cases against a seeded database; also returns a per-round reset"""
+    from werkzeug.security import generate_password_hash
+    import app as app_module
+
+    flask_app = app_module.create_app()
+    app_module.users_collection.update_one(
+        {'username': 'bench'},
+        {'$set': {'username': 'bench', 'password': generate_password_hash(BENCH_PASSWORD),
+                  'role': 'admin', 'email': 'bench@example.com'}}, upsert=True)
+    now = datetime.datetime.utcnow()
+    app_module.case_filings_collection.insert_many([{
+        'case_number': f"BENCH-{i:06d}",
+        'case_type': CASE_TYPES[i % len(CASE_TYPES)],
+        'filing_date': now - datetime.timedelta(days=i % 365),
+        'plaintiff_name': f"Plaintiff {i}",
+        'defendant_name': f"Defendant {i}",
+        'case_description': 'Dispute over delayed delivery of goods under a supply contract',
+        'status': 'pending',
+        'created_at': now
+    } for i in range(filings)])
+
+    client = flask_app.test_client()
+    response = client.post('/login', data={'username': 'bench', 'password': BENCH_PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"Benchmark login failed with status {response.status_code}")
+
+    repeat = 50 if quick else 300
+    counter = iter(range(10 ** 9))
+
+    def expect(response, *statuses):
+        if response.status_code not in statuses:
+            raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+        return response
+
+    def ml_predict(unique):
+        n = next(counter) if unique else 0
+        expect(client.post('/ml_predict', data={
+            'case_type': CASE_TYPES[n % len(CASE_TYPES)], 'court_name': COURTS[n % len(COURTS)],
+            'plaintiff_name': f"Plaintiff {n % 300}", 'defendant_name': f"Defendant {n % 299}",
+            'date_filed': (datetime.date(2000, 1, 1) + datetime.timedelta(days=n)).isoformat()}), 200)
+
+    def submit_filing():
+        n = next(counter)
+        expect(client.post('/submit-case-filing', data={
+            'case_type': 'Civil', 'filing_date': '2024-09-25', 'plaintiff_name': f"Plaintiff {n}",
+            'defendant_name': f"Defendant {n}", 'case_description': 'Benchmark filing'}), 302)
+
+    def predict_case():
+        n = next(counter)
+        response = expect(client.post('/predict', data={
+            'case_id': f"BENCH-{n}", 'case_type': 'Civil', 'plaintiff_name': 'Plaintiff 1',
+            'plaintiff_args': 'Breach of contract', 'defendant_name': 'Defendant 1',
+            'defendant_args': 'Goods were delivered', 'date_filed': '2024-09-25',
+            'legal_principles': 'Contract Act, s.73', 'judge_name': 'Judge A', 'court_name': COURTS[0]}), 200)
+        if response.get_json()['status'] != 'completed':
+            raise RuntimeError(f"/predict did not reach the stubbed model: {response.get_json()}")
+
+    def reset():
+        # /cases lists every filing; keep its size the same from round to round
+        app_module.case_filings_collection.delete_many({'case_description': 'Benchmark filing'})
+
+    return reset, [('http.ml_predict.miss', lambda: ml_predict(True), repeat),
+            ('http.ml_predict.hit', lambda: ml_predict(False), repeat),
+            ('http.cases', lambda: expect(client.get('/cases'), 200), repeat),
+            ('http.case_filing', lambda: expect(client.get('/case-filing'), 200), repeat),
+            ('http.submit_case_filing', submit_filing, repeat),
+            ('http.predict', predict_case, repeat)]
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run(args):
+    install_stub_gemini(args.gemini_latency)
+    backend = use_mongo(args.mongo_url)
+    os.environ.update({'GOOGLE_API_KEY': 'bench-stub', 'FLASK_SECRET_KEY': 'bench-flask-secret-' + '0' * 16,
+                       'JWT_SECRET_KEY': 'bench-jwt-secret-' + '0' * 16,
+                       'CACHE_TYPE': 'simple', 'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING')})
+    os.environ.pop('TRACE_EXPORT', None)
+    sys.path.insert(0, ROOT)
+
+    home = os.getcwd()
+    rounds = {}
+    with tempfile.TemporaryDirectory(prefix='court-bench-') as workdir:
+        # predict and train_model use paths relative to the working directory
+        os.chdir(workdir)
+        try:
+            train(REFERENCE_ROWS)
+            cases = training_cases((500, 2000) if args.quick else (1000, 5000, 20000))
+            cases += model_cases(args.quick)
+            with contextlib.redirect_stdout(io.StringIO()):
+                reset, http = http_cases(args.quick, filings=100 if args.quick else 500)
+            cases += http
+            # Rounds interleave the cases so a burst of load on the host hits one round, not one case
+            for number in range(args.rounds):
+                print(f"Round {number + 1}/{args.rounds}...")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for name, fn, repeat in cases:
+                        rounds.setdefault(name, []).append(measure(fn, repeat, warmup=0 if repeat == 1 else 1))
+                    reset()
+        finally:
+            os.chdir(home)
+
+    # The quietest round is the best estimate of what the code costs
+    results = {}
+    for name, measured in rounds.items():
+        results[name] = dict(min(measured, key=lambda result: result['median']), rounds=len(measured))
+        if name.startswith('http.'):
+            results[name]['rps'] = 1 / results[name]['mean']
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created_at': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'quick': args.quick,
+        'rounds': args.rounds,
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count(), 'mongo': backend, 'gemini_latency': args.gemini_latency},
+        'results': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-quick' if args.quick else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    for name, result in sorted(results.items()):
+        extra = f"  {result['rps']:8.1f} req/s" if 'rps' in result else ''
+        print(f"{name:32s} {result['median'] * 1000:10.3f} ms{extra}")
+    print(f"\n✅ Results written to {output}")
+    return 0
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    if base.get('environment') != head.get('environment'):
+        print("⚠️  Results come from different environments; differences may not be the code's")
+
+    regressions = 0
+    print(f"{'benchmark':32s} {base['commit']:>12s} {head['commit']:>12s}   change")
+    for name in sorted(set(base['results']) | set(head['results'])):
+        before = base['results'].get(name, {}).get('median')
+        after = head['results'].get(name, {}).get('median')
+        if before is None or after is None:
+            print(f"{name:32s} {'-' if before is None else f'{before * 1000:9.3f}ms':>12s} "
+                  f"{'-' if after is None else f'{after * 1000:9.3f}ms':>12s}")
+            continue
+        change = (after - before) / before
+        # Tiny absolute differences are noise however large they are relatively
+        significant = abs(after - before) >= args.min_delta / 1000
+        mark = ''
+        if significant and change > args.threshold:
+            mark = '  REGRESSION'
+            regressions += 1
+        elif significant and change < -args.threshold:
+            mark = '  improved'
+        print(f"{name:32s} {before * 1000:10.3f}ms {after * 1000:10.3f}ms {change:+8.1%}{mark}")
+
+    if regressions:
+        print(f"\n❌ {regressions} benchmarks slower by more than {args.threshold:.0%}")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Run the suite and write a JSON result file")
+    run_parser.add_argument('--quick', action='store_true', help="Fewer repetitions and smaller datasets")
+    run_parser.add_argument('--output', help="Result file (default: benchmarks/results/<commit>.json)")
+    run_parser.add_argument('--rounds', type=int, default=3, help="Interleaved rounds; the best is kept (default: 3)")
+    run_parser.add_argument('--mongo-url', help="Local mongod to use instead of mongomock")
+    run_parser.add_argument('--gemini-latency', type=float, default=0.0,
+                            help="Seconds each stubbed Gemini call takes (default: 0)")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help="Compare two result files")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, default=0.20,
+                                help="Relative slowdown reported as a regression (default: 0.20)")
+    compare_parser.add_argument('--min-delta', type=float, default=0.05,
+                                help="Ignore differences smaller than this many milliseconds (default: 0.05)")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
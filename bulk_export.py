@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Streaming bulk export of predictions and case filings
+
+    python bulk_export.py predictions --format ndjson --gzip -o predictions.ndjson.gz
+    python bulk_export.py case_filings --format csv --since 2024-01-01 -o filings.csv
+
+Documents are read in _id order, BATCH_SIZE at a time, each batch a fresh
+query resuming after the last _id seen; a slow download therefore never
+holds a server cursor open past its idle timeout. Every format is a
+generator of byte chunks, one per batch (one per row group for Parquet), and
+gzip compresses chunk by chunk, so memory stays bounded by a batch whatever
+the number of documents. The admin endpoint returns the same generator as
+a streamed response.
+
+CSV cells that a spreadsheet would evaluate as a formula (user-entered
+names, arguments and descriptions starting with =, +, -, @) are prefixed
+with '. NDJSON and Parquet carry the values unchanged.
+
+Parquet needs pyarrow, which is optional: without it only CSV and NDJSON
+are available.
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+# Columns exported from each collection, in output order
+COLLECTIONS = {
+    'predictions': (
+        '_id', 'case_id', 'case_type', 'court_name', 'judge_name', 'plaintiff_name', 'plaintiff_args',
+        'defendant_name', 'defendant_args', 'date_filed', 'legal_principles', 'user_id', 'username',
+        'status', 'created_at', 'completed_at', 'ipc_analysis', 'judgment_prediction', 'error_message'
+    ),
+    'case_filings': (
+        '_id', 'case_number', 'case_type', 'filing_date', 'court_name', 'plaintiff_name', 'defendant_name',
+        'lawyer_name', 'case_description', 'user_id', 'username', 'status', 'created_at', 'document_ids'
+    ),
+}
+# Stored as datetimes; typed as timestamps in Parquet
+DATETIME_FIELDS = {'created_at', 'completed_at', 'filing_date'}
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+BATCH_SIZE = 1000
+# Spreadsheets read a cell starting with one of these as a formula (OWASP CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Parquet row groups are written whole, so they bound the memory a Parquet export needs
+ROW_GROUP_ROWS = 10000
+
+
+class ExportError(Exception):
+    """An export was requested with an unknown collection or format, or an invalid date"""
+
+
+def parse_date(value):
+    """'YYYY-MM-DD' or an ISO timestamp; None for empty values"""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+
+def export_query(since=None, until=None):
+    """Filter on created_at, which both exported collections carry"""
+    created = {}
+    if since:
+        created['$gte'] = since
+    if until:
+        created['$lt'] = until
+    return {'created_at': created} if created else {}
+
+
+def iter_batches(collection, query=None, fields=None, batch_size=BATCH_SIZE):
+    """Lists of up to batch_size documents in _id order, each fetched by its own range query"""
+    projection = {name: 1 for name in fields} if fields else None
+    last_id = None
+    while True:
+        page = dict(query or {})
+        if last_id is not None:
+            page = {'$and': [page, {'_id': {'$gt': last_id}}]} if page else {'_id': {'$gt': last_id}}
+        batch = list(collection.find(page, projection).sort('_id', 1).limit(batch_size))
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1]['_id']
+
+
+def _text(value):
+    """A field value as a flat string for CSV"""
+    if type(value) is str:
+        return value
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return ';'.join(_text(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _cell(value):
+    """A field value for a CSV cell, quoted with ' if a spreadsheet would evaluate it"""
+    text = _text(value)
+    return "'" + text if text.startswith(FORMULA_PREFIXES) else text
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return str(value)
+
+
+def csv_chunks(batches, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for batch in batches:
+        writer.writerows([_cell(doc.get(name)) for name in fields] for doc in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(batches, fields):
+    for batch in batches:
+        yield ''.join(json.dumps({name: doc.get(name) for name in fields}, default=_json_default,
+                                 ensure_ascii=False) + '\n' for doc in batch).encode('utf-8')
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are taken after each row group"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_chunks(batches, fields):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.timestamp('ms') if name in DATETIME_FIELDS else pa.string())
+                        for name in fields])
+
+    def column(name, docs):
+        values = [doc.get(name) for doc in docs]
+        if name in DATETIME_FIELDS:
+            return [v if isinstance(v, datetime.datetime) else None for v in values]
+        return [None if v is None else _text(v) for v in values]
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    pending = []
+    for batch in batches:
+        pending.extend(batch)
+        if len(pending) >= ROW_GROUP_ROWS:
+            writer.write_table(pa.table({name: column(name, pending) for name in fields}, schema=schema))
+            pending = []
+            yield sink.take()
+    if pending:
+        writer.write_table(pa.table({name: column(name, pending) for name in fields}, schema=schema))
+    writer.close()
+    yield sink.take()
+
+
+WRITERS = {'csv': csv_chunks, 'ndjson': ndjson_chunks, 'parquet': parquet_chunks}
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of byte chunks incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(db, collection_name, fmt='csv', compress=False, since=None, until=None, batch_size=BATCH_SIZE,
+                  stats=None):
+    """Byte chunks of collection_name exported as fmt; stats, if given, receives the row count
+
+    Unknown collections and formats raise ExportError before anything is read.
+    """
+    if collection_name not in COLLECTIONS:
+        raise ExportError(f"Unknown collection {collection_name!r}; expected one of {', '.join(COLLECTIONS)}")
+    if fmt not in WRITERS:
+        raise ExportError(f"Unknown format {fmt!r}; expected one of {', '.join(WRITERS)}")
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportError("Parquet export needs pyarrow, which is not installed")
+    fields = COLLECTIONS[collection_name]
+    stats = stats if stats is not None else {}
+    stats['rows'] = 0
+
+    def counted(batches):
+        for batch in batches:
+            stats['rows'] += len(batch)
+            yield batch
+
+    batches = counted(iter_batches(db[collection_name], export_query(since, until), fields, batch_size))
+    chunks = WRITERS[fmt](batches, fields)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(collection_name, fmt, compress=False, today=None):
+    today = today or datetime.date.today()
+    return f"{collection_name}-{today:%Y%m%d}.{fmt}{'.gz' if compress else ''}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export predictions or case filings as CSV, NDJSON or Parquet")
+    parser.add_argument('collection', choices=sorted(COLLECTIONS))
+    parser.add_argument('--format', choices=sorted(WRITERS), default='csv')
+    parser.add_argument('--gzip', action='store_true', help="Compress the output")
+    parser.add_argument('--since', help="Only documents created on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--until', help="Only documents created before this date (YYYY-MM-DD)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Documents fetched per query")
+    parser.add_argument('-o', '--output', help="Output file ('-' for stdout; default: <collection>-<date>.<format>)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+    load_dotenv()
+
+    mongodb_url = os.getenv('MONGODB_URL')
+    if not mongodb_url:
+        print("❌ Error: MONGODB_URL not found in .env file", file=sys.stderr)
+        return 1
+    db = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000).court_db
+    stats = {}
+    try:
+        chunks = export_chunks(db, args.collection, args.format, args.gzip, parse_date(args.since),
+                               parse_date(args.until), args.batch_size, stats)
+    except ExportError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    output = args.output or export_filename(args.collection, args.format, args.gzip)
+    started = time.perf_counter()
+    written = 0
+    out = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ Exported {stats['rows']} {args.collection} ({written / 2 ** 20:.1f} MiB) to {output} "
+          f"in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
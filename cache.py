@@ -0,0 +1,422 @@
+import contextlib
+import functools
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import stat
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import current_app, make_response, request, session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_THRESHOLD = 500
+LOCK_STRIPES = 64
+
+
+class SimpleCache:
+    """In-process LRU cache; entries expire after their timeout"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (time.time() + timeout if timeout else 0, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.threshold:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class NullCache:
+    """Caches nothing; every lookup is a miss"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+def private_directory(path):
+    """Create path as a 0700 directory, or check an existing one is ours and private.
+
+    Cached values are unpickled, so anyone able to write into the cache
+    directory could run code in the app. A directory owned by someone else,
+    or a symlink, is refused with PermissionError; group and other
+    permissions on one of our own are removed.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory {path} must be a directory owned by uid {os.getuid()}")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+class FileSystemCache:
+    """One pickle file per key under cache_dir, shared by this user's processes on the host"""
+
+    def __init__(self, cache_dir, threshold=DEFAULT_THRESHOLD):
+        self.cache_dir = private_directory(cache_dir)
+        self.threshold = threshold
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at = struct.unpack('d', f.read(8))[0]
+                if expires_at and expires_at < time.time():
+                    return None
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, struct.error):
+            return None
+
+    def set(self, key, value, timeout):
+        self._prune()
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(struct.pack('d', time.time() + timeout if timeout else 0))
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _prune(self):
+        # Drop the oldest half of the files once the threshold is passed
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if not e.name.startswith('.')]
+        except OSError:
+            return
+        if len(entries) < self.threshold:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) // 2]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for entry in os.scandir(self.cache_dir):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class SharedMemoryCache:
+    """Fixed-size slot table in a memory-mapped file in a private cache directory.
+
+    Every worker process maps the same file, so entries written by one are
+    visible to all. Keys hash to a single slot and a newer entry simply
+    replaces whatever was there; values larger than a slot are not cached.
+    Slots are guarded by an flock on the file plus a thread lock.
+    """
+
+    HEADER = struct.Struct('8sdI')
+
+    def __init__(self, cache_dir, slots=2048, slot_size=8192):
+        import fcntl
+        self._fcntl = fcntl
+        self.path = os.path.join(private_directory(cache_dir), 'court-cache')
+        self.slots = slots
+        self.slot_size = slot_size
+        self.max_value_size = slot_size - self.HEADER.size
+        self._lock = threading.Lock()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            if os.fstat(fd).st_uid != os.getuid():
+                raise PermissionError(f"Shared cache file {self.path} is owned by another user")
+            if os.fstat(fd).st_size < slots * slot_size:
+                os.ftruncate(fd, slots * slot_size)
+            self._map = mmap.mmap(fd, slots * slot_size)
+        finally:
+            os.close(fd)
+        self._lock_file = open(f"{self.path}.lock", 'a+')
+
+    def _slot(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        return digest, (int.from_bytes(digest, 'little') % self.slots) * self.slot_size
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        with self._lock:
+            self._fcntl.flock(self._lock_file, self._fcntl.LOCK_EX if exclusive else self._fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._lock_file, self._fcntl.LOCK_UN)
+
+    def get(self, key):
+        digest, offset = self._slot(key)
+        with self._locked(exclusive=False):
+            stored_digest, expires_at, length = self.HEADER.unpack_from(self._map, offset)
+            if stored_digest != digest or not length or (expires_at and expires_at < time.time()):
+                return None
+            start = offset + self.HEADER.size
+            payload = self._map[start:start + length]
+        try:
+            return pickle.loads(payload)
+        except Exception:
+            return None
+
+    def set(self, key, value, timeout):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_value_size:
+            return
+        digest, offset = self._slot(key)
+        with self._locked(exclusive=True):
+            self.HEADER.pack_into(self._map, offset, digest, time.time() + timeout if timeout else 0, len(payload))
+            start = offset + self.HEADER.size
+            self._map[start:start + len(payload)] = payload
+
+    def delete(self, key):
+        digest, offset = self._slot(key)
+        with self._locked(exclusive=True):
+            if self.HEADER.unpack_from(self._map, offset)[0] == digest:
+                self.HEADER.pack_into(self._map, offset, b'\0' * 8, 0, 0)
+
+    def clear(self):
+        with self._locked(exclusive=True):
+            self._map[:] = b'\0' * len(self._map)
+
+
+class Cache:
+    """Namespaced cache over a backend, with tag invalidation and single-flight fills.
+
+    Each entry remembers the version of every tag it depends on; invalidating
+    a tag writes a new version, so stale entries miss on their next read in
+    every process sharing the backend. Concurrent misses on the same key wait
+    for one caller to compute the value instead of all hitting the database.
+    """
+
+    def __init__(self, backend, default_timeout=DEFAULT_TIMEOUT, observer=None):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        # Called as observer(namespace, hit) on every lookup, e.g. to export metrics
+        self.observer = observer
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, namespace, outcome):
+        with self._stats_lock:
+            counts = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            counts[outcome] += 1
+        if self.observer is not None:
+            self.observer(namespace, outcome == 'hits')
+
+    def stats(self):
+        """Hits, misses and hit ratio per namespace for this process"""
+        with self._stats_lock:
+            return {
+                namespace: dict(counts, hit_ratio=round(counts['hits'] / max(counts['hits'] + counts['misses'], 1), 4))
+                for namespace, counts in self._stats.items()
+            }
+
+    def _tag_versions(self, tags):
+        versions = []
+        for tag in tags:
+            version = self.backend.get(f"tag:{tag}")
+            if version is None:
+                version = uuid.uuid4().hex
+                self.backend.set(f"tag:{tag}", version, 0)
+            versions.append(version)
+        return tuple(versions)
+
+    def invalidate_tags(self, *tags):
+        for tag in tags:
+            self.backend.set(f"tag:{tag}", uuid.uuid4().hex, 0)
+
+    def _all_tags(self, namespace, tags):
+        return (f"ns:{namespace}",) + tuple(tags)
+
+    def get(self, namespace, key, tags=()):
+        entry = self.backend.get(f"{namespace}:{key}")
+        if entry is not None and entry[0] == self._tag_versions(self._all_tags(namespace, tags)):
+            self._count(namespace, 'hits')
+            return entry[1]
+        self._count(namespace, 'misses')
+        return None
+
+    def set(self, namespace, key, value, timeout=None, tags=()):
+        versions = self._tag_versions(self._all_tags(namespace, tags))
+        self.backend.set(f"{namespace}:{key}", (versions, value),
+                         self.default_timeout if timeout is None else timeout)
+
+    def get_or_set(self, namespace, key, compute, timeout=None, tags=()):
+        """Return the cached value or compute it, letting one caller per key do the work"""
+        full_key = f"{namespace}:{key}"
+        entry_tags = self._all_tags(namespace, tags)
+        entry = self.backend.get(full_key)
+        if entry is not None and entry[0] == self._tag_versions(entry_tags):
+            self._count(namespace, 'hits')
+            return entry[1]
+
+        with self._stripes[hash(full_key) % LOCK_STRIPES]:
+            # Another thread may have filled it while we waited
+            versions = self._tag_versions(entry_tags)
+            entry = self.backend.get(full_key)
+            if entry is not None and entry[0] == versions:
+                self._count(namespace, 'hits')
+                return entry[1]
+            self._count(namespace, 'misses')
+            value = compute()
+            if value is not None:
+                self.backend.set(full_key, (versions, value), self.default_timeout if timeout is None else timeout)
+            return value
+
+    def namespace(self, name, timeout=None, tags=()):
+        return CacheNamespace(self, name, timeout, tags)
+
+    def memoize(self, namespace, timeout=None, tags=()):
+        """Cache a data-access function's result per positional and keyword arguments"""
+        def decorator(f):
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                key = repr((args, sorted(kwargs.items())))
+                return self.get_or_set(namespace, key, lambda: f(*args, **kwargs), timeout, tags)
+            wrapper.invalidate = lambda: self.invalidate_tags(f"ns:{namespace}")
+            return wrapper
+        return decorator
+
+    def cached_view(self, namespace, timeout=None, tags=(), per_user=False):
+        """Cache a view's successful response body for the request path and query string.
+
+        Requests with pending flash messages bypass the cache, since the
+        rendered page would consume and embed them.
+        """
+        def decorator(f):
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                if '_flashes' in session:
+                    return f(*args, **kwargs)
+                key = request.full_path
+                if per_user:
+                    key = f"{session.get('user_id')}:{key}"
+
+                produced = {}
+
+                def render():
+                    response = produced['response'] = make_response(f(*args, **kwargs))
+                    if response.status_code != 200 or response.direct_passthrough:
+                        return None
+                    return (response.get_data(), response.mimetype)
+
+                cached = self.get_or_set(namespace, key, render, timeout, tags)
+                if 'response' in produced:
+                    return produced['response']
+                body, mimetype = cached
+                return current_app.response_class(body, mimetype=mimetype)
+            return wrapper
+        return decorator
+
+
+class CacheNamespace:
+    """get/set view of one namespace, interchangeable with a plain TTL cache"""
+
+    def __init__(self, cache, name, timeout=None, tags=()):
+        self.cache = cache
+        self.name = name
+        self.timeout = timeout
+        self.tags = tuple(tags)
+
+    def _key(self, key):
+        return repr(key)
+
+    def get(self, key):
+        return self.cache.get(self.name, self._key(key), self.tags)
+
+    def set(self, key, value):
+        self.cache.set(self.name, self._key(key), value, self.timeout, self.tags)
+
+    def get_or_set(self, key, compute):
+        return self.cache.get_or_set(self.name, self._key(key), compute, self.timeout, self.tags)
+
+    def clear(self):
+        self.cache.invalidate_tags(f"ns:{self.name}")
+
+
+def default_cache_type():
+    """simple in a single process; filesystem when WEB_CONCURRENCY says several workers share the cache
+
+    Invalidations made in one worker only reach the others through a shared backend.
+    """
+    workers = os.getenv('WEB_CONCURRENCY', '')
+    return 'filesystem' if workers.isdigit() and int(workers) > 1 else 'simple'
+
+
+def create_cache(config, default_dir=None):
+    """Build the cache configured by CACHE_TYPE (default_cache_type() if unset) and CACHE_DEFAULT_TIMEOUT
+
+    The filesystem and sharedmemory backends keep their files in CACHE_DIR,
+    else default_dir (the app passes a directory under its instance path).
+    """
+    cache_type = (config.get('CACHE_TYPE') or default_cache_type()).lower()
+    threshold = config.get('CACHE_THRESHOLD', DEFAULT_THRESHOLD)
+    cache_dir = config.get('CACHE_DIR') or default_dir
+    if cache_type in ('filesystem', 'sharedmemory') and not cache_dir:
+        raise ValueError(f"CACHE_TYPE {cache_type!r} needs CACHE_DIR")
+    if cache_type == 'simple':
+        backend = SimpleCache(threshold)
+    elif cache_type == 'null':
+        backend = NullCache()
+    elif cache_type == 'filesystem':
+        backend = FileSystemCache(cache_dir, threshold)
+    elif cache_type == 'sharedmemory':
+        backend = SharedMemoryCache(cache_dir,
+                                    slots=config.get('CACHE_SHM_SLOTS', 2048),
+                                    slot_size=config.get('CACHE_SHM_SLOT_SIZE', 8192))
+    else:
+        raise ValueError(f"Unknown CACHE_TYPE {cache_type!r}")
+    logger.info("Cache backend: %s", cache_type)
+    return Cache(backend, default_timeout=config.get('CACHE_DEFAULT_TIMEOUT', DEFAULT_TIMEOUT))
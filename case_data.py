@@ -0,0 +1,53 @@
+import csv
+import itertools
+import os
+
+# Historical dataset used for training and analytics
+CASES_CSV = 'cases.csv'
+
+
+def _split_row(line):
+    return [cell.strip() for cell in line.strip().strip('|').split('|')]
+
+
+def _is_separator(cells):
+    return all(cell and set(cell) <= {'-', ':'} for cell in cells)
+
+
+def iter_case_rows(path=CASES_CSV):
+    """Stream rows of the historical cases dataset as dicts keyed by column name.
+
+    cases.csv is stored as a pipe-delimited table with separator rows between
+    records; plain comma-separated files are read with the csv module instead.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Dataset not found at {path}")
+
+    with open(path, encoding='utf-8', newline='') as f:
+        first = f.readline()
+        while first and not first.strip():
+            first = f.readline()
+
+        if not first.lstrip().startswith('|'):
+            # Regular CSV export
+            f.seek(0)
+            for row in csv.DictReader(f):
+                yield {k.strip(): (v or '').strip() for k, v in row.items() if k}
+            return
+
+        header = None
+        for line in itertools.chain([first], f):
+            if not line.strip().startswith('|'):
+                continue
+            cells = _split_row(line)
+            if _is_separator(cells):
+                continue
+            if header is None:
+                header = cells
+                continue
+            yield dict(zip(header, cells))
+
+
+def load_case_rows(path=CASES_CSV):
+    """Return every row of the historical dataset as a list of dicts"""
+    return list(iter_case_rows(path))
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Bulk loader for the historical cases dataset into the MongoDB cases collection
+
+    python case_loader.py --csv cases.csv --workers 8 --batch-size 2000
+
+Rows are streamed from the file, mapped to the models.create_case shape and
+upserted on case_number in unordered bulk_write batches sent from a thread
+pool. A checkpoint file records how many rows are safely written, so an
+interrupted load resumes from there; upserts make replaying a batch harmless.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import UpdateOne
+
+from case_data import CASES_CSV, iter_case_rows
+import models
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+IMPORT_USER = 'import:cases.csv'
+
+# Dataset columns stored under 'details' with their own field names
+DETAIL_COLUMNS = {
+    'Court Name': 'court_name',
+    'Judge Name': 'judge_name',
+    'Key Legal Issues': 'key_legal_issues',
+    'Relevant Statutes': 'relevant_statutes',
+    'Summary of Facts': 'summary_of_facts',
+    "Plaintiff's Arguments": 'plaintiff_arguments',
+    "Defendant's Arguments": 'defendant_arguments',
+    'Cited Precedents': 'cited_precedents',
+    'Final Decision': 'final_decision',
+    'Legal Principles': 'legal_principles',
+    'Precedents Applied': 'precedents_applied',
+    'Statutory Provisions': 'statutory_provisions',
+    'Ratio Decidendi': 'ratio_decidendi'
+}
+NUMERIC_COLUMNS = {
+    'Claim Amount': 'claim_amount',
+    'Legal Arguments Score': 'legal_arguments_score',
+    'Precedent Strength': 'precedent_strength',
+    'Judicial Precedent Consistency': 'judicial_precedent_consistency',
+    'Outcome Likelihood': 'outcome_likelihood'
+}
+
+
+def _parse_date(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+
+def _parse_number(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def row_to_case(row, filed_by=IMPORT_USER):
+    """Map one dataset row to a cases document, or None if it has no Case ID"""
+    case_number = row.get('Case ID')
+    if not case_number:
+        return None
+    plaintiff = row.get('Plaintiff', '')
+    defendant = row.get('Defendant', '')
+    case = models.create_case(case_number, f"{plaintiff} vs {defendant}", row.get('Case Type', ''),
+                              {'name': plaintiff}, {'name': defendant}, filed_by)
+
+    judgment_date = _parse_date(row.get('Date of Judgment'))
+    case['filing_date'] = _parse_date(row.get('Date Filed')) or case['filing_date']
+    case['judgment_date'] = judgment_date
+    case['outcome'] = row.get('Case Outcome') or None
+    case['status'] = 'closed' if judgment_date or case['outcome'] else case['status']
+    case['details'] = {field: row.get(column, '') for column, field in DETAIL_COLUMNS.items()}
+    case['details'].update({field: _parse_number(row.get(column)) for column, field in NUMERIC_COLUMNS.items()})
+    case['source'] = 'cases.csv'
+    return case
+
+
+def upsert_operation(case):
+    # Lists that the live application appends to are only initialised on insert
+    on_insert = {'documents': case.pop('documents'), 'hearings': case.pop('hearings')}
+    return UpdateOne({'case_number': case['case_number']},
+                     {'$set': case, '$setOnInsert': on_insert}, upsert=True)
+
+
+class Checkpoint:
+    """Number of leading dataset rows known to be written, persisted as JSON.
+
+    The checkpoint is tied to the source file's size and mtime so a changed
+    dataset is loaded from the start again.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        stat = os.stat(source)
+        self.identity = {'source': os.path.abspath(source), 'size': stat.st_size, 'mtime': stat.st_mtime}
+        self.rows = 0
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if all(saved.get(key) == value for key, value in self.identity.items()):
+            self.rows = saved.get('rows', 0)
+        return self
+
+    def save(self, rows):
+        self.rows = rows
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(self.identity, rows=rows,
+                           updated_at=datetime.datetime.utcnow().isoformat()), f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class CaseLoader:
+    """Streams dataset rows into the cases collection with parallel bulk upserts.
+
+    At most max_pending batches are queued or in flight; the reader blocks
+    when that many are outstanding, so memory stays bounded however far the
+    parser runs ahead of the database.
+    """
+
+    def __init__(self, collection, workers=4, batch_size=DEFAULT_BATCH_SIZE, max_pending=None,
+                 checkpoint=None, report_every=50000):
+        self.collection = collection
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_pending = max_pending or workers * 2
+        self.checkpoint = checkpoint
+        self.report_every = report_every
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._finished = {}
+        self._next_commit = 0
+        self._errors = []
+        self.stats = {'rows': 0, 'skipped': 0, 'upserted': 0, 'modified': 0, 'matched': 0, 'failed': 0}
+
+    def _write(self, batch_number, first_row, operations):
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            counts = (result.upserted_count, result.modified_count, result.matched_count)
+        except Exception as e:
+            logger.error("Batch %s (rows %s-%s) failed: %s",
+                         batch_number, first_row, first_row + len(operations) - 1, e)
+            counts = None
+        finally:
+            self._slots.release()
+        self._batch_done(batch_number, first_row + len(operations), counts, len(operations))
+
+    def _batch_done(self, batch_number, end_row, counts, size):
+        with self._lock:
+            if counts is None:
+                self.stats['failed'] += size
+                self._errors.append(batch_number)
+            else:
+                self.stats['upserted'] += counts[0]
+                self.stats['modified'] += counts[1]
+                self.stats['matched'] += counts[2]
+            self._finished[batch_number] = end_row
+
+            # Only advance the checkpoint over a contiguous run of written batches
+            end = None
+            while self._next_commit in self._finished and not self._errors:
+                end = self._finished.pop(self._next_commit)
+                self._next_commit += 1
+            if end is not None and self.checkpoint is not None:
+                self.checkpoint.save(end)
+
+    def load(self, rows, start_row=0):
+        """Write rows (an iterable of dataset dicts), skipping the first start_row"""
+        started = time.perf_counter()
+        batch = []
+        batch_number = 0
+        batch_start = start_row
+        next_report = self.report_every
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='case-loader') as pool:
+            for index, row in enumerate(rows):
+                if index < start_row:
+                    continue
+                case = row_to_case(row)
+                self.stats['rows'] += 1
+                if case is None:
+                    self.stats['skipped'] += 1
+                else:
+                    batch.append(upsert_operation(case))
+                if len(batch) >= self.batch_size:
+                    self._slots.acquire()
+                    pool.submit(self._write, batch_number, batch_start, batch)
+                    batch_number += 1
+                    batch_start = index + 1
+                    batch = []
+                if self.report_every and self.stats['rows'] >= next_report:
+                    next_report += self.report_every
+                    rate = self.stats['rows'] / (time.perf_counter() - started)
+                    print(f"   Read {self.stats['rows']} rows ({rate:.0f}/s), "
+                          f"{self.stats['upserted']} inserted, {self.stats['matched']} updated")
+            if batch:
+                self._slots.acquire()
+                pool.submit(self._write, batch_number, batch_start, batch)
+
+        self.stats['seconds'] = round(time.perf_counter() - started, 2)
+        self.stats['failed_batches'] = len(self._errors)
+        return self.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the historical cases dataset into MongoDB")
+    parser.add_argument('--csv', default=CASES_CSV, help="Dataset to load")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help="Concurrent bulk writers")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Upserts per bulk_write")
+    parser.add_argument('--max-pending', type=int, help="Batches queued before reading pauses (default: 2 per worker)")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <csv>.checkpoint.json)")
+    parser.add_argument('--restart', action='store_true', help="Ignore any checkpoint and load from the first row")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+    load_dotenv()
+
+    mongodb_url = os.getenv('MONGODB_URL')
+    if not mongodb_url:
+        print("❌ Error: MONGODB_URL not found in .env file")
+        return 1
+    client = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000, maxPoolSize=max(args.workers, 10))
+    collection = client.court_db.cases
+    collection.create_index("case_number", unique=True)
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.csv}.checkpoint.json", args.csv)
+    if args.restart:
+        checkpoint.clear()
+    start_row = checkpoint.load().rows
+    if start_row:
+        print(f"↩️  Resuming after row {start_row}")
+
+    loader = CaseLoader(collection, workers=args.workers, batch_size=args.batch_size,
+                        max_pending=args.max_pending, checkpoint=checkpoint)
+    stats = loader.load(iter_case_rows(args.csv), start_row=start_row)
+
+    print(f"✅ Read {stats['rows']} rows in {stats['seconds']}s "
+          f"({stats['rows'] / max(stats['seconds'], 0.01):.0f} rows/s)")
+    print(f"   Inserted {stats['upserted']}, updated {stats['modified']}, unchanged "
+          f"{stats['matched'] - stats['modified']}, skipped {stats['skipped']}")
+    if stats['failed_batches']:
+        print(f"❌ {stats['failed_batches']} batches ({stats['failed']} rows) failed; "
+              f"rerun to resume from row {checkpoint.rows}")
+        return 1
+    checkpoint.clear()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
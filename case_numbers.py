@@ -0,0 +1,55 @@
+import datetime
+import logging
+import threading
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 20
+
+
+def format_case_number(day, sequence, prefix='CASE'):
+    """CASE-YYYYMMDD-NNNN; the sequence widens past 9999 instead of wrapping"""
+    return f"{prefix}-{day:%Y%m%d}-{sequence:04d}"
+
+
+class CaseNumberAllocator:
+    """Hands out unique case numbers from a per-day counter in Mongo.
+
+    Each process leases a block of block_size numbers with a single atomic
+    $inc on the day's counter document, then serves the block from memory.
+    Numbers left over when a process exits are skipped, never reused.
+    """
+
+    def __init__(self, counters_collection, block_size=DEFAULT_BLOCK_SIZE, prefix='CASE'):
+        self.counters = counters_collection
+        self.block_size = block_size
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = 0
+        self._limit = 0
+        self.leases = 0
+
+    def _lease(self, day):
+        counter = self.counters.find_one_and_update(
+            {'_id': f"case_number:{day:%Y%m%d}"},
+            {'$inc': {'seq': self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self.leases += 1
+        self._day = day
+        self._limit = counter['seq']
+        self._next = self._limit - self.block_size + 1
+
+    def allocate(self, now=None):
+        """Return the next unused case number for today"""
+        day = (now or datetime.datetime.now()).date()
+        with self._lock:
+            if day != self._day or self._next > self._limit:
+                self._lease(day)
+            sequence = self._next
+            self._next += 1
+        return format_case_number(day, sequence, self.prefix)
@@ -0,0 +1,488 @@
+"""
+Precedent citation graph with PageRank authority and co-citation
+
+Every case links to the precedents in its 'Cited Precedents' and
+'Precedents Applied' columns (applied precedents weigh more). A precedent
+that is itself a case in the data set is the same node as that case, keyed
+by its normalized "X vs Y" title, so authority flows through chains of
+citations.
+
+Edges are kept as CSR arrays (indptr, indices, weights) over citing nodes.
+New cases are appended to a pending buffer and merged on the next refresh;
+the merged edge list is still almost sorted, so the rebuild stays close to
+linear. PageRank is a bincount-based sparse product per iteration, warm
+started from the previous scores after a refresh. It is run once with a
+uniform teleport (global authority) and once per case type, teleporting to
+that type's cases, so "authoritative precedents for this case type" is a
+lookup in a precomputed ranking.
+
+The graph is a read-model view on the cases collection: apply() ingests a
+new case, remove() and clear() schedule a rebuild from the source. Queries
+never wait for either: they read the last snapshot while a background
+thread merges new cases (at most every REFRESH_INTERVAL seconds) or
+rebuilds the graph. The read models' routine polling resync is ignored,
+since new cases keep arriving through apply().
+"""
+
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+import tracing
+from case_data import CASES_CSV, iter_case_rows
+
+logger = logging.getLogger(__name__)
+
+CITED_WEIGHT = 1.0
+APPLIED_WEIGHT = 2.0
+DAMPING = 0.85
+# L1 change between iterations; rankings are stable well before this
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 200
+# Rankings kept per case type; queries for more fall back to a full sort
+RANKING_DEPTH = 100
+# Deletes and dropped change streams mark the graph stale; reload from the source at most this often
+REBUILD_INTERVAL = 600
+# New cases are merged and PageRank rerun in the background at most this often
+REFRESH_INTERVAL = 30
+
+_SEPARATORS = re.compile(r'\s*[;\n|]\s*')
+
+
+def normalize(name):
+    return ' '.join(str(name or '').lower().split())
+
+
+def split_precedents(value):
+    """'Case A vs B; Case C vs D' -> ['Case A vs B', 'Case C vs D']"""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [part for part in _SEPARATORS.split(str(value).strip()) if part]
+
+
+class CSRGraph:
+    """Weighted directed graph in compressed sparse row form"""
+
+    def __init__(self, n, indptr, indices, weights):
+        self.n = n
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @classmethod
+    def from_edges(cls, n, sources, targets, weights):
+        """Build from edge arrays; parallel edges are merged by adding their weights"""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        if len(sources):
+            # Stable sort: input that is already grouped by source is sorted in near-linear time
+            order = np.lexsort((targets, sources))
+            sources, targets, weights = sources[order], targets[order], weights[order]
+            first = np.ones(len(sources), dtype=bool)
+            first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+            groups = np.cumsum(first) - 1
+            weights = np.bincount(groups, weights=weights)
+            sources, targets = sources[first], targets[first]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+        return cls(n, indptr, targets, weights)
+
+    @property
+    def sources(self):
+        """Source node of every edge, in edge order"""
+        return np.repeat(np.arange(self.n, dtype=np.int64), np.diff(self.indptr))
+
+    def out_weight(self):
+        return np.bincount(self.sources, weights=self.weights, minlength=self.n)
+
+    def in_weight(self):
+        return np.bincount(self.indices, weights=self.weights, minlength=self.n)
+
+    def transpose(self):
+        return CSRGraph.from_edges(self.n, self.indices, self.sources, self.weights)
+
+    def row(self, node):
+        start, end = self.indptr[node], self.indptr[node + 1]
+        return self.indices[start:end], self.weights[start:end]
+
+
+def pagerank(graph, teleport, damping=DAMPING, tol=TOLERANCE, max_iter=MAX_ITERATIONS, start=None):
+    """Personalised PageRank for each column of teleport (n x k); returns (scores n x k, iterations)
+
+    Rank leaving a node without citations goes back out along its column's
+    teleport distribution, so every column stays a probability distribution.
+    """
+    teleport = np.asarray(teleport, dtype=np.float64)
+    teleport = teleport / np.maximum(teleport.sum(axis=0), 1e-300)
+    sources = graph.sources
+    out_weight = graph.out_weight()
+    dangling = out_weight == 0
+    share = graph.weights / out_weight[sources] if len(sources) else graph.weights
+    scores = teleport.copy() if start is None else start / np.maximum(start.sum(axis=0), 1e-300)
+
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        spread = np.empty_like(scores)
+        for column in range(scores.shape[1]):
+            spread[:, column] = np.bincount(graph.indices, weights=scores[sources, column] * share,
+                                            minlength=graph.n)
+        lost = scores[dangling].sum(axis=0)
+        updated = damping * (spread + lost * teleport) + (1 - damping) * teleport
+        change = np.abs(updated - scores).sum(axis=0).max()
+        scores = updated
+        if change < tol:
+            break
+    return scores, iterations
+
+
+class _Snapshot:
+    """Immutable query state produced by a refresh"""
+
+    def __init__(self, graph, ids, names, case_types, scores, cited, rankings, iterations):
+        self.graph = graph
+        # The graph's own append-only name -> node map; nodes past graph.n are newer than the snapshot
+        self.ids = ids
+        self.names = names
+        self.case_types = case_types
+        self.scores = scores
+        self.cited = cited
+        self.rankings = rankings
+        self.iterations = iterations
+        self._transpose = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def empty(cls):
+        return cls(CSRGraph.from_edges(0, [], [], []), {}, [], [], np.zeros((0, 1)), np.zeros(0),
+                   {None: (0, np.zeros(0, dtype=np.int64))}, 0)
+
+    def transpose(self):
+        with self._lock:
+            if self._transpose is None:
+                self._transpose = self.graph.transpose()
+            return self._transpose
+
+
+class CitationGraph:
+    """Case-to-precedent citation graph serving authority and co-citation queries"""
+
+    def __init__(self, source=None, cited_weight=CITED_WEIGHT, applied_weight=APPLIED_WEIGHT, damping=DAMPING,
+                 rebuild_interval=REBUILD_INTERVAL, refresh_interval=REFRESH_INTERVAL):
+        # source() yields cases.csv rows or cases documents for a full rebuild
+        self.source = source
+        self.rebuild_interval = rebuild_interval
+        self.refresh_interval = refresh_interval
+        self._rebuilt_at = None
+        self._refreshed_at = None
+        self.cited_weight = cited_weight
+        self.applied_weight = applied_weight
+        self.damping = damping
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._reset()
+        self._snapshot = _Snapshot.empty()
+        self._stale = source is not None
+        self._updating = False
+
+    def _reset(self):
+        self._ids = {}
+        self._names = []
+        self._cases = set()
+        self._case_nodes = []
+        self._case_types = []
+        self._type_ids = {}
+        self._type_names = []
+        self._edges = CSRGraph.from_edges(0, [], [], [])
+        self._pending = ([], [], [])
+
+    def __len__(self):
+        return len(self._names)
+
+    # Ingestion
+
+    def _node(self, name):
+        key = normalize(name)
+        node = self._ids.get(key)
+        if node is None:
+            node = self._ids[key] = len(self._names)
+            self._names.append(str(name).strip())
+        return node
+
+    def add_case(self, case_id, title, case_type=None, cited=(), applied=()):
+        """Record a case's citations; a case already seen is skipped. Returns the edges added."""
+        with self._lock:
+            return self._add_case(case_id, title, case_type, cited, applied)
+
+    def _add_case(self, case_id, title, case_type, cited, applied):
+        key = normalize(case_id or title)
+        if not key or key in self._cases:
+            return 0
+        self._cases.add(key)
+        node = self._node(title or case_id)
+        if case_type:
+            type_key = normalize(case_type)
+            if type_key not in self._type_ids:
+                self._type_ids[type_key] = len(self._type_names)
+                self._type_names.append(str(case_type).strip())
+            self._case_nodes.append(node)
+            self._case_types.append(self._type_ids[type_key])
+        sources, targets, weights = self._pending
+        added = 0
+        for names, weight in ((split_precedents(cited), self.cited_weight),
+                              (split_precedents(applied), self.applied_weight)):
+            for name in names:
+                target = self._node(name)
+                if target != node:
+                    sources.append(node)
+                    targets.append(target)
+                    weights.append(weight)
+                    added += 1
+        return added
+
+    def add_row(self, row):
+        """Add a cases.csv row"""
+        return self.add_case(row.get('Case ID'), f"{row.get('Plaintiff', '')} vs {row.get('Defendant', '')}",
+                             row.get('Case Type'), row.get('Cited Precedents'), row.get('Precedents Applied'))
+
+    def add_document(self, doc):
+        """Add a cases collection document (the case_loader shape)"""
+        details = doc.get('details') or {}
+        return self.add_case(doc.get('case_number'), doc.get('title'), doc.get('case_type'),
+                             details.get('cited_precedents'), details.get('precedents_applied'))
+
+    def add(self, record):
+        return self.add_document(record) if 'case_number' in record or 'details' in record else self.add_row(record)
+
+    # Read-model view interface
+
+    def apply(self, doc):
+        key = normalize(doc.get('case_number') or doc.get('title'))
+        with self._lock:
+            if key in self._cases:
+                # An updated case may cite differently now; rebuild rather than diff
+                self._stale = self.source is not None
+                return
+            self._add_case(doc.get('case_number'), doc.get('title'), doc.get('case_type'),
+                           (doc.get('details') or {}).get('cited_precedents'),
+                           (doc.get('details') or {}).get('precedents_applied'))
+
+    def remove(self, doc_id):
+        self._stale = self.source is not None
+
+    def clear(self):
+        self._stale = self.source is not None
+
+    def resync(self):
+        # Polling already delivers new cases through apply(); reloading every graph each minute is not worth it
+        pass
+
+    # Refresh
+
+    def refresh(self):
+        """Merge pending citations and recompute scores; returns the current snapshot"""
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        with self._lock:
+            sources, targets, weights = self._pending
+            if not sources and len(self._names) == self._snapshot.graph.n:
+                return self._snapshot
+            started = time.perf_counter()
+            n = len(self._names)
+            edges = self._edges
+            self._pending = ([], [], [])
+            ids = self._ids
+            names = list(self._names)
+            type_names = list(self._type_names)
+            case_nodes = np.asarray(self._case_nodes, dtype=np.int64)
+            case_types = np.asarray(self._case_types, dtype=np.int64)
+            previous = self._snapshot
+
+        # Only refresh() and rebuild() replace _edges, both under _refresh_lock, so ingestion can go on meanwhile
+        graph = CSRGraph.from_edges(
+            n, np.concatenate([edges.sources, np.asarray(sources, dtype=np.int64)]),
+            np.concatenate([edges.indices, np.asarray(targets, dtype=np.int64)]),
+            np.concatenate([edges.weights, np.asarray(weights, dtype=np.float64)]))
+        with self._lock:
+            self._edges = graph
+
+        with tracing.span('citation_graph.refresh', nodes=n, edges=len(graph.indices)):
+            # Column 0 teleports uniformly; column 1 + t only to cases of type t
+            teleport = np.zeros((n, 1 + len(type_names)))
+            teleport[:, 0] = 1.0
+            if len(case_nodes):
+                np.add.at(teleport, (case_nodes, case_types + 1), 1.0)
+            start = None
+            if previous.graph.n and previous.scores.shape[1] == teleport.shape[1]:
+                # Warm start: scores barely move when a few cases are added
+                start = np.vstack([previous.scores, teleport[previous.graph.n:] / max(n, 1)])
+            scores, iterations = pagerank(graph, teleport, self.damping, start=start)
+            citations = graph.in_weight()
+            cited = np.flatnonzero(citations > 0)
+            rankings = {}
+            for column, type_name in enumerate([None] + type_names):
+                column_scores = scores[cited, column]
+                depth = min(RANKING_DEPTH, len(cited))
+                top = np.argpartition(-column_scores, depth - 1)[:depth] if depth else np.array([], dtype=np.int64)
+                top = top[np.argsort(-column_scores[top], kind='stable')]
+                rankings[normalize(type_name) if type_name else None] = (column, cited[top])
+
+        snapshot = _Snapshot(graph, ids, names, type_names, scores, citations, rankings, iterations)
+        with self._lock:
+            self._snapshot = snapshot
+        logger.info("Citation graph refreshed: %d nodes, %d edges, %d iterations in %.1f ms",
+                    n, len(graph.indices), iterations, (time.perf_counter() - started) * 1000)
+        return snapshot
+
+    def rebuild(self):
+        """Reload every case from the source into a new graph, then swap it in"""
+        started = time.perf_counter()
+        self._stale = False
+        self._rebuilt_at = time.monotonic()
+        fresh = CitationGraph(cited_weight=self.cited_weight, applied_weight=self.applied_weight,
+                              damping=self.damping)
+        loaded = 0
+        for record in self.source():
+            fresh.add(record)
+            loaded += 1
+        snapshot = fresh.refresh()
+        logger.info("Citation graph loaded %d cases in %.2fs", loaded, time.perf_counter() - started)
+        with self._refresh_lock, self._lock:
+            for name in ('_ids', '_names', '_cases', '_case_nodes', '_case_types', '_type_ids', '_type_names',
+                         '_edges', '_pending', '_snapshot'):
+                setattr(self, name, getattr(fresh, name))
+        return snapshot
+
+    def _background_update(self, rebuild):
+        try:
+            if rebuild:
+                self.rebuild()
+            else:
+                self.refresh()
+        except Exception as e:
+            logger.error("Citation graph %s failed: %s", 'rebuild' if rebuild else 'refresh', e)
+        finally:
+            self._refreshed_at = time.monotonic()
+            self._updating = False
+
+    def start(self):
+        """Load the graph in the background so the first queries do not wait for it"""
+        self.snapshot()
+        return self
+
+    def snapshot(self):
+        """The last refreshed snapshot; pending cases or a stale graph are folded in by a background thread"""
+        with self._lock:
+            snapshot = self._snapshot
+            if self._updating:
+                return snapshot
+            now = time.monotonic()
+            rebuild = self._stale and (self._rebuilt_at is None or now - self._rebuilt_at >= self.rebuild_interval)
+            refresh = ((self._pending[0] or len(self._names) != snapshot.graph.n)
+                       and (self._refreshed_at is None or now - self._refreshed_at >= self.refresh_interval))
+            if not (rebuild or refresh):
+                return snapshot
+            self._updating = True
+        tracing.start_thread(self._background_update, name='citation-graph-refresh', args=(rebuild,))
+        return snapshot
+
+    # Queries
+
+    def _precedent(self, snapshot, node, column):
+        return {
+            'precedent': snapshot.names[node],
+            'authority': round(float(snapshot.scores[node, column] * snapshot.graph.n), 6),
+            'citations': round(float(snapshot.cited[node]), 2)
+        }
+
+    def authoritative(self, case_type=None, limit=10):
+        """Highest-PageRank precedents overall, or as seen from cases of case_type"""
+        snapshot = self.snapshot()
+        column, ranked = snapshot.rankings.get(normalize(case_type) if case_type else None,
+                                               snapshot.rankings[None])
+        if limit > len(ranked) and len(ranked) == RANKING_DEPTH:
+            cited = np.flatnonzero(snapshot.cited > 0)
+            ranked = cited[np.argsort(-snapshot.scores[cited, column], kind='stable')]
+        return [self._precedent(snapshot, node, column) for node in ranked[:limit]]
+
+    def co_cited(self, precedent, limit=10):
+        """Precedents most often cited by the same cases as precedent"""
+        snapshot = self.snapshot()
+        node = snapshot.ids.get(normalize(precedent))
+        if node is None or node >= snapshot.graph.n:
+            return []
+        citing, _ = snapshot.transpose().row(node)
+        graph = snapshot.graph
+        if not len(citing):
+            return []
+        # Every edge leaving a citing case, gathered without a Python loop: edge k of the
+        # concatenation is starts[g] + (k - offsets[g]) for the citing case g it belongs to
+        starts = graph.indptr[citing]
+        lengths = graph.indptr[citing + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        edges = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        counts = np.bincount(graph.indices[edges], minlength=graph.n)
+        counts[node] = 0
+        candidates = np.flatnonzero(counts)
+        order = candidates[np.lexsort((-snapshot.scores[candidates, 0], -counts[candidates]))][:limit]
+        return [dict(self._precedent(snapshot, other, 0), co_citations=int(counts[other])) for other in order]
+
+    def features(self, precedents=(), applied=()):
+        """Authority features for a case's cited and applied precedents; 0 for unknown names
+
+        Scores are scaled by the node count so 1.0 is an average node whatever the graph size.
+        """
+        snapshot = self.snapshot()
+        names = split_precedents(precedents) + split_precedents(applied)
+        nodes = [snapshot.ids.get(normalize(name)) for name in names]
+        values = np.asarray([snapshot.scores[node, 0] * snapshot.graph.n
+                             if node is not None and node < snapshot.graph.n else 0.0 for node in nodes])
+        return {
+            'precedent_count': len(names),
+            'precedent_authority_max': float(values.max()) if len(values) else 0.0,
+            'precedent_authority_mean': float(values.mean()) if len(values) else 0.0
+        }
+
+    def prompt_context(self, case_type=None, limit=5):
+        """Lines for an LLM prompt naming the most authoritative precedents for case_type"""
+        precedents = self.authoritative(case_type, limit)
+        if not precedents:
+            return ''
+        lines = [f"- {p['precedent']} (authority {p['authority']:.2f}, {p['citations']:g} citations)"
+                 for p in precedents]
+        return '\n'.join(lines)
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'nodes': len(self._names),
+            'edges': int(len(snapshot.graph.indices)),
+            'cases': len(self._cases),
+            'case_types': list(self._type_names),
+            'pending_edges': len(self._pending[0]),
+            'iterations': snapshot.iterations,
+            'stale': self._stale
+        }
+
+
+def build_citation_graph(db=None, csv_path=CASES_CSV):
+    """Graph over the historical dataset and the cases collection, loaded in the background"""
+    def source():
+        try:
+            yield from iter_case_rows(csv_path)
+        except FileNotFoundError:
+            logger.warning("Dataset %s not found, citation graph built from the cases collection only", csv_path)
+        if db is not None:
+            try:
+                yield from db.cases.find({}, {'case_number': 1, 'title': 1, 'case_type': 1,
+                                              'details.cited_precedents': 1, 'details.precedents_applied': 1})
+            except Exception as e:
+                logger.error("Error loading cases for the citation graph: %s", e)
+    return CitationGraph(source)
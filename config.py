@@ -21,8 +21,11 @@ class Config:
     PERMANENT_SESSION_LIFETIME = 24 * 60 * 60  # 24 hours in seconds
     
     # Cache Configuration
-    CACHE_TYPE = 'simple'
+    # simple, filesystem, sharedmemory or null; unset means simple, or filesystem under several server workers
+    CACHE_TYPE = os.getenv('CACHE_TYPE')
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes
+    CACHE_THRESHOLD = 500  # entries kept by the simple and filesystem caches
+    CACHE_DIR = os.getenv('CACHE_DIR')  # private 0700 directory; default instance/cache
     
     # Security Configuration
     CSRF_ENABLED = True
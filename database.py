@@ -34,6 +34,10 @@ def init_mongodb():
             collections['users'].create_index("username", unique=True)
             collections['cases'].create_index("case_number", unique=True)
             collections['hearings'].create_index([("case_id", 1), ("date", 1)])
+            collections['hearings'].create_index([("status", 1), ("date", 1)])
+            collections['cases'].create_index("filed_by")
+            collections['cases'].create_index("plaintiff.id")
+            collections['cases'].create_index("defendant.id")
             print("✅ Database indexes created successfully!")
         except Exception as e:
             print(f"⚠️ Warning: Error creating indexes: {str(e)}")
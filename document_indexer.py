@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Background text extraction and chunk indexing for uploaded case documents
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import re
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+
+from pymongo import ReturnDocument
+
+from document_store import file_extension
+import tracing
+
+logger = logging.getLogger(__name__)
+
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+MAX_ATTEMPTS = 3
+
+# A claimed document is handed to another worker if not finished in this time
+CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+
+
+class UnsupportedDocument(Exception):
+    """No extractor is available for this file"""
+
+
+def extract_txt(path):
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8', errors='replace')
+
+
+def extract_docx(path):
+    with zipfile.ZipFile(path) as archive:
+        root = ET.fromstring(archive.read('word/document.xml'))
+    paragraphs = []
+    for paragraph in root.iter():
+        if paragraph.tag.endswith('}p'):
+            text = ''.join(node.text or '' for node in paragraph.iter() if node.tag.endswith('}t'))
+            if text:
+                paragraphs.append(text)
+    return '\n'.join(paragraphs)
+
+
+def extract_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedDocument("pypdf is not installed")
+    reader = PdfReader(path)
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+# Word stores most text as UTF-16LE (Latin-1 characters followed by a zero byte), older files as 8-bit ASCII
+_PRINTABLE_RUN_RE = re.compile(rb'((?:[\x20-\x7e\r\n\t\xa0-\xff]\x00){4,})|([\x20-\x7e\r\n\t]{4,})')
+
+
+def extract_doc(path):
+    # Legacy Word binaries: keep the runs of printable text between the binary records, in file order
+    with open(path, 'rb') as f:
+        data = f.read()
+    return '\n'.join(wide.decode('utf-16-le') if wide else narrow.decode('ascii')
+                     for wide, narrow in _PRINTABLE_RUN_RE.findall(data))
+
+
+EXTRACTORS = {
+    'txt': extract_txt,
+    'docx': extract_docx,
+    'pdf': extract_pdf,
+    'doc': extract_doc
+}
+
+
+def extract_text(path, filename):
+    extractor = EXTRACTORS.get(file_extension(filename))
+    if extractor is None:
+        raise UnsupportedDocument(f"No text extractor for {filename}")
+    return extractor(path)
+
+
+def chunk_text(text, words_per_chunk=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Split text into overlapping word windows"""
+    words = text.split()
+    step = max(words_per_chunk - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(' '.join(words[start:start + words_per_chunk]))
+        if start + words_per_chunk >= len(words):
+            break
+    return chunks
+
+
+def ensure_indexes(db):
+    db.documents.create_index([("text_status", 1), ("uploaded_at", 1)])
+    db.document_chunks.create_index([("document_id", 1), ("chunk_index", 1)], unique=True)
+    db.document_chunks.create_index([("case_number", 1)])
+    db.document_chunks.create_index([("text", "text")])
+
+
+def search_chunks(db, query, user_id=None, case_number=None, limit=20):
+    """Text search over extracted document chunks, best matches first"""
+    mongo_query = {'$text': {'$search': query}}
+    if user_id is not None:
+        mongo_query['user_id'] = user_id
+    if case_number:
+        mongo_query['case_number'] = case_number
+    return list(db.document_chunks.find(
+        mongo_query,
+        {'score': {'$meta': 'textScore'}, 'document_id': 1, 'case_number': 1, 'filename': 1,
+         'chunk_index': 1, 'text': 1}
+    ).sort([('score', {'$meta': 'textScore'})]).limit(limit))
+
+
+class DocumentIndexer:
+    """Pool of worker threads draining un-indexed documents.
+
+    Progress lives on each documents record (text_status), so a restarted
+    worker or a second process resumes where the last one stopped.
+    """
+
+    def __init__(self, db, upload_folder, workers=2, poll_interval=30):
+        self.db = db
+        self.upload_folder = upload_folder
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads in the background"""
+        if self._threads:
+            return self
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"document-indexer-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        """Signal that new documents were uploaded"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                while not self._stop.is_set() and self.process_next():
+                    pass
+            except Exception as e:
+                logger.error("Document indexer error: %s", e)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def claim(self):
+        """Atomically take the oldest document that still needs indexing"""
+        now = datetime.datetime.utcnow()
+        return self.db.documents.find_one_and_update(
+            {'$or': [
+                {'text_status': {'$exists': False}},
+                {'text_status': 'pending'},
+                {'text_status': 'processing', 'text_claimed_at': {'$lt': now - CLAIM_TIMEOUT}}
+            ]},
+            {'$set': {'text_status': 'processing', 'text_claimed_at': now}, '$inc': {'text_attempts': 1}},
+            sort=[('uploaded_at', 1)],
+            projection={'filename': 1, 'case_number': 1, 'user_id': 1, 'sha256': 1,
+                        'storage_path': 1, 'text_attempts': 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def process_next(self):
+        """Index one document; returns False when the backlog is empty"""
+        document = self.claim()
+        if document is None:
+            return False
+        # One trace per document; idle polls are not recorded
+        with tracing.span('document_indexer.process', document_id=str(document['_id'])):
+            self._index(document)
+        return True
+
+    def _index(self, document):
+        try:
+            count = self._reuse_chunks(document)
+            if count is None:
+                path = os.path.join(self.upload_folder, document.get('storage_path') or str(document['_id']))
+                count = self._store_chunks(document, chunk_text(extract_text(path, document['filename'])))
+            self._finish(document, 'indexed', chunk_count=count)
+        except UnsupportedDocument as e:
+            self._finish(document, 'unsupported', error=str(e))
+        except Exception as e:
+            logger.error("Error indexing document %s: %s", document['_id'], e)
+            status = 'failed' if document.get('text_attempts', 1) >= MAX_ATTEMPTS else 'pending'
+            self._finish(document, status, error=str(e))
+
+    def _reuse_chunks(self, document):
+        # Identical content was already extracted for another filing
+        if not document.get('sha256'):
+            return None
+        source = self.db.documents.find_one(
+            {'sha256': document['sha256'], 'text_status': 'indexed', '_id': {'$ne': document['_id']}},
+            {'_id': 1}
+        )
+        if source is None:
+            return None
+        chunks = [c['text'] for c in self.db.document_chunks.find(
+            {'document_id': source['_id']}, {'text': 1}).sort('chunk_index', 1)]
+        return self._store_chunks(document, chunks)
+
+    def _store_chunks(self, document, chunks):
+        # Replace rather than append so a retried document never duplicates chunks
+        self.db.document_chunks.delete_many({'document_id': document['_id']})
+        if chunks:
+            now = datetime.datetime.utcnow()
+            self.db.document_chunks.insert_many([{
+                'document_id': document['_id'],
+                'case_number': document.get('case_number'),
+                'user_id': document.get('user_id'),
+                'filename': document.get('filename'),
+                'chunk_index': i,
+                'text': text,
+                'created_at': now
+            } for i, text in enumerate(chunks)], ordered=False)
+        return len(chunks)
+
+    def _finish(self, document, status, chunk_count=None, error=None):
+        update = {'text_status': status, 'text_updated_at': datetime.datetime.utcnow()}
+        if chunk_count is not None:
+            update['chunk_count'] = chunk_count
+        if error:
+            update['text_error'] = error
+        self.db.documents.update_one({'_id': document['_id']}, {'$set': update, '$unset': {'text_claimed_at': ''}})
+
+    def drain(self, report_every=100):
+        """Process the whole backlog with the configured number of threads, then return"""
+        processed = [0]
+        lock = threading.Lock()
+        started = time.perf_counter()
+
+        def work():
+            while self.process_next():
+                with lock:
+                    processed[0] += 1
+                    if processed[0] % report_every == 0:
+                        rate = processed[0] / (time.perf_counter() - started)
+                        print(f"   Indexed {processed[0]} documents ({rate:.1f}/s)")
+
+        threads = [threading.Thread(target=work) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return processed[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract and index text from uploaded case documents")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent extraction threads")
+    parser.add_argument('--upload-folder', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
+    parser.add_argument('--retry-failed', action='store_true', help="Queue failed documents again")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+    load_dotenv()
+
+    mongodb_url = os.getenv('MONGODB_URL')
+    if not mongodb_url:
+        print("❌ Error: MONGODB_URL not found in .env file")
+        return 1
+    db = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000).court_db
+    ensure_indexes(db)
+
+    if args.retry_failed:
+        result = db.documents.update_many({'text_status': 'failed'},
+                                          {'$set': {'text_status': 'pending', 'text_attempts': 0}})
+        print(f"🔁 Re-queued {result.modified_count} failed documents")
+
+    backlog = db.documents.count_documents({'text_status': {'$nin': ['indexed', 'unsupported', 'failed']}})
+    print(f"📄 Documents waiting: {backlog}")
+    processed = DocumentIndexer(db, args.upload_folder, workers=args.workers).drain()
+    print(f"✅ Processed {processed} documents")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
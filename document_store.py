@@ -0,0 +1,208 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import unicodedata
+from urllib.parse import quote
+
+from flask import Request
+from werkzeug.http import dump_options_header
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes expected for each allowed extension; txt is checked for NUL bytes instead
+MAGIC_NUMBERS = {
+    'pdf': (b'%PDF-',),
+    'docx': (b'PK\x03\x04',),
+    'doc': (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',)
+}
+SNIFF_BYTES = 8
+
+
+class DocumentRejected(Exception):
+    """An upload broke the size or type limits.
+
+    Deliberately not a ValueError: werkzeug's form parser silently swallows
+    those and would hand the view an empty form instead.
+    """
+
+
+def download_name(filename, fallback='download'):
+    """A stored filename with control characters removed, safe to put in a header"""
+    return ''.join(ch for ch in str(filename or '') if ch.isprintable()).strip() or fallback
+
+
+def attachment_disposition(filename):
+    """Content-Disposition for downloading filename, encoded the way send_file does it
+
+    Non-ASCII names get an ASCII fallback plus an RFC 5987 filename*.
+    """
+    filename = download_name(filename)
+    try:
+        filename.encode('ascii')
+        options = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        options = {'filename': simple or 'download', 'filename*': f"UTF-8''{quote(filename, safe='!#$&+^`|~')}"}
+    return dump_options_header('attachment', options)
+
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+
+class UploadSink:
+    """Writable temp file that hashes and checks an upload while it is being received"""
+
+    def __init__(self, store, filename):
+        self.store = store
+        self.filename = filename
+        self.extension = file_extension(filename)
+        self.size = 0
+        self.committed = False
+        self._hash = hashlib.sha256()
+        self._head = b''
+        fd, self.temp_path = tempfile.mkstemp(dir=store.tmp_dir, prefix='upload-')
+        self._file = os.fdopen(fd, 'w+b')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.store.max_file_size:
+            raise DocumentRejected(
+                f"{self.filename} exceeds the {self.store.max_file_size // (1024 * 1024)}MB file size limit")
+
+        if len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_type(self._head)
+        if self.extension == 'txt' and b'\x00' in data:
+            raise DocumentRejected(f"{self.filename} is not a text file")
+
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def _check_type(self, head):
+        signatures = MAGIC_NUMBERS.get(self.extension)
+        if signatures and not head.startswith(signatures):
+            raise DocumentRejected(f"{self.filename} does not look like a .{self.extension} file")
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def finish(self):
+        # Files shorter than the sniff window never reached the type check
+        if len(self._head) < SNIFF_BYTES:
+            self._check_type(self._head)
+        self._file.flush()
+
+    def discard(self):
+        if self.committed:
+            return
+        try:
+            self._file.close()
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+    # File interface werkzeug's FileStorage expects
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        return self._file.flush()
+
+    def close(self):
+        self.discard()
+
+
+class DocumentStore:
+    """Content-addressed file store: each file lives at <root>/<aa>/<bb>/<sha256>"""
+
+    def __init__(self, root, max_file_size=Config.MAX_CONTENT_LENGTH,
+                 allowed_extensions=Config.ALLOWED_EXTENSIONS):
+        self.root = root
+        self.max_file_size = max_file_size
+        self.allowed_extensions = set(allowed_extensions)
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def storage_path(self, sha256):
+        """Path relative to the store root, sharded on the first two hash bytes"""
+        return os.path.join(sha256[:2], sha256[2:4], sha256)
+
+    def path_for(self, sha256):
+        return os.path.join(self.root, self.storage_path(sha256))
+
+    def open_upload(self, filename):
+        """Start receiving a file, rejecting disallowed types before any bytes arrive"""
+        if file_extension(filename) not in self.allowed_extensions:
+            raise DocumentRejected(
+                f"{filename} has an unsupported file type. Allowed: {', '.join(sorted(self.allowed_extensions))}")
+        return UploadSink(self, filename)
+
+    def commit(self, sink):
+        """Move a fully received upload into place, reusing an existing copy of the same content"""
+        sink.finish()
+        sha256 = sink.sha256
+        final_path = self.path_for(sha256)
+        deduplicated = os.path.exists(final_path)
+        sink._file.close()
+        if deduplicated:
+            os.remove(sink.temp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(sink.temp_path, final_path)
+        sink.committed = True
+        return {
+            'sha256': sha256,
+            'size': sink.size,
+            'storage_path': self.storage_path(sha256),
+            'deduplicated': deduplicated
+        }
+
+    def save_stream(self, stream, filename):
+        """Store a file from any readable stream, chunk by chunk"""
+        sink = self.open_upload(filename)
+        try:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                sink.write(chunk)
+            return self.commit(sink)
+        finally:
+            sink.discard()
+
+
+def make_request_class(store, endpoints):
+    """Request class that streams files uploaded to endpoints straight into store as they are parsed
+
+    Files posted to any other endpoint are parsed the default way and never reach the store.
+    """
+    endpoints = frozenset(endpoints)
+
+    class UploadRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+            if self.endpoint not in endpoints:
+                return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+            if not filename:
+                return io.BytesIO()
+            sink = store.open_upload(filename)
+            if not hasattr(self, 'upload_sinks'):
+                self.upload_sinks = []
+            self.upload_sinks.append(sink)
+            return sink
+
+    return UploadRequest
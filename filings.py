@@ -0,0 +1,161 @@
+import datetime
+import logging
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.write_concern import WriteConcern
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('case_type', 'filing_date', 'plaintiff_name', 'defendant_name')
+OPTIONAL_FIELDS = ('case_description', 'court_name', 'lawyer_name')
+MAX_ATTEMPTS = 3
+DUPLICATE_KEY = 11000
+
+
+class FilingError(Exception):
+    """A filing could not be built from the submitted fields"""
+
+
+def build_filing(fields, user_id, username):
+    """Create a case_filings document from submitted fields, without a case number yet"""
+    missing = [name for name in REQUIRED_FIELDS if not fields.get(name)]
+    if missing:
+        raise FilingError(f"Missing required fields: {', '.join(missing)}")
+
+    filing_date = fields['filing_date']
+    if not isinstance(filing_date, datetime.datetime):
+        try:
+            filing_date = datetime.datetime.strptime(str(filing_date), '%Y-%m-%d')
+        except ValueError:
+            raise FilingError(f"Invalid filing_date {filing_date!r}, expected YYYY-MM-DD")
+
+    filing = {
+        'case_number': None,
+        'case_type': fields['case_type'],
+        'filing_date': filing_date,
+        'plaintiff_name': fields['plaintiff_name'],
+        'defendant_name': fields['defendant_name'],
+        'user_id': user_id,
+        'username': username,
+        'status': 'pending',
+        'created_at': datetime.datetime.utcnow()
+    }
+    for name in OPTIONAL_FIELDS:
+        filing[name] = fields.get(name)
+    return filing
+
+
+class FilingStore:
+    """Writes a filing and its document records as one unit.
+
+    Ids are assigned client-side so no read-back is needed: the filing and all
+    of its documents go out as one insert_one plus one insert_many, inside a
+    transaction when the server is a replica set or sharded cluster. The
+    acknowledged write concern is the confirmation that the data is stored.
+    """
+
+    def __init__(self, db, allocator):
+        self.db = db
+        self.allocator = allocator
+        self._transactions = None
+
+    @property
+    def supports_transactions(self):
+        if self._transactions is None:
+            try:
+                hello = self.db.client.admin.command('hello')
+                self._transactions = 'setName' in hello or hello.get('msg') == 'isdbgrid'
+            except Exception:
+                self._transactions = False
+        return self._transactions
+
+    def _collections(self):
+        write_concern = WriteConcern(w='majority') if self.supports_transactions else WriteConcern(w=1)
+        return (self.db.case_filings.with_options(write_concern=write_concern),
+                self.db.documents.with_options(write_concern=write_concern))
+
+    def save(self, filing, documents=()):
+        """Persist filing and documents, assigning a fresh case number on collision"""
+        documents = list(documents)
+        filing['_id'] = ObjectId()
+        for document in documents:
+            document['_id'] = ObjectId()
+        filing['document_ids'] = [str(document['_id']) for document in documents]
+        if not filing.get('case_number'):
+            filing['case_number'] = self.allocator.allocate()
+
+        for attempt in range(MAX_ATTEMPTS):
+            for document in documents:
+                document['case_number'] = filing['case_number']
+            try:
+                self._write(filing, documents)
+                return filing
+            except DuplicateKeyError:
+                # Numbers issued by the old random generator can still be taken
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                old_number = filing['case_number']
+                filing['case_number'] = self.allocator.allocate()
+                logger.warning("Case number %s already used, retrying with %s", old_number, filing['case_number'])
+
+    def _write(self, filing, documents):
+        filings, document_records = self._collections()
+
+        def insert(session):
+            filings.insert_one(filing, session=session)
+            if documents:
+                document_records.insert_many(documents, session=session)
+
+        if self.supports_transactions:
+            with self.db.client.start_session() as session:
+                session.with_transaction(insert)
+            return
+
+        # Standalone server: undo the filing if its documents could not be written
+        filings.insert_one(filing)
+        if documents:
+            try:
+                document_records.insert_many(documents)
+            except Exception:
+                filings.delete_one({'_id': filing['_id']})
+                raise
+
+    def bulk_import(self, filings):
+        """Insert many filings with unordered insert_many calls; returns (saved, errors)
+
+        Each error carries the position of its filing in filings as 'index'.
+        """
+        filings_collection, _ = self._collections()
+        positions = {}
+        for index, filing in enumerate(filings):
+            filing['_id'] = ObjectId()
+            filing.setdefault('document_ids', [])
+            filing['case_number'] = self.allocator.allocate()
+            positions[filing['_id']] = index
+
+        saved = []
+        errors = []
+        remaining = filings
+        for attempt in range(MAX_ATTEMPTS):
+            if not remaining:
+                break
+            try:
+                filings_collection.insert_many(remaining, ordered=False)
+                saved.extend(remaining)
+                remaining = []
+            except BulkWriteError as e:
+                failed = {error['index']: error for error in e.details.get('writeErrors', [])}
+                retry = []
+                for i, filing in enumerate(remaining):
+                    error = failed.get(i)
+                    if error is None:
+                        saved.append(filing)
+                    elif error.get('code') == DUPLICATE_KEY and attempt < MAX_ATTEMPTS - 1:
+                        filing['case_number'] = self.allocator.allocate()
+                        retry.append(filing)
+                    else:
+                        errors.append({'index': positions[filing['_id']], 'filing': filing,
+                                       'error': error.get('errmsg', 'write error')})
+                remaining = retry
+        return saved, errors
@@ -0,0 +1,385 @@
+import bisect
+import datetime
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DURATION_MINUTES = 60
+
+# Only these statuses keep a judge and courtroom booked
+ACTIVE_STATUSES = {'scheduled'}
+
+# Court sitting hours used when searching for free slots
+DAY_START = datetime.time(10, 0)
+DAY_END = datetime.time(17, 0)
+SLOT_STEP = datetime.timedelta(minutes=30)
+
+# A booking holds its judge's and courtroom's day for at most this long, so a
+# worker that dies mid-booking cannot lock a calendar for good
+LOCK_SECONDS = 10
+LOCK_WAIT_SECONDS = 5
+
+
+class HearingConflict(Exception):
+    """Raised when a booking overlaps an existing hearing for the same judge or courtroom"""
+
+    def __init__(self, resource, name, hearing_id):
+        self.resource = resource
+        self.name = name
+        self.hearing_id = hearing_id
+        super().__init__(f"{resource.capitalize()} {name} is already booked at that time")
+
+
+class CalendarBusy(Exception):
+    """Raised when another worker holds a judge's or courtroom's day for longer than LOCK_WAIT_SECONDS"""
+
+
+def resource_key(resource, name):
+    return (resource, ' '.join(str(name).lower().split()))
+
+
+def hearing_bounds(hearing):
+    """Start and end datetimes of a hearing_schedules document"""
+    date = hearing['hearing_date']
+    hearing_time = hearing.get('hearing_time')
+    start = datetime.datetime.combine(
+        date.date() if isinstance(date, datetime.datetime) else date,
+        hearing_time.time() if hearing_time else DAY_START
+    )
+    duration = hearing.get('duration_minutes') or DEFAULT_DURATION_MINUTES
+    return start, start + datetime.timedelta(minutes=duration)
+
+
+class IntervalIndex:
+    """Intervals kept in sorted start/end arrays per resource.
+
+    Lookups bisect on the start array and only walk back as far as the longest
+    interval stored for that resource, so checks stay O(log n) for bounded
+    hearing lengths even if legacy data already contains overlaps.
+    """
+
+    def __init__(self):
+        self._starts = defaultdict(list)
+        self._ends = defaultdict(list)
+        self._ids = defaultdict(list)
+        self._max_len = defaultdict(datetime.timedelta)
+
+    def __len__(self):
+        return sum(len(starts) for starts in self._starts.values())
+
+    def add(self, key, start, end, item_id):
+        starts = self._starts[key]
+        i = bisect.bisect_right(starts, start)
+        starts.insert(i, start)
+        self._ends[key].insert(i, end)
+        self._ids[key].insert(i, item_id)
+        self._max_len[key] = max(self._max_len[key], end - start)
+
+    def remove(self, key, start, item_id):
+        starts = self._starts.get(key)
+        if not starts:
+            return False
+        i = bisect.bisect_left(starts, start)
+        while i < len(starts) and starts[i] == start:
+            if self._ids[key][i] == item_id:
+                del starts[i]
+                del self._ends[key][i]
+                del self._ids[key][i]
+                return True
+            i += 1
+        return False
+
+    def overlapping(self, key, start, end):
+        """(start, end, id) of stored intervals intersecting [start, end)"""
+        starts = self._starts.get(key)
+        if not starts:
+            return []
+        ends = self._ends[key]
+        ids = self._ids[key]
+        lo = bisect.bisect_left(starts, start - self._max_len[key])
+        hi = bisect.bisect_left(starts, end)
+        return [(starts[i], ends[i], ids[i]) for i in range(lo, hi) if ends[i] > start]
+
+
+def calendar_lock_ids(hearing, start, end):
+    """Leases covering the days of [start, end) on the hearing's judge's and courtroom's calendars"""
+    days = {start.date(), (end - datetime.timedelta(microseconds=1)).date()}
+    return [CalendarLocks.lock_id(resource_key(resource, hearing[field]), day)
+            for resource, field in (('judge', 'judge_name'), ('courtroom', 'courtroom'))
+            if hearing.get(field) for day in days]
+
+
+class CalendarLocks:
+    """Short-lived leases in Mongo on a judge's or courtroom's day.
+
+    A lease is a document whose _id is the resource and day; taking one is an
+    upsert that only matches an expired lease, so a live one makes it fail
+    with a duplicate key. Bookings from every worker process serialize on
+    these documents while they re-check the collection and insert.
+    """
+
+    def __init__(self, collection, lock_seconds=LOCK_SECONDS, wait_seconds=LOCK_WAIT_SECONDS):
+        self.collection = collection
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+
+    @staticmethod
+    def lock_id(key, day):
+        resource, name = key
+        return f"{resource}:{name}:{day:%Y%m%d}"
+
+    def _try(self, lock_id, owner):
+        now = datetime.datetime.utcnow()
+        try:
+            self.collection.update_one(
+                {'_id': lock_id, 'expires_at': {'$lt': now}},
+                {'$set': {'owner': owner, 'expires_at': now + datetime.timedelta(seconds=self.lock_seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def acquire(self, lock_ids):
+        """Take every lease in lock_ids, in sorted order so two bookings cannot deadlock"""
+        owner = ObjectId()
+        held = []
+        deadline = time.monotonic() + self.wait_seconds
+        try:
+            for lock_id in sorted(set(lock_ids)):
+                while not self._try(lock_id, owner):
+                    if time.monotonic() >= deadline:
+                        raise CalendarBusy(f"{lock_id} is held by another request, try again later")
+                    time.sleep(0.02)
+                held.append(lock_id)
+        except BaseException:
+            self.release(held, owner)
+            raise
+        return held, owner
+
+    def renew(self, lock_ids, owner):
+        """Push back the expiry of leases still held by owner; False if any has been lost"""
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.lock_seconds)
+        result = self.collection.update_many({'_id': {'$in': list(lock_ids)}, 'owner': owner},
+                                             {'$set': {'expires_at': expires_at}})
+        return result.matched_count == len(lock_ids)
+
+    def release(self, lock_ids, owner):
+        if lock_ids:
+            self.collection.delete_many({'_id': {'$in': list(lock_ids)}, 'owner': owner})
+
+
+class HearingIndex:
+    """In-memory booking index over hearing_schedules, per judge and per courtroom"""
+
+    def __init__(self, collection=None, refresh_interval=60, locks=None):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        if locks is None and collection is not None:
+            locks = CalendarLocks(collection.database.hearing_locks)
+        self.locks = locks
+        self.intervals = IntervalIndex()
+        self._hearings = {}
+        self._lock = threading.RLock()
+        self._loaded_at = None
+
+    def __len__(self):
+        return len(self._hearings)
+
+    def load(self, since=None):
+        """Rebuild the index from active hearings in the collection"""
+        since = since or datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        intervals = IntervalIndex()
+        hearings = {}
+        cursor = self.collection.find(
+            {'status': {'$in': list(ACTIVE_STATUSES)}, 'hearing_date': {'$gte': since - datetime.timedelta(days=1)}},
+            {'hearing_date': 1, 'hearing_time': 1, 'duration_minutes': 1, 'judge_name': 1, 'courtroom': 1}
+        )
+        for hearing in cursor:
+            self._index(intervals, hearings, hearing)
+
+        with self._lock:
+            self.intervals = intervals
+            self._hearings = hearings
+            self._loaded_at = time.monotonic()
+        logger.info("Hearing index loaded with %d active hearings", len(hearings))
+        return self
+
+    def _maybe_reload(self):
+        # Other worker processes write to the same collection
+        if self.collection is None:
+            return
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.load()
+
+    @staticmethod
+    def _index(intervals, hearings, hearing):
+        hearing_id = str(hearing['_id'])
+        start, end = hearing_bounds(hearing)
+        keys = []
+        for resource, field in (('judge', 'judge_name'), ('courtroom', 'courtroom')):
+            if hearing.get(field):
+                key = resource_key(resource, hearing[field])
+                intervals.add(key, start, end, hearing_id)
+                keys.append(key)
+        hearings[hearing_id] = (start, keys)
+
+    def conflicts(self, start, end, judge=None, courtroom=None):
+        """Existing hearings overlapping [start, end) for the judge or courtroom"""
+        found = []
+        for resource, name in (('judge', judge), ('courtroom', courtroom)):
+            if not name:
+                continue
+            for _, _, hearing_id in self.intervals.overlapping(resource_key(resource, name), start, end):
+                found.append((resource, str(name).strip(), hearing_id))
+        return found
+
+    def add(self, hearing):
+        with self._lock:
+            self._index(self.intervals, self._hearings, hearing)
+
+    def discard(self, hearing_id):
+        with self._lock:
+            entry = self._hearings.pop(str(hearing_id), None)
+            if entry is None:
+                return False
+            start, keys = entry
+            for key in keys:
+                self.intervals.remove(key, start, str(hearing_id))
+            return True
+
+    def _stored_conflicts(self, start, end, judge=None, courtroom=None):
+        """Like conflicts, but read from the collection rather than this process's index"""
+        first = datetime.datetime.combine(start.date(), datetime.time())
+        last = datetime.datetime.combine(end.date(), datetime.time()) + datetime.timedelta(days=1)
+        stored = IntervalIndex()
+        cursor = self.collection.find(
+            {'status': {'$in': list(ACTIVE_STATUSES)},
+             'hearing_date': {'$gte': first - datetime.timedelta(days=1), '$lt': last}},
+            {'hearing_date': 1, 'hearing_time': 1, 'duration_minutes': 1, 'judge_name': 1, 'courtroom': 1}
+        )
+        hearings = {}
+        for other in cursor:
+            self._index(stored, hearings, other)
+        found = []
+        for resource, name in (('judge', judge), ('courtroom', courtroom)):
+            if name:
+                for _, _, hearing_id in stored.overlapping(resource_key(resource, name), start, end):
+                    found.append((resource, str(name).strip(), hearing_id))
+        return found
+
+    def book(self, hearing):
+        """Insert a hearing document after checking judge and courtroom availability.
+
+        The in-memory index turns most clashes away cheaply, but it only knows
+        this process's bookings since its last reload. The insert itself runs
+        under the judge's and courtroom's calendar leases, after checking the
+        collection again, so two workers cannot double-book a slot.
+
+        Raises HearingConflict if either resource is already booked, and
+        CalendarBusy if another booking holds the calendar for too long.
+        """
+        start, end = hearing_bounds(hearing)
+        judge, courtroom = hearing.get('judge_name'), hearing.get('courtroom')
+        active = hearing.get('status', 'scheduled') in ACTIVE_STATUSES
+        with self._lock:
+            self._maybe_reload()
+            clashes = self.conflicts(start, end, judge, courtroom)
+            if clashes:
+                raise HearingConflict(*clashes[0])
+            hearing.setdefault('_id', ObjectId())
+            if self.collection is not None:
+                if active:
+                    self._write_if_free(hearing, start, end, lambda: self.collection.insert_one(hearing))
+                else:
+                    self.collection.insert_one(hearing)
+            if active:
+                self.add(hearing)
+            return hearing
+
+    def _write_if_free(self, hearing, start, end, write):
+        """Run write under the hearing's calendar leases if the collection shows no clash with other hearings"""
+        held, owner = self.locks.acquire(calendar_lock_ids(hearing, start, end)) if self.locks else ([], None)
+        try:
+            clashes = [clash for clash in self._stored_conflicts(start, end, hearing.get('judge_name'),
+                                                                 hearing.get('courtroom'))
+                       if clash[2] != str(hearing['_id'])]
+            if clashes:
+                raise HearingConflict(*clashes[0])
+            return write()
+        finally:
+            if self.locks:
+                self.locks.release(held, owner)
+
+    def set_status(self, hearing_id, status):
+        """Update a hearing's status and keep the index in step with it; False if there is no such hearing
+
+        Making a hearing active again re-checks its slot like book() does and
+        raises HearingConflict if it has been taken since.
+        """
+        if not ObjectId.is_valid(hearing_id):
+            return False
+        with self._lock:
+            if self.collection is not None:
+                query = {'_id': ObjectId(hearing_id)}
+                update = {'$set': {'status': status, 'updated_at': datetime.datetime.utcnow()}}
+                projection = {'hearing_date': 1, 'hearing_time': 1, 'duration_minutes': 1,
+                              'judge_name': 1, 'courtroom': 1, 'status': 1}
+                hearing = self.collection.find_one(query, projection)
+                if hearing is None:
+                    return False
+                if status in ACTIVE_STATUSES and hearing.get('status') not in ACTIVE_STATUSES:
+                    start, end = hearing_bounds(hearing)
+                    self._write_if_free(hearing, start, end, lambda: self.collection.update_one(query, update))
+                else:
+                    self.collection.update_one(query, update)
+            else:
+                hearing = None
+
+            self.discard(hearing_id)
+            if status in ACTIVE_STATUSES and hearing is not None:
+                self.add(hearing)
+            return True
+
+    def free_slots(self, duration, n=5, judge=None, courtroom=None, after=None,
+                   day_start=DAY_START, day_end=DAY_END, step=SLOT_STEP, max_days=90):
+        """Next n open (start, end) slots where both the judge and courtroom are free"""
+        if isinstance(duration, (int, float)):
+            duration = datetime.timedelta(minutes=duration)
+        after = after or datetime.datetime.now()
+        keys = [resource_key(r, name) for r, name in (('judge', judge), ('courtroom', courtroom)) if name]
+
+        with self._lock:
+            self._maybe_reload()
+            slots = []
+            day = after.date()
+            for _ in range(max_days):
+                if day.weekday() < 5:
+                    opens = datetime.datetime.combine(day, day_start)
+                    closes = datetime.datetime.combine(day, day_end)
+                    busy = sorted(
+                        (s, e) for key in keys for s, e, _ in self.intervals.overlapping(key, opens, closes)
+                    )
+                    cursor = _align(max(opens, after), opens, step)
+                    for busy_start, busy_end in busy + [(closes, closes)]:
+                        while cursor + duration <= busy_start and len(slots) < n:
+                            slots.append((cursor, cursor + duration))
+                            cursor += duration
+                        if len(slots) >= n:
+                            return slots
+                        cursor = max(cursor, _align(busy_end, opens, step))
+                day += datetime.timedelta(days=1)
+            return slots
+
+
+def _align(moment, origin, step):
+    """Round moment up to the next step boundary counted from origin"""
+    offset = moment - origin
+    remainder = offset % step
+    return moment if not remainder else moment + (step - remainder)
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Batch hearing scheduler for pending case filings
+"""
+
+import argparse
+import datetime
+import heapq
+import logging
+import os
+import time
+import uuid
+
+from pymongo import UpdateOne
+
+from hearing_index import (ACTIVE_STATUSES, DAY_START, DAY_END, DEFAULT_DURATION_MINUTES, CalendarBusy,
+                           CalendarLocks, IntervalIndex, calendar_lock_ids, hearing_bounds, resource_key)
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Lower numbers are heard first; time-bound proceedings lead
+CASE_TYPE_PRIORITY = {
+    'bankruptcy': 0,
+    'commercial': 1,
+    'corporate': 2,
+    'civil': 3
+}
+DEFAULT_PRIORITY = 5
+
+SCHEDULER_USERNAME = 'scheduler'
+
+# Only one run at a time may hold this lease; it is renewed after every written batch
+SCHEDULER_LEASE = 'hearing_scheduler'
+LEASE_SECONDS = 300
+# Finished jobs stay pollable for a week
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+# A batch holds the judge and courtroom days it books while it re-checks and writes them
+CALENDAR_LOCK_SECONDS = 60
+CALENDAR_WAIT_SECONDS = 30
+
+
+class SchedulerBusy(Exception):
+    """Raised when a scheduler run is started while another holds the lease"""
+
+
+def _day_offsets(day_start, day_end, duration, gap, capacity=None):
+    """Start offsets of the hearing slots that fit in one sitting day"""
+    opens = datetime.datetime.combine(datetime.date.min, day_start)
+    closes = datetime.datetime.combine(datetime.date.min, day_end)
+    offsets = []
+    cursor = opens
+    while cursor + duration <= closes and (capacity is None or len(offsets) < capacity):
+        offsets.append(cursor - opens)
+        cursor += duration + gap
+    return offsets
+
+
+def _day_benches(day, day_index, judges, courtrooms, unavailable):
+    """Pair the judges sitting on day with courtrooms, rotating who gets a room"""
+    sitting = [j for j in judges if day not in unavailable.get(j, ())]
+    if not sitting:
+        return []
+    shift = day_index % len(sitting)
+    sitting = sitting[shift:] + sitting[:shift]
+    return list(zip(sitting, courtrooms))
+
+
+def plan_hearings(cases, judges, courtrooms, start_date=None, duration_minutes=DEFAULT_DURATION_MINUTES,
+                  gap_minutes=15, day_start=DAY_START, day_end=DAY_END, courtroom_capacity=None,
+                  min_notice_days=7, unavailable=None, hearing_index=None,
+                  priorities=CASE_TYPE_PRIORITY, max_days=730):
+    """Assign a judge, courtroom, date and time to every case that fits.
+
+    Slots are generated in chronological order, one sitting day at a time, and
+    each slot goes to the highest-priority case that is eligible on that day
+    (filed at least min_notice_days earlier). Slots clashing with hearings
+    already in hearing_index are skipped. Returns (assignments, unscheduled)
+    where each assignment is (case, judge, courtroom, start_datetime).
+    """
+    if not judges or not courtrooms:
+        raise ValueError("At least one judge and one courtroom are required")
+
+    start_date = start_date or (datetime.date.today() + datetime.timedelta(days=1))
+    duration = datetime.timedelta(minutes=duration_minutes)
+    gap = datetime.timedelta(minutes=gap_minutes)
+    notice = datetime.timedelta(days=min_notice_days)
+    unavailable = unavailable or {}
+    offsets = _day_offsets(day_start, day_end, duration, gap, courtroom_capacity)
+    if not offsets:
+        raise ValueError("No hearing fits between day_start and day_end")
+
+    # Cases ordered by the first day they may be heard
+    pending = []
+    for seq, case in enumerate(cases):
+        filed = case.get('filing_date')
+        filed_day = filed.date() if isinstance(filed, datetime.datetime) else (filed or start_date)
+        priority = priorities.get(str(case.get('case_type') or '').lower(), DEFAULT_PRIORITY)
+        pending.append((filed_day + notice, priority, filed_day, seq, case))
+    pending.sort(key=lambda p: (p[0], p[1], p[2], p[3]))
+
+    assignments = []
+    ready = []
+    next_case = 0
+    day = start_date
+    last_day = start_date + datetime.timedelta(days=max_days)
+    while ready or next_case < len(pending):
+        # Nothing eligible yet: jump straight to the next eligible day
+        if not ready and pending[next_case][0] > day:
+            day = pending[next_case][0]
+        if day >= last_day:
+            break
+        while next_case < len(pending) and pending[next_case][0] <= day:
+            _, priority, filed_day, seq, case = pending[next_case]
+            heapq.heappush(ready, (priority, filed_day, seq, case))
+            next_case += 1
+
+        if day.weekday() < 5:
+            benches = _day_benches(day, (day - start_date).days, judges, courtrooms, unavailable)
+            opens = datetime.datetime.combine(day, day_start)
+            for offset in offsets:
+                if not ready:
+                    break
+                start = opens + offset
+                for judge, courtroom in benches:
+                    if not ready:
+                        break
+                    if hearing_index is not None and hearing_index.conflicts(start, start + duration, judge, courtroom):
+                        continue
+                    case = heapq.heappop(ready)[3]
+                    assignments.append((case, judge, courtroom, start))
+        day += datetime.timedelta(days=1)
+
+    unscheduled = [entry[3] for entry in ready] + [entry[4] for entry in pending[next_case:]]
+    return assignments, unscheduled
+
+
+def hearing_document(case, judge, courtroom, start, duration_minutes=DEFAULT_DURATION_MINUTES,
+                     hearing_type='Initial Hearing'):
+    """Build a hearing_schedules document in the same shape as submit_hearing"""
+    now = datetime.datetime.utcnow()
+    return {
+        'case_number': case['case_number'],
+        'hearing_type': hearing_type,
+        'hearing_date': datetime.datetime.combine(start.date(), datetime.time()),
+        'hearing_time': datetime.datetime.combine(datetime.date(1900, 1, 1), start.time()),
+        'duration_minutes': duration_minutes,
+        'judge_name': judge,
+        'courtroom': courtroom,
+        'user_id': None,
+        'username': SCHEDULER_USERNAME,
+        'created_at': now,
+        'status': 'scheduled'
+    }
+
+
+def load_pending_cases(db):
+    """Pending filings that have no hearing scheduled yet"""
+    return list(db.case_filings.find(
+        {'status': 'pending', 'next_hearing_date': {'$exists': False}},
+        {'case_number': 1, 'case_type': 1, 'filing_date': 1}
+    ))
+
+
+def ensure_indexes(db):
+    # One scheduler-written hearing per filing, so replaying a claim cannot book twice
+    db.hearing_schedules.create_index('filing_id', unique=True,
+                                      partialFilterExpression={'filing_id': {'$exists': True}})
+    db.case_filings.create_index('hearing_claim.job_id', sparse=True)
+    db.scheduler_jobs.create_index('finished_at', expireAfterSeconds=JOB_RETENTION_SECONDS)
+
+
+def _stored_hearings(db, first, last):
+    """Active hearings on the days first..last by judge and courtroom, keyed by filing_id where they have one"""
+    stored = IntervalIndex()
+    cursor = db.hearing_schedules.find(
+        {'status': {'$in': list(ACTIVE_STATUSES)},
+         'hearing_date': {'$gte': first - datetime.timedelta(days=1), '$lte': last}},
+        {'hearing_date': 1, 'hearing_time': 1, 'duration_minutes': 1, 'judge_name': 1, 'courtroom': 1, 'filing_id': 1}
+    )
+    for hearing in cursor:
+        _add_hearing(stored, hearing, str(hearing.get('filing_id') or hearing['_id']))
+    return stored
+
+
+def _add_hearing(intervals, hearing, item_id):
+    start, end = hearing_bounds(hearing)
+    for resource, field in (('judge', 'judge_name'), ('courtroom', 'courtroom')):
+        if hearing.get(field):
+            intervals.add(resource_key(resource, hearing[field]), start, end, item_id)
+
+
+def _clashes(intervals, hearing, item_id):
+    start, end = hearing_bounds(hearing)
+    return any(other != item_id
+               for resource, field in (('judge', 'judge_name'), ('courtroom', 'courtroom')) if hearing.get(field)
+               for _, _, other in intervals.overlapping(resource_key(resource, hearing[field]), start, end))
+
+
+def _release_claims(db, filing_ids):
+    # Back to pending and unscheduled, so the next run plans them again
+    db.case_filings.update_many({'_id': {'$in': filing_ids}},
+                                {'$unset': {'hearing_claim': '', 'next_hearing_date': ''}})
+
+
+def _write_claimed(db, filings):
+    """Upsert the hearing recorded in each filing's claim, then clear the claims; returns the hearings written
+
+    The plan was made against the bookings known when the run started, so the
+    batch's judge and courtroom days are leased (the CalendarLocks that
+    HearingIndex.book takes) and the collection checked again under them.
+    Filings whose slot has been booked since lose their claim instead.
+    """
+    if not filings:
+        return 0
+    hearings = {}
+    for filing in filings:
+        claim = filing['hearing_claim']
+        hearings[filing['_id']] = hearing_document(filing, claim['judge_name'], claim['courtroom'], claim['start'],
+                                                   claim['duration_minutes'])
+    bounds = {filing_id: hearing_bounds(hearing) for filing_id, hearing in hearings.items()}
+    locks = CalendarLocks(db.hearing_locks, lock_seconds=CALENDAR_LOCK_SECONDS, wait_seconds=CALENDAR_WAIT_SECONDS)
+    try:
+        held, owner = locks.acquire([lock_id for filing_id, hearing in hearings.items()
+                                     for lock_id in calendar_lock_ids(hearing, *bounds[filing_id])])
+    except CalendarBusy as e:
+        logger.warning("Released %d hearing claims for replanning: %s", len(hearings), e)
+        _release_claims(db, list(hearings))
+        return 0
+
+    try:
+        stored = _stored_hearings(db, min(start for start, _ in bounds.values()).replace(hour=0, minute=0),
+                                  max(end for _, end in bounds.values()))
+        free, clashing = [], []
+        for filing_id, hearing in hearings.items():
+            if _clashes(stored, hearing, str(filing_id)):
+                clashing.append(filing_id)
+            else:
+                # Later filings of the batch must not clash with this one either
+                _add_hearing(stored, hearing, str(filing_id))
+                free.append(filing_id)
+        if free:
+            db.hearing_schedules.bulk_write([UpdateOne({'filing_id': filing_id}, {'$setOnInsert': hearings[filing_id]},
+                                                       upsert=True) for filing_id in free], ordered=False)
+            db.case_filings.update_many({'_id': {'$in': free}}, {'$unset': {'hearing_claim': ''}})
+        if clashing:
+            logger.warning("%d planned hearings were booked by someone else meanwhile; left for replanning",
+                           len(clashing))
+            _release_claims(db, clashing)
+    finally:
+        locks.release(held, owner)
+    return len(free)
+
+
+def recover_claims(db, batch_size=5000):
+    """Finish writing hearings for filings claimed by a run that stopped before writing them"""
+    recovered = 0
+    while True:
+        filings = list(db.case_filings.find({'hearing_claim': {'$exists': True}},
+                                            {'case_number': 1, 'hearing_claim': 1}).limit(batch_size))
+        if not filings:
+            break
+        recovered += _write_claimed(db, filings)
+    if recovered:
+        logger.warning("Wrote %d hearings left unwritten by an interrupted scheduler run", recovered)
+    return recovered
+
+
+def write_schedule(db, assignments, duration_minutes=DEFAULT_DURATION_MINUTES, batch_size=5000,
+                   job_id=None, heartbeat=None):
+    """Persist assignments with unordered bulk writes, batch_size operations at a time.
+
+    Each filing is claimed first by a conditional update that only matches
+    while it is still pending and unscheduled; the claim sets
+    next_hearing_date and records the hearing it gets. Hearings are then
+    upserted on filing_id for the filings this run claimed, and the claims
+    cleared. A run that stops between the two leaves claims behind, which
+    recover_claims turns into hearings, so a filing is never booked twice.
+    Hearings booked since the plan was made win: filings clashing with them
+    are released for the next run rather than written (see _write_claimed).
+    heartbeat, if given, is called after every batch.
+    """
+    job_id = job_id or uuid.uuid4().hex
+    written = 0
+    for i in range(0, len(assignments), batch_size):
+        batch = assignments[i:i + batch_size]
+        claims = []
+        for case, judge, courtroom, start in batch:
+            claims.append(UpdateOne(
+                {'_id': case['_id'], 'status': 'pending', 'next_hearing_date': {'$exists': False}},
+                {'$set': {'next_hearing_date': start, 'hearing_claim': {
+                    'job_id': job_id, 'judge_name': judge, 'courtroom': courtroom, 'start': start,
+                    'duration_minutes': duration_minutes}}}
+            ))
+        db.case_filings.bulk_write(claims, ordered=False)
+        claimed = list(db.case_filings.find({'hearing_claim.job_id': job_id},
+                                            {'case_number': 1, 'hearing_claim': 1}))
+        written += _write_claimed(db, claimed)
+        logger.info("Scheduled %d/%d hearings", written, len(assignments))
+        if heartbeat:
+            heartbeat()
+    return written
+
+
+def run_scheduler(db, judges, courtrooms, dry_run=False, hearing_index=None, job_id=None, heartbeat=None,
+                  **options):
+    """Load pending filings, plan their hearings and write the result"""
+    started = time.perf_counter()
+    if not dry_run:
+        recover_claims(db)
+    if hearing_index is not None and hearing_index.collection is not None:
+        # Plan around every booking made so far, not just this process's view of them
+        hearing_index.load()
+    cases = load_pending_cases(db)
+    loaded = time.perf_counter()
+
+    assignments, unscheduled = plan_hearings(cases, judges, courtrooms, hearing_index=hearing_index, **options)
+    planned = time.perf_counter()
+    if heartbeat:
+        heartbeat()
+
+    written = 0
+    if not dry_run and assignments:
+        written = write_schedule(db, assignments, options.get('duration_minutes', DEFAULT_DURATION_MINUTES),
+                                 job_id=job_id, heartbeat=heartbeat)
+    finished = time.perf_counter()
+
+    return {
+        'pending': len(cases),
+        'scheduled': len(assignments),
+        'unscheduled': len(unscheduled),
+        'written': written,
+        'last_hearing': max((a[3] for a in assignments), default=None),
+        'load_seconds': round(loaded - started, 3),
+        'plan_seconds': round(planned - loaded, 3),
+        'write_seconds': round(finished - planned, 3)
+    }
+
+
+def acquire_lease(db):
+    """Take the scheduler lease, which keeps a second run out however many workers or admins ask.
+
+    Returns (locks, held, owner) and raises SchedulerBusy if a run holds it.
+    """
+    locks = CalendarLocks(db.hearing_locks, lock_seconds=LEASE_SECONDS, wait_seconds=0)
+    try:
+        held, owner = locks.acquire([SCHEDULER_LEASE])
+    except CalendarBusy:
+        raise SchedulerBusy("A hearing scheduler run is already in progress")
+    return locks, held, owner
+
+
+def renew_lease(locks, held, owner):
+    """Extend the scheduler lease; a run that has lost it must stop writing"""
+    if not locks.renew(held, owner):
+        raise SchedulerBusy("The scheduler lease expired and may have been taken by another run")
+
+
+def start_background_job(db, judges, courtrooms, on_complete=None, **options):
+    """Run the scheduler in a daemon thread and return a job id to poll.
+
+    The job's state is kept in scheduler_jobs so any worker can answer for
+    it. Raises SchedulerBusy if another run holds the scheduler lease.
+    """
+    locks, held, owner = acquire_lease(db)
+    job_id = uuid.uuid4().hex
+    jobs = db.scheduler_jobs
+    try:
+        jobs.insert_one({'_id': job_id, 'status': 'running', 'started_at': datetime.datetime.utcnow(),
+                         'heartbeat_at': datetime.datetime.utcnow(), 'result': None})
+    except BaseException:
+        locks.release(held, owner)
+        raise
+
+    def heartbeat():
+        renew_lease(locks, held, owner)
+        jobs.update_one({'_id': job_id}, {'$set': {'heartbeat_at': datetime.datetime.utcnow()}})
+
+    def work():
+        try:
+            with tracing.span('hearing_scheduler.run', job_id=job_id):
+                result = run_scheduler(db, judges, courtrooms, job_id=job_id, heartbeat=heartbeat, **options)
+            jobs.update_one({'_id': job_id}, {'$set': {'status': 'completed', 'result': result}})
+            if on_complete:
+                on_complete(result)
+        except Exception as e:
+            logger.error("Scheduler job %s failed: %s", job_id, e)
+            jobs.update_one({'_id': job_id}, {'$set': {'status': 'error', 'error': str(e)}})
+        finally:
+            jobs.update_one({'_id': job_id}, {'$set': {'finished_at': datetime.datetime.utcnow()}})
+            locks.release(held, owner)
+
+    # The job's spans join the trace of the request that started it
+    tracing.start_thread(work, name=f"hearing-scheduler-{job_id[:8]}")
+    return job_id
+
+
+def get_job(db, job_id):
+    job = db.scheduler_jobs.find_one({'_id': job_id})
+    if job is None:
+        return None
+    job['id'] = job.pop('_id')
+    # A job whose worker died keeps status 'running'; its heartbeat gives it away
+    if (job['status'] == 'running' and
+            datetime.datetime.utcnow() - job['heartbeat_at'] > datetime.timedelta(seconds=LEASE_SECONDS)):
+        job['status'] = 'abandoned'
+    return job
+
+
+def default_judges(csv_path='cases.csv'):
+    """Judges named in the historical dataset"""
+    from case_data import iter_case_rows
+    return sorted({row['Judge Name'] for row in iter_case_rows(csv_path) if row.get('Judge Name')})
+
+
+def parse_courtrooms(value):
+    """'12' means Courtroom 1..12; anything else is a comma-separated list"""
+    if value.isdigit():
+        return [f"Courtroom {i}" for i in range(1, int(value) + 1)]
+    return [c.strip() for c in value.split(',') if c.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Schedule hearings for all pending case filings")
+    parser.add_argument('--judges', help="Comma-separated judge names (default: judges in cases.csv)")
+    parser.add_argument('--courtrooms', default='10', help="Number of courtrooms or comma-separated names")
+    parser.add_argument('--start-date', help="First hearing date, YYYY-MM-DD (default: tomorrow)")
+    parser.add_argument('--duration', type=int, default=DEFAULT_DURATION_MINUTES, help="Hearing length in minutes")
+    parser.add_argument('--gap', type=int, default=15, help="Minimum minutes between hearings in a courtroom")
+    parser.add_argument('--capacity', type=int, help="Maximum hearings per courtroom per day")
+    parser.add_argument('--min-notice-days', type=int, default=7, help="Minimum days between filing and hearing")
+    parser.add_argument('--dry-run', action='store_true', help="Plan only, do not write to the database")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+    load_dotenv()
+
+    mongodb_url = os.getenv('MONGODB_URL')
+    if not mongodb_url:
+        print("❌ Error: MONGODB_URL not found in .env file")
+        return 1
+    db = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000).court_db
+
+    judges = [j.strip() for j in args.judges.split(',')] if args.judges else default_judges()
+    options = {
+        'duration_minutes': args.duration,
+        'gap_minutes': args.gap,
+        'courtroom_capacity': args.capacity,
+        'min_notice_days': args.min_notice_days
+    }
+    if args.start_date:
+        options['start_date'] = datetime.datetime.strptime(args.start_date, '%Y-%m-%d').date()
+
+    from hearing_index import HearingIndex
+    hearing_index = HearingIndex(db.hearing_schedules)
+    if args.dry_run:
+        result = run_scheduler(db, judges, parse_courtrooms(args.courtrooms), dry_run=True,
+                               hearing_index=hearing_index, **options)
+    else:
+        ensure_indexes(db)
+        try:
+            locks, held, owner = acquire_lease(db)
+        except SchedulerBusy as e:
+            print(f"❌ {e}")
+            return 1
+        try:
+            result = run_scheduler(db, judges, parse_courtrooms(args.courtrooms), hearing_index=hearing_index,
+                                   heartbeat=lambda: renew_lease(locks, held, owner), **options)
+        finally:
+            locks.release(held, owner)
+
+    print(f"📅 Pending filings: {result['pending']}")
+    print(f"✅ Scheduled: {result['scheduled']}  ⚠️  Unscheduled: {result['unscheduled']}")
+    print(f"   Last hearing: {result['last_hearing']}")
+    print(f"   Load {result['load_seconds']}s, plan {result['plan_seconds']}s, write {result['write_seconds']}s")
+    if args.dry_run:
+        print("   Dry run - nothing was written")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,251 @@
+import re
+import html
+import time
+import heapq
+import logging
+import threading
+from collections import Counter, OrderedDict
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry no meaning for autocomplete suggestions
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is',
+    'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'with'
+}
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens"""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl=300, max_entries=512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _TrieNode:
+    __slots__ = ('children', 'count', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.count = 0
+        self.top = []
+
+
+class TermTrie:
+    """Prefix tree where every node stores its most frequent completions"""
+
+    def __init__(self, max_suggestions=8):
+        self.max_suggestions = max_suggestions
+        self.root = _TrieNode()
+        self.size = 0
+
+    def build(self, term_counts):
+        """Build the trie from a {term: frequency} mapping"""
+        root = _TrieNode()
+        for term, count in term_counts.items():
+            node = root
+            for ch in term:
+                child = node.children.get(ch)
+                if child is None:
+                    child = node.children[ch] = _TrieNode()
+                node = child
+            node.count += count
+
+        # Post-order pass so each node keeps the top completions of its subtree
+        stack = [(root, '', False)]
+        while stack:
+            node, prefix, visited = stack.pop()
+            if not visited:
+                stack.append((node, prefix, True))
+                for ch, child in node.children.items():
+                    stack.append((child, prefix + ch, False))
+                continue
+            candidates = [(node.count, prefix)] if node.count else []
+            for child in node.children.values():
+                candidates.extend(child.top)
+            node.top = heapq.nlargest(self.max_suggestions, candidates, key=lambda c: (c[0], -len(c[1])))
+
+        self.root = root
+        self.size = len(term_counts)
+        return self
+
+    def suggest(self, prefix, limit=None):
+        """Return the most frequent terms starting with prefix"""
+        node = self.root
+        for ch in prefix.lower():
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        limit = limit or self.max_suggestions
+        return [term for _, term in node.top[:limit]]
+
+
+def make_snippet(text, terms, width=160):
+    """Cut a window of text around the first matching term and highlight all matches"""
+    text = text or ''
+    if not terms:
+        return html.escape(text[:width])
+
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(t) for t in terms) + r')', re.IGNORECASE)
+    match = pattern.search(text)
+    start = 0
+    if match and match.start() > width // 3:
+        start = match.start() - width // 3
+        # Avoid cutting a word in half
+        space = text.rfind(' ', 0, start)
+        start = space + 1 if space != -1 else start
+    window = text[start:start + width]
+
+    parts = []
+    last = 0
+    for m in pattern.finditer(window):
+        parts.append(html.escape(window[last:m.start()]))
+        parts.append('<mark>' + html.escape(m.group(0)) + '</mark>')
+        last = m.end()
+    parts.append(html.escape(window[last:]))
+
+    snippet = ''.join(parts)
+    if start > 0:
+        snippet = '&hellip;' + snippet
+    if start + width < len(text):
+        snippet += '&hellip;'
+    return snippet
+
+
+class LegalResourceSearch:
+    """Ranked search and autocomplete over the legal_resources collection"""
+
+    def __init__(self, collection, cache_ttl=300, trie_refresh=600, max_suggestions=8, cache=None):
+        self.collection = collection
+        # Any object with get/set/clear, e.g. a namespace of the application cache
+        self.cache = cache if cache is not None else TTLCache(ttl=cache_ttl)
+        self.trie = TermTrie(max_suggestions=max_suggestions)
+        self.trie_refresh = trie_refresh
+        self._trie_built_at = None
+        self._trie_lock = threading.Lock()
+
+    def start(self):
+        """Build the term trie in the background so the first suggest need not wait for it"""
+        self._ensure_trie()
+        return self
+
+    def search(self, query, limit=20, category=None):
+        """Run a $text search ranked by textScore with highlighted snippets"""
+        query = (query or '').strip()
+        if not query:
+            return []
+
+        key = (query.lower(), limit, category)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        mongo_query = {'$text': {'$search': query}}
+        if category:
+            mongo_query['category'] = category
+        cursor = self.collection.find(
+            mongo_query,
+            {'score': {'$meta': 'textScore'}, 'title': 1, 'content': 1, 'category': 1, 'url': 1}
+        ).sort([('score', {'$meta': 'textScore'})]).limit(limit)
+
+        terms = [t for t in tokenize(query) if t not in STOPWORDS]
+        results = []
+        for doc in cursor:
+            results.append({
+                'id': str(doc['_id']),
+                'title': doc.get('title', ''),
+                'title_html': make_snippet(doc.get('title', ''), terms, width=200),
+                'snippet': make_snippet(doc.get('content', ''), terms),
+                'category': doc.get('category'),
+                'url': doc.get('url'),
+                'score': round(doc.get('score', 0.0), 4)
+            })
+
+        self.cache.set(key, results)
+        return results
+
+    def suggest(self, prefix, limit=8):
+        """Autocomplete the last word of prefix from the precomputed term trie"""
+        prefix = (prefix or '').lower()
+        words = prefix.split()
+        if not words or prefix.endswith(' '):
+            return []
+        self._ensure_trie()
+
+        head = ' '.join(words[:-1])
+        completions = self.trie.suggest(words[-1], limit)
+        return [f"{head} {term}" if head else term for term in completions]
+
+    def refresh(self):
+        """Rebuild the term trie from every resource title and body"""
+        counts = Counter()
+        for doc in self.collection.find({}, {'title': 1, 'content': 1}):
+            # Title terms are weighted up so they surface first
+            for token in tokenize(doc.get('title')):
+                if len(token) > 1 and token not in STOPWORDS:
+                    counts[token] += 3
+            for token in tokenize(doc.get('content')):
+                if len(token) > 1 and token not in STOPWORDS:
+                    counts[token] += 1
+
+        trie = TermTrie(max_suggestions=self.trie.max_suggestions).build(counts)
+        self.trie = trie
+        self._trie_built_at = time.monotonic()
+        self.cache.clear()
+        logger.info("Legal resource trie rebuilt with %d terms", trie.size)
+
+    def _trie_stale(self):
+        return (self._trie_built_at is None or
+                time.monotonic() - self._trie_built_at > self.trie_refresh)
+
+    def _background_refresh(self):
+        try:
+            if self._trie_stale():
+                self.refresh()
+        except Exception as e:
+            # Keep serving the previous trie and retry once it is due again
+            self._trie_built_at = time.monotonic()
+            logger.error("Legal resource trie rebuild failed: %s", e)
+        finally:
+            self._trie_lock.release()
+
+    def _ensure_trie(self):
+        # Rebuilds never run on the request thread: until the first one finishes,
+        # suggest answers from the empty trie, afterwards from the previous one
+        if self._trie_stale() and self._trie_lock.acquire(blocking=False):
+            tracing.start_thread(self._background_refresh, name='legal-search-trie')
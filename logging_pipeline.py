@@ -0,0 +1,156 @@
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+# Arguments of these types can be formatted later on the writer thread;
+# anything else is formatted by the caller before it can be mutated
+IMMUTABLE_ARG_TYPES = (str, bytes, int, float, bool, type(None), datetime.date, datetime.datetime)
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed with extra= are included as keys"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_FIELDS and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every N records per logger and message template.
+
+    rates maps logger names to the fraction of records to keep (0.1 keeps
+    every tenth); a logger inherits the rate of its nearest configured
+    parent. Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {name: rate for name, rate in rates.items() if rate < 1}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return self.rates.get('root', 1)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % round(1 / rate) == 0
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread without formatting them in the request.
+
+    The stdlib QueueHandler merges msg and args before enqueueing; here that
+    only happens when an argument is mutable, and tracebacks are rendered up
+    front so frames are not kept alive on the queue.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        # A single mapping argument is itself mutable, so it counts as unsafe too
+        if record.args and not (isinstance(record.args, tuple)
+                                and all(isinstance(arg, IMMUTABLE_ARG_TYPES) for arg in record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_sample_rates(spec):
+    """'werkzeug=0.1,app=0.5' -> {'werkzeug': 0.1, 'app': 0.5}"""
+    rates = {}
+    for part in (spec or '').split(','):
+        name, _, rate = part.partition('=')
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+_listener = None
+
+
+def configure_logging(level=None, fmt=None, sample_rates=None, stream=None):
+    """Route all logging through a queue to one background writer thread.
+
+    Settings default to LOG_LEVEL, LOG_FORMAT ('json' or 'text') and
+    LOG_SAMPLE ('logger=rate,...') from the environment. Safe to call more
+    than once; later calls replace the previous pipeline.
+    """
+    global _listener
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+    fmt = fmt or os.getenv('LOG_FORMAT', 'json')
+    if sample_rates is None:
+        sample_rates = parse_sample_rates(os.getenv('LOG_SAMPLE'))
+
+    writer = logging.StreamHandler(stream or sys.stderr)
+    writer.setFormatter(JsonFormatter() if fmt == 'json'
+                        else logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    handler = AsyncQueueHandler(queue.SimpleQueue())
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+
+    if _listener is not None:
+        _listener.stop()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, writer, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
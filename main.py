@@ -123,6 +123,65 @@ def run_flask_app():
         print(f"❌ Error starting Flask app: {e}")
         print("   Make sure you have set up your .env file correctly")
 
+def warm_models():
+    """Load the outcome model and encoders once in the server master, before workers fork"""
+    from predict import registry
+    registry.clear()
+    for path, error in registry.warm().items():
+        if error:
+            print(f"⚠️  Could not preload {path}: {error}")
+
+def warm_precedent_index():
+    """Build a missing or outdated precedent index in the server master, so workers only open it"""
+    from pymongo import MongoClient
+    from precedent_index import prepare_index
+    root = os.path.dirname(os.path.abspath(__file__))
+    mongodb_url = os.getenv('MONGODB_URL')
+    client = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000) if mongodb_url else None
+    try:
+        prepare_index(client.court_db if client is not None else None, csv_path=os.path.join(root, 'cases.csv'),
+                      path=os.getenv('PRECEDENT_INDEX_DIR', os.path.join(root, 'precedent_index')))
+    except Exception as e:
+        print(f"⚠️  Could not build the precedent index: {e}")
+    finally:
+        # MongoDB clients must not cross the fork into the workers
+        if client is not None:
+            client.close()
+
+def preload():
+    warm_models()
+    warm_precedent_index()
+
+def create_production_app():
+    from app import create_app
+    return create_app()
+
+def run_production_server(argv=None):
+    """Run the app on the pre-forking multi-worker server (see server.py)"""
+    import argparse
+    import server
+    from logging_pipeline import configure_logging
+
+    parser = argparse.ArgumentParser(prog='main.py serve', description="Run the production server")
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=server.default_workers(),
+                        help="Worker processes (default: WEB_CONCURRENCY or 2 x CPUs + 1)")
+    parser.add_argument('--threads', type=int, default=server.default_threads(),
+                        help="Request threads per worker (default: WEB_THREADS or 4)")
+    parser.add_argument('--graceful-timeout', type=float, default=server.GRACEFUL_TIMEOUT,
+                        help="Seconds in-flight requests get to finish on reload or shutdown")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    configure_logging()
+    print(f"🚀 Starting production server at http://{args.host}:{args.port} "
+          f"({args.workers} workers x {args.threads} threads)")
+    print("   kill -HUP <pid> reloads models and workers, Ctrl+C drains and stops")
+    server.Master(create_production_app, host=args.host, port=args.port, workers=args.workers,
+                  threads=args.threads, graceful_timeout=args.graceful_timeout, preload=preload).run()
+
 def run_streamlit_app():
     """Run the Streamlit application"""
     print("\n🚀 Starting Streamlit application...")
@@ -197,6 +256,11 @@ def check_system_status():
 
 def main():
     """Main function"""
+    # Non-interactive production mode: python main.py serve [--workers N] [--threads N]
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        run_production_server(sys.argv[2:])
+        return
+
     print("🏛️  Welcome to the Court Case Outcome Prediction System!")
     print("🔐 Now with JWT Authentication!")
     
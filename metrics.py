@@ -0,0 +1,355 @@
+import atexit
+import contextlib
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_CALL_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+FLUSH_INTERVAL = 1.0
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Per-process value; the multiprocess view sums the live values of all workers"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Non-cumulative bucket counts (last one is +Inf), then the sum
+                entry = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            entry['counts'][index] += 1
+            entry['sum'] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def _copy(value):
+        return {'counts': list(value['counts']), 'sum': value['sum']}
+
+
+class Registry:
+    """Metrics of this process, optionally shared with sibling workers through files.
+
+    With a multiprocess directory every process writes its own snapshot to
+    <dir>/metrics-<pid>.json about once a second, and a scrape merges all of
+    them: counters and histograms are summed, gauges summed over processes
+    that are still alive. Files of exited workers are kept so totals never go
+    backwards.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.multiprocess_dir = None
+        self._flusher = None
+        self._stop = threading.Event()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {
+            'type': metric.kind,
+            'help': metric.documentation,
+            'labels': list(metric.labelnames),
+            'buckets': list(getattr(metric, 'buckets', ())),
+            'samples': metric.snapshot()
+        } for metric in metrics}
+
+    # Multiprocess support
+
+    def enable_multiprocess(self, directory):
+        self.multiprocess_dir = directory
+        os.makedirs(directory, exist_ok=True)
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    def _after_fork(self):
+        # A forked worker starts from zero and reports under its own pid
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric._lock = threading.Lock()
+            metric._values = {}
+        self._flusher = None
+        if self.multiprocess_dir:
+            self.enable_multiprocess(self.multiprocess_dir)
+
+    def _process_file(self):
+        return os.path.join(self.multiprocess_dir, f"metrics-{os.getpid()}.json")
+
+    def flush(self):
+        if not self.multiprocess_dir:
+            return
+        path = self._process_file()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'pid': os.getpid(), 'metrics': self.snapshot()}, f)
+        os.replace(tmp_path, path)
+
+    def _flush_loop(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def collect(self):
+        """Merged view of all processes, or just this one without a multiprocess directory"""
+        if not self.multiprocess_dir:
+            return self.snapshot()
+        self.flush()
+        merged = {}
+        for path in glob.glob(os.path.join(self.multiprocess_dir, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(data.get('pid'))
+            for name, metric in data['metrics'].items():
+                if metric['type'] == 'gauge' and not alive:
+                    continue
+                target = merged.setdefault(name, dict(metric, samples={}))
+                for labels, value in metric['samples']:
+                    key = tuple(labels)
+                    current = target['samples'].get(key)
+                    if metric['type'] == 'histogram':
+                        if current is None:
+                            current = target['samples'][key] = {'counts': [0] * len(value['counts']), 'sum': 0.0}
+                        current['counts'] = [a + b for a, b in zip(current['counts'], value['counts'])]
+                        current['sum'] += value['sum']
+                    else:
+                        target['samples'][key] = (current or 0) + value
+        for metric in merged.values():
+            metric['samples'] = [[list(key), value] for key, value in metric['samples'].items()]
+        return merged
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for labels, value in metric['samples']:
+                pairs = list(zip(metric['labels'], labels))
+                if metric['type'] != 'histogram':
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(metric['buckets']) + ['+Inf'], value['counts']):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(value['sum'])}")
+                lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+def clear_multiprocess_dir(directory):
+    """Remove snapshots left by a previous run; call once before starting workers"""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+        os.remove(path)
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=REGISTRY._after_fork)
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests', ('route', 'method', 'status'))
+GEMINI_REQUEST_SECONDS = REGISTRY.histogram(
+    'gemini_request_duration_seconds', 'Latency of Gemini generate_content calls', ('call', 'outcome'),
+    buckets=SLOW_CALL_BUCKETS)
+GEMINI_TOKENS = REGISTRY.histogram(
+    'gemini_tokens', 'Prompt and response size of Gemini calls in tokens', ('call', 'kind'), buckets=TOKEN_BUCKETS)
+MONGO_COMMAND_SECONDS = REGISTRY.histogram(
+    'mongo_command_duration_seconds', 'Latency of MongoDB commands', ('command', 'outcome'))
+MODEL_INFERENCE_SECONDS = REGISTRY.histogram(
+    'model_inference_duration_seconds', 'Time spent in outcome model inference', ('model',))
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    'model_load_duration_seconds', 'Time spent loading model artifacts from disk', ('artifact',))
+CACHE_LOOKUPS = REGISTRY.counter(
+    'cache_lookups_total', 'Cache lookups by namespace and result (hit or miss)', ('namespace', 'result'))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records every driver command's server round-trip time"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome='ok')
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome='error')
+
+
+def timed_generate(model, prompt, call):
+    """model.generate_content with latency and token-size metrics"""
+    started = time.perf_counter()
+    try:
+        response = model.generate_content(prompt)
+    except Exception:
+        GEMINI_REQUEST_SECONDS.observe(time.perf_counter() - started, call=call, outcome='error')
+        raise
+    GEMINI_REQUEST_SECONDS.observe(time.perf_counter() - started, call=call, outcome='ok')
+
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None)
+    response_tokens = getattr(usage, 'candidates_token_count', None)
+    # Older SDKs report no usage; about four characters per token is close enough for sizing
+    if prompt_tokens is None:
+        prompt_tokens = len(prompt) // 4
+    if response_tokens is None:
+        try:
+            response_tokens = len(response.text or '') // 4
+        except ValueError:
+            # Blocked responses have no text
+            response_tokens = 0
+    GEMINI_TOKENS.observe(prompt_tokens, call=call, kind='prompt')
+    GEMINI_TOKENS.observe(response_tokens, call=call, kind='response')
+    return response
+
+
+def init_app(app, registry=REGISTRY):
+    """Time every request by route and status and serve the registry on /metrics"""
+    from flask import g, request, session
+
+    directory = os.getenv('METRICS_MULTIPROC_DIR')
+    if directory:
+        registry.enable_multiprocess(directory)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route,
+                                         method=request.method, status=response.status_code)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        # Scrapers send METRICS_TOKEN as a bearer token; a logged-in admin may look too.
+        # Without a token configured only admins get through.
+        token = os.getenv('METRICS_TOKEN')
+        authorization = request.headers.get('Authorization', '')
+        scraper = bool(token) and hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode())
+        if not scraper and session.get('role') != 'admin':
+            return app.response_class('Unauthorized\n', status=401, mimetype='text/plain',
+                                      headers={'WWW-Authenticate': 'Bearer'})
+        return app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
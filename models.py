@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
 
 def create_user(username, password, role='user', email=None):
@@ -57,30 +57,70 @@ def create_document(case_id, title, document_type, uploaded_by):
     }
 
 # Database operation helpers
-def get_case_by_number(db, case_number):
-    return db.cases.find_one({'case_number': case_number})
 
-def get_user_cases(db, user_id):
-    return list(db.cases.find({
+# Fields the dashboards render; everything else stays on the server
+CASE_SUMMARY_FIELDS = {
+    'case_number': 1, 'title': 1, 'case_type': 1, 'status': 1,
+    'filing_date': 1, 'last_updated': 1
+}
+HEARING_SUMMARY_FIELDS = {
+    'case_id': 1, 'date': 1, 'judge': 1, 'court_room': 1, 'hearing_type': 1, 'status': 1
+}
+
+def user_cases_filter(user_id):
+    return {
         '$or': [
             {'filed_by': user_id},
             {'plaintiff.id': user_id},
             {'defendant.id': user_id}
         ]
-    }).sort('filing_date', -1))
-
-def get_upcoming_hearings(db, user_id=None, days=30):
-    query = {
-        'date': {
-            '$gte': datetime.utcnow(),
-            '$lte': datetime.utcnow().replace(day=datetime.utcnow().day + days)
-        },
-        'status': 'scheduled'
     }
+
+def get_case_by_number(db, case_number):
+    return db.cases.find_one({'case_number': case_number})
+
+def get_user_cases(db, user_id, limit=None, projection=None):
+    # Whole documents unless the caller asks for less, e.g. projection=CASE_SUMMARY_FIELDS
+    cursor = db.cases.find(user_cases_filter(user_id), projection).sort('filing_date', -1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+def upcoming_hearings_pipeline(user_id, start, end, limit=50):
+    """Aggregation joining a user's cases to their scheduled hearings in [start, end]"""
+    return [
+        {'$match': user_cases_filter(user_id)},
+        {'$project': {'_id': 1, 'case_number': 1, 'title': 1}},
+        # localField plus pipeline lets the join use the (case_id, date) index
+        {'$lookup': {
+            'from': 'hearings',
+            'localField': '_id',
+            'foreignField': 'case_id',
+            'pipeline': [
+                {'$match': {'date': {'$gte': start, '$lte': end}, 'status': 'scheduled'}},
+                {'$project': HEARING_SUMMARY_FIELDS}
+            ],
+            'as': 'hearing'
+        }},
+        {'$unwind': '$hearing'},
+        {'$sort': {'hearing.date': 1}},
+        {'$limit': limit},
+        {'$replaceRoot': {'newRoot': {'$mergeObjects': [
+            '$hearing',
+            {'case_number': '$case_number', 'case_title': '$title'}
+        ]}}}
+    ]
+
+def get_upcoming_hearings(db, user_id=None, days=30, limit=50):
+    start = datetime.utcnow()
+    end = start + timedelta(days=days)
     if user_id:
-        query['case_id'] = {'$in': get_user_cases(db, user_id)}
-    
-    return list(db.hearings.find(query).sort('date', 1))
+        return list(db.cases.aggregate(upcoming_hearings_pipeline(user_id, start, end, limit)))
+
+    return list(db.hearings.find(
+        {'date': {'$gte': start, '$lte': end}, 'status': 'scheduled'},
+        HEARING_SUMMARY_FIELDS
+    ).sort('date', 1).limit(limit))
 
 def update_case_status(db, case_id, status):
     return db.cases.update_one(
@@ -0,0 +1,181 @@
+import re
+import logging
+import threading
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+
+from case_data import iter_case_rows, CASES_CSV
+
+logger = logging.getLogger(__name__)
+
+# Corporate suffixes that clerks add or drop inconsistently
+LEGAL_SUFFIXES = {
+    'ltd', 'limited', 'pvt', 'private', 'inc', 'incorporated', 'llc', 'llp',
+    'co', 'corp', 'corporation', 'company', 'plc'
+}
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_name(name):
+    """Reduce a party name to a comparison key: lowercase ASCII, '&' as 'and', no suffixes"""
+    text = unicodedata.normalize('NFKD', str(name or '')).encode('ascii', 'ignore').decode('ascii')
+    text = text.lower().replace('&', ' and ')
+    tokens = _NON_ALNUM_RE.sub(' ', text).split()
+    stripped = [t for t in tokens if t not in LEGAL_SUFFIXES]
+    # Keep names made up only of suffixes ("The Company") intact
+    return ' '.join(stripped or tokens)
+
+
+def name_ngrams(key, n=3):
+    """Character n-grams of a normalized name, padded so word edges count"""
+    padded = f"{' ' * (n - 1)}{key} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class PartyNameIndex:
+    """Character n-gram index over party names with vectorized similarity ranking"""
+
+    def __init__(self, names=(), n=3):
+        self.n = n
+        self.names = []
+        self.spellings = []
+        self._keys = {}
+        self._postings = defaultdict(list)
+        self._gram_counts = []
+        self._arrays = None
+        self._sizes = None
+        self._lock = threading.Lock()
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self._keys
+
+    def add(self, name):
+        """Add a name; the first spelling seen for a key becomes its canonical form"""
+        if name is None or not str(name).strip():
+            return None
+        name = str(name).strip()
+        key = normalize_name(name)
+        with self._lock:
+            if key in self._keys:
+                name_id = self._keys[key]
+                if name not in self.spellings[name_id]:
+                    self.spellings[name_id].append(name)
+                return name_id
+            name_id = len(self.names)
+            self.names.append(name)
+            self.spellings.append([name])
+            self._keys[key] = name_id
+            grams = name_ngrams(key, self.n)
+            for gram in grams:
+                self._postings[gram].append(name_id)
+            self._gram_counts.append(len(grams))
+            self._arrays = None
+            return name_id
+
+    def _compile(self):
+        # Freeze posting lists into arrays the first time they are queried
+        with self._lock:
+            if self._arrays is None:
+                self._arrays = {g: np.asarray(ids, dtype=np.int32) for g, ids in self._postings.items()}
+                self._sizes = np.asarray(self._gram_counts, dtype=np.float32)
+            return self._arrays, self._sizes
+
+    def scores(self, name):
+        """Dice similarity of name against every indexed name as one array"""
+        arrays, sizes = self._compile()
+        grams = name_ngrams(normalize_name(name), self.n)
+        hits = [arrays[g] for g in grams if g in arrays]
+        if not hits or not len(sizes):
+            return np.zeros(len(sizes), dtype=np.float32)
+        shared = np.bincount(np.concatenate(hits), minlength=len(sizes)).astype(np.float32)
+        return 2.0 * shared / (len(grams) + sizes)
+
+    def match(self, name, k=5, min_score=0.0):
+        """Top-k (name, score) pairs ordered by similarity"""
+        scores = self.scores(name)
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        # Same comparison as variants, so one threshold means the same thing to both
+        return [(self.names[i], float(scores[i])) for i in top if scores[i] > 0 and scores[i] >= min_score]
+
+    def variants(self, name, threshold=0.6):
+        """Every recorded spelling of the parties similar enough to name"""
+        scores = self.scores(name)
+        ids = np.nonzero((scores > 0) & (scores >= threshold))[0]
+        ids = ids[np.argsort(-scores[ids], kind='stable')]
+        return [spelling for i in ids for spelling in self.spellings[i]]
+
+    def canonicalize(self, name, threshold=0.6):
+        """Map name onto its known canonical spelling, or return it unchanged"""
+        if name is None:
+            return name
+        key = normalize_name(name)
+        name_id = self._keys.get(key)
+        if name_id is not None:
+            return self.names[name_id]
+        best = self.match(name, k=1, min_score=threshold)
+        return best[0][0] if best else name
+
+    def canonicalize_many(self, names, threshold=0.6):
+        """Canonicalize a sequence of names, resolving each distinct value once"""
+        resolved = {}
+        out = []
+        for name in names:
+            if name not in resolved:
+                resolved[name] = self.canonicalize(name, threshold)
+            out.append(resolved[name])
+        return out
+
+
+@lru_cache(maxsize=16)
+def _category_index(categories):
+    index = PartyNameIndex(categories)
+    index.categories = frozenset(categories)
+    return index
+
+
+def index_for_categories(categories):
+    """Shared index over a fixed set of categories, such as LabelEncoder.classes_"""
+    return _category_index(tuple(str(c) for c in categories))
+
+
+def canonicalize_to_categories(values, categories, threshold=0.6):
+    """Map free-text values onto the closest known category where one is close enough"""
+    index = index_for_categories(categories)
+    return [value if value in index.categories else canonical
+            for value, canonical in zip(values, index.canonicalize_many(values, threshold))]
+
+
+def build_party_index(db=None, csv_path=CASES_CSV):
+    """Index every party name from the historical dataset and filed cases"""
+    index = PartyNameIndex()
+
+    try:
+        for row in iter_case_rows(csv_path):
+            index.add(row.get('Plaintiff'))
+            index.add(row.get('Defendant'))
+    except FileNotFoundError:
+        logger.warning("Dataset %s not found, party index built from filings only", csv_path)
+
+    if db is not None:
+        try:
+            for field in ('plaintiff_name', 'defendant_name'):
+                for name in db.case_filings.distinct(field):
+                    index.add(name)
+        except Exception as e:
+            logger.error("Error loading party names from case_filings: %s", e)
+
+    logger.info("Party name index built with %d names", len(index))
+    return index
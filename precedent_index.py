@@ -0,0 +1,675 @@
+#!/usr/bin/env python3
+"""
+Similar-precedent retrieval over historical cases
+
+    python precedent_index.py build                      # cases.csv plus the cases collection
+    python precedent_index.py search "breach of supply contract" -k 5
+
+Each case's Summary of Facts, Ratio Decidendi and Final Decision are turned
+into a hashed TF-IDF vector: words and word pairs are hashed into a fixed
+number of signed buckets, weighted by sublinear term frequency and bucket
+IDF, and L2-normalized, so cosine similarity is a dot product. Vectors are
+stored as float32 rows of an .npy file opened with mmap_mode='r' (float16
+would halve the file, but NumPy's conversion back costs far more than the
+product itself). Case excerpts live in a JSON-lines file with a byte-offset
+array, so only the returned records are ever read.
+
+Small corpora are searched exactly with one vectorized product per chunk of
+rows. Above EXACT_LIMIT cases the build also clusters the vectors (spherical
+k-means, about 4 sqrt(n) clusters) and stores each cluster's rows
+contiguously; a query scores the centroids and then only the rows of the
+closest few clusters (an IVF index).
+
+Cases added after the build (read-model apply(), and on opening an index
+the collection's cases written since its build started) are kept in memory
+and searched exactly alongside the files until the next build. Builds are
+written to a fresh temporary directory next to the index and swapped in
+under an flock on {path}.lock, so concurrent builders never share files. A
+missing or outdated index is built by the server's preload step, the build
+command, or else a background thread; queries never wait for one and
+search the in-memory cases meanwhile. Only a changed cases.csv or build
+parameters make an index outdated; new cases never force a rebuild.
+"""
+
+import argparse
+import contextlib
+import datetime
+import fcntl
+import glob
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+from bson import ObjectId
+
+import tracing
+from case_data import CASES_CSV, iter_case_rows
+from legal_search import STOPWORDS, tokenize
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+DIMENSIONS = 512
+# Dataset columns and their names under 'details' in cases documents
+TEXT_FIELDS = {
+    'Summary of Facts': 'summary_of_facts',
+    'Ratio Decidendi': 'ratio_decidendi',
+    'Final Decision': 'final_decision'
+}
+# Fields of cases documents an index is built from
+CASE_PROJECTION = dict({'case_number': 1, 'title': 1, 'case_type': 1, 'outcome': 1, 'details.court_name': 1},
+                       **{f"details.{field}": 1 for field in TEXT_FIELDS.values()})
+# Characters of each text field kept in the record returned with a match
+EXCERPT_CHARS = 300
+# Corpora larger than this get an IVF index and approximate search
+EXACT_LIMIT = 200000
+DEFAULT_PROBES = 32
+# Weaker matches are mostly hash collisions between unrelated words; kept out of prompts
+PROMPT_MIN_SCORE = 0.1
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE_PER_CLUSTER = 40
+# Rows scored (or written) at a time by exact search and the build
+CHUNK_ROWS = 65536
+# Seconds before a build's start from which cases are added in memory on opening it
+CATCH_UP_SLACK = 60
+
+
+@lru_cache(maxsize=1 << 18)
+def _bucket(feature, dims):
+    """Bucket of feature, offset by dims when it is counted negatively"""
+    h = zlib.crc32(feature.encode('utf-8'))
+    return h % dims + dims * ((h // dims) & 1)
+
+
+def features(text):
+    """Words (without stopwords) and adjacent word pairs of text, with counts"""
+    words = [w for w in tokenize(text) if w not in STOPWORDS]
+    counts = Counter(words)
+    counts.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return counts
+
+
+def hashed_tf(text, dims=DIMENSIONS):
+    """Signed hashed sublinear term frequencies of text and the buckets it touches"""
+    counts = features(text)
+    codes = np.fromiter((_bucket(feature, dims) for feature in counts), dtype=np.int64, count=len(counts))
+    weights = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+    signed = np.bincount(codes, weights=weights, minlength=2 * dims)
+    return (signed[:dims] - signed[dims:]).astype(np.float32), np.unique(codes % dims)
+
+
+def case_key(case_id):
+    """64-bit hash of a case number, used to recognise cases already in the files"""
+    digest = hashlib.blake2b(' '.join(str(case_id or '').lower().split()).encode('utf-8'), digest_size=8)
+    return int.from_bytes(digest.digest(), 'little', signed=True)
+
+
+def record_key(record):
+    """Key of a case record, in the files and in memory alike; cases without a number go by their title"""
+    return case_key(record['case_id'] or record['title'])
+
+
+def case_record(record):
+    """Case number, title, type, court and text excerpts of a cases.csv row or cases document"""
+    if 'case_number' in record or 'details' in record:
+        details = record.get('details') or {}
+        texts = {field: details.get(field) for field in TEXT_FIELDS.values()}
+        return dict({
+            'case_id': record.get('case_number'),
+            'title': record.get('title'),
+            'case_type': record.get('case_type'),
+            'court': details.get('court_name'),
+            'outcome': record.get('outcome')
+        }, **texts)
+    texts = {field: record.get(column) for column, field in TEXT_FIELDS.items()}
+    return dict({
+        'case_id': record.get('Case ID'),
+        'title': f"{record.get('Plaintiff', '')} vs {record.get('Defendant', '')}",
+        'case_type': record.get('Case Type'),
+        'court': record.get('Court Name'),
+        'outcome': record.get('Case Outcome')
+    }, **texts)
+
+
+def case_text(record):
+    return ' '.join(str(record.get(field) or '') for field in TEXT_FIELDS.values())
+
+
+def _excerpt(record):
+    return {key: (value[:EXCERPT_CHARS] if isinstance(value, str) else value) for key, value in record.items()}
+
+
+def _normalized(block, idf):
+    block = block.astype(np.float32) * idf
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    return block / np.maximum(norms, 1e-12)
+
+
+def _kmeans(vectors, clusters, rng, iterations=KMEANS_ITERATIONS):
+    """Spherical k-means centroids from a sample of the (unit-length) rows of vectors"""
+    size = min(len(vectors), clusters * KMEANS_SAMPLE_PER_CLUSTER)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), size=size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(size, size=clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=clusters)
+        filled = np.flatnonzero(counts)
+        starts = (np.cumsum(counts) - counts)[filled]
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+        # Empty clusters keep their previous centroid
+        centroids[filled] = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+@contextlib.contextmanager
+def build_lock(path):
+    """Exclusive flock on {path}.lock, held by whoever is building the index at path"""
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    with open(f"{os.path.abspath(path)}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def build(path, records, dims=DIMENSIONS, ann=None, fingerprint=None, seed=0):
+    """Write an index over records (cases.csv rows or cases documents) to the directory path
+
+    ann=None builds the IVF index only for corpora above EXACT_LIMIT. The new
+    index is written to a temporary directory next to path and swapped in when
+    complete; concurrent builds of the same path wait for each other.
+    """
+    with build_lock(path):
+        return _build(os.path.abspath(path), records, dims, ann, fingerprint, seed)
+
+
+def ensure_index(path, source, fingerprint=None, dims=DIMENSIONS):
+    """Build the index at path from source() unless it is current; returns whether it was built
+
+    Callers that lose the race for the lock find the winner's index current and return.
+    """
+    if is_current(read_meta(path), fingerprint):
+        return False
+    with build_lock(path):
+        if is_current(read_meta(path), fingerprint):
+            return False
+        _build(os.path.abspath(path), source(), dims, None, fingerprint, 0)
+        return True
+
+
+def _build(path, records, dims, ann, fingerprint, seed):
+    started = time.perf_counter()
+    # Under the build lock, anything left next to path by an earlier build is from one that died
+    for leftover in glob.glob(f"{glob.escape(path)}.building-*"):
+        shutil.rmtree(leftover, ignore_errors=True)
+    work = tempfile.mkdtemp(prefix=f"{os.path.basename(path)}.building-", dir=os.path.dirname(path))
+    try:
+        count = _write(work, records, dims, ann, fingerprint, seed)
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+
+    previous = f"{path}.previous"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, previous)
+    os.replace(work, path)
+    shutil.rmtree(previous, ignore_errors=True)
+    logger.info("Precedent index built: %d cases, %d dims%s in %.1fs", count, dims,
+                ', IVF' if read_meta(path)['ann'] else '', time.perf_counter() - started)
+    return count
+
+
+def _write(work, records, dims, ann, fingerprint, seed):
+    # Cases written to the collection from here on may be missed by the source
+    started_at = int(time.time())
+
+    # Pass 1: raw term frequencies to a flat file, excerpts to records.jsonl, bucket document frequencies
+    df = np.zeros(dims, dtype=np.int64)
+    offsets = [0]
+    keys, types, type_codes = [], [], {}
+    block = []
+    count = 0
+    with open(os.path.join(work, 'tf.f32'), 'wb') as tf_file, \
+            open(os.path.join(work, 'records.jsonl'), 'wb') as record_file:
+        for source in records:
+            record = case_record(source)
+            vector, buckets = hashed_tf(case_text(record), dims)
+            df[buckets] += 1
+            block.append(vector)
+            if len(block) == CHUNK_ROWS:
+                tf_file.write(np.asarray(block, dtype=np.float32).tobytes())
+                block = []
+            line = (json.dumps(_excerpt(record), default=str) + '\n').encode('utf-8')
+            record_file.write(line)
+            offsets.append(offsets[-1] + len(line))
+            keys.append(record_key(record))
+            types.append(type_codes.setdefault(str(record.get('case_type') or ''), len(type_codes)))
+            count += 1
+        if block:
+            tf_file.write(np.asarray(block, dtype=np.float32).tobytes())
+    del block
+
+    # Pass 2: IDF weighting and normalization, chunk by chunk
+    idf = (np.log((1.0 + count) / (1.0 + df)) + 1.0).astype(np.float32)
+    raw = np.memmap(os.path.join(work, 'tf.f32'), dtype=np.float32, mode='r', shape=(count, dims)) \
+        if count else np.zeros((0, dims), dtype=np.float32)
+    unordered = np.lib.format.open_memmap(os.path.join(work, 'unordered.npy'), mode='w+',
+                                          dtype=np.float32, shape=(count, dims))
+    for start in range(0, count, CHUNK_ROWS):
+        unordered[start:start + CHUNK_ROWS] = _normalized(raw[start:start + CHUNK_ROWS], idf)
+    unordered.flush()
+    del raw
+    os.remove(os.path.join(work, 'tf.f32'))
+
+    types = np.asarray(types, dtype=np.int32)
+    if ann is None:
+        ann = count > EXACT_LIMIT
+    if ann and count:
+        # Cluster, then store rows cluster by cluster so a probe reads contiguous slices
+        clusters = min(count, max(16, int(4 * math.sqrt(count))))
+        rng = np.random.default_rng(seed)
+        centroids = _kmeans(unordered, clusters, rng)
+        assign = np.empty(count, dtype=np.int32)
+        for start in range(0, count, CHUNK_ROWS):
+            chunk = np.asarray(unordered[start:start + CHUNK_ROWS], dtype=np.float32)
+            assign[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        order = np.argsort(assign, kind='stable')
+        lists = np.zeros(clusters + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=clusters), out=lists[1:])
+        vectors = np.lib.format.open_memmap(os.path.join(work, 'vectors.npy'), mode='w+',
+                                            dtype=np.float32, shape=(count, dims))
+        for start in range(0, count, CHUNK_ROWS):
+            vectors[start:start + CHUNK_ROWS] = unordered[order[start:start + CHUNK_ROWS]]
+        vectors.flush()
+        del vectors, unordered
+        os.remove(os.path.join(work, 'unordered.npy'))
+        np.save(os.path.join(work, 'centroids.npy'), centroids)
+        np.save(os.path.join(work, 'lists.npy'), lists)
+        np.save(os.path.join(work, 'order.npy'), order.astype(np.int64))
+        types = types[order]
+    else:
+        del unordered
+        os.replace(os.path.join(work, 'unordered.npy'), os.path.join(work, 'vectors.npy'))
+
+    np.save(os.path.join(work, 'idf.npy'), idf)
+    np.save(os.path.join(work, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+    np.save(os.path.join(work, 'keys.npy'), np.sort(np.asarray(keys, dtype=np.int64)))
+    np.save(os.path.join(work, 'types.npy'), types)
+    with open(os.path.join(work, 'meta.json'), 'w') as f:
+        json.dump({'version': VERSION, 'dims': dims, 'count': count, 'ann': bool(ann and count),
+                   'case_types': list(type_codes), 'fingerprint': fingerprint,
+                   'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'started_at': started_at}, f)
+    return count
+
+
+def read_meta(path):
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(meta, fingerprint=None):
+    """Whether an index's meta is this version's and was built from the data fingerprint identifies"""
+    return meta is not None and meta.get('version') == VERSION and (
+        fingerprint is None or meta.get('fingerprint') == fingerprint)
+
+
+class _IndexFiles:
+    """One built index, memory-mapped read-only"""
+
+    def __init__(self, path, meta):
+        self.meta = meta
+        self.dims = meta['dims']
+        self.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+        self.idf = np.load(os.path.join(path, 'idf.npy'))
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        self.keys = np.load(os.path.join(path, 'keys.npy'), mmap_mode='r')
+        self.types = np.load(os.path.join(path, 'types.npy'), mmap_mode='r')
+        self.type_codes = {normalize_type(name): code for code, name in enumerate(meta['case_types'])}
+        if meta['ann']:
+            self.centroids = np.load(os.path.join(path, 'centroids.npy'))
+            self.lists = np.load(os.path.join(path, 'lists.npy'))
+            self.order = np.load(os.path.join(path, 'order.npy'), mmap_mode='r')
+        else:
+            self.centroids = self.lists = self.order = None
+        self._records = open(os.path.join(path, 'records.jsonl'), 'rb')
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def __contains__(self, key):
+        position = np.searchsorted(self.keys, key)
+        return position < len(self.keys) and self.keys[position] == key
+
+    def record(self, position):
+        number = int(self.order[position]) if self.order is not None else position
+        start, end = int(self.offsets[number]), int(self.offsets[number + 1])
+        with self._lock:
+            self._records.seek(start)
+            return json.loads(self._records.read(end - start))
+
+    def candidates(self, query, probes):
+        """(positions, scores) of the rows worth scoring: every row, or the closest clusters' rows"""
+        if self.centroids is None:
+            blocks = [(start, np.asarray(self.vectors[start:start + CHUNK_ROWS], dtype=np.float32) @ query)
+                      for start in range(0, len(self.vectors), CHUNK_ROWS)]
+        else:
+            closest = np.argpartition(-(self.centroids @ query), min(probes, len(self.centroids)) - 1)[:probes]
+            blocks = [(self.lists[c], np.asarray(self.vectors[self.lists[c]:self.lists[c + 1]],
+                                                 dtype=np.float32) @ query) for c in closest]
+        if not blocks:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        positions = np.concatenate([np.arange(start, start + len(scores)) for start, scores in blocks])
+        return positions, np.concatenate([scores for _, scores in blocks])
+
+    def close(self):
+        self._records.close()
+
+
+def normalize_type(case_type):
+    return ' '.join(str(case_type or '').lower().split())
+
+
+def _top(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class PrecedentIndex:
+    """Similar-case search over a built index directory plus cases added since the build"""
+
+    def __init__(self, path, source=None, fingerprint=None, dims=DIMENSIONS, probes=DEFAULT_PROBES, recent=None):
+        self.path = path
+        # source() yields cases.csv rows or cases documents; used when the directory holds no usable index
+        self.source = source
+        # recent(since) yields cases documents written since a build started, added on opening its files
+        self.recent = recent
+        self.fingerprint = fingerprint
+        self.dims = dims
+        self.probes = probes
+        self._files = None
+        self._loaded = False
+        self._building = False
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._tail_keys = set()
+        self._tail_vectors = []
+        self._tail_records = []
+        self._tail_types = []
+
+    def _index(self):
+        if self._loaded:
+            return self._files
+        with self._load_lock:
+            if not self._loaded:
+                meta = read_meta(self.path)
+                if not is_current(meta, self.fingerprint) and self.source is not None:
+                    # An outdated index of this version keeps serving until the new one is in place
+                    self._building = True
+                    tracing.start_thread(self._background_build, name='precedent-index-build')
+                if meta is not None and meta.get('version') == VERSION:
+                    self._open(meta)
+                    if not self._building and self.recent is not None:
+                        tracing.start_thread(self._catch_up, name='precedent-index-catch-up', args=(meta,))
+                elif not self._building:
+                    logger.warning("No precedent index at %s; only cases added since startup are searched",
+                                   self.path)
+                self._loaded = True
+        return self._files
+
+    def _open(self, meta):
+        files = _IndexFiles(self.path, meta)
+        with self._lock:
+            self._files = files
+            self.dims = files.dims
+            # Cases the new files cover leave the tail; the rest are re-weighted with the new IDF
+            kept = [record for record in self._tail_records if record_key(record) not in files]
+            self._tail_keys = {record_key(record) for record in kept}
+            self._tail_records = kept
+            self._tail_vectors = [self._embed(case_text(record), files) for record in kept]
+            self._tail_types = [normalize_type(record.get('case_type')) for record in kept]
+
+    def _background_build(self):
+        try:
+            ensure_index(self.path, self.source, self.fingerprint, self.dims)
+            meta = read_meta(self.path)
+            if meta is not None:
+                # The replaced files are closed once no search holds them any more
+                self._open(meta)
+                self._catch_up(meta)
+        except Exception as e:
+            logger.error("Precedent index build failed: %s", e)
+        finally:
+            self._building = False
+
+    def _catch_up(self, meta):
+        if self.recent is None or meta.get('started_at') is None:
+            return
+        try:
+            added = sum(self.add(record) for record in self.recent(meta['started_at']))
+        except Exception as e:
+            logger.error("Error adding cases written since the precedent index build: %s", e)
+            return
+        if added:
+            logger.info("Precedent index: %d cases written since the build added in memory", added)
+
+    def __len__(self):
+        files = self._index()
+        return (len(files) if files is not None else 0) + len(self._tail_records)
+
+    def embed(self, text):
+        """Unit-length hashed TF-IDF vector of text"""
+        return self._embed(text, self._index())
+
+    def _embed(self, text, files):
+        vector, _ = hashed_tf(text, files.dims if files is not None else self.dims)
+        if files is not None:
+            vector *= files.idf
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).astype(np.float32)
+
+    # Read-model view interface
+
+    def add(self, record):
+        """Make a case searchable without rebuilding; cases already indexed are skipped"""
+        record = _excerpt(case_record(record))
+        key = record_key(record)
+        self._index()
+        with self._lock:
+            files = self._files
+            if key in self._tail_keys or (files is not None and key in files):
+                return False
+            self._tail_keys.add(key)
+            self._tail_vectors.append(self._embed(case_text(record), files))
+            self._tail_records.append(record)
+            self._tail_types.append(normalize_type(record.get('case_type')))
+        return True
+
+    def apply(self, doc):
+        self.add(doc)
+
+    def remove(self, doc_id):
+        # Deleted cases leave the index on the next build
+        pass
+
+    def clear(self):
+        # The built files are not derived from the live view; nothing to reload
+        pass
+
+    # Queries
+
+    def search(self, text, k=5, case_type=None, probes=None):
+        """Top-k cases by cosine similarity to text, optionally of one case type"""
+        self._index()
+        with self._lock:
+            # The files and the tail change together when a background build is swapped in
+            files = self._files
+            tail_vectors = list(self._tail_vectors)
+            tail_records = list(self._tail_records)
+            tail_types = list(self._tail_types)
+        query = self._embed(text, files)
+        if not query.any():
+            return []
+        results = []
+        if files is not None and len(files):
+            positions, scores = files.candidates(query, probes or self.probes)
+            if case_type is not None:
+                code = files.type_codes.get(normalize_type(case_type))
+                keep = files.types[positions] == code if code is not None else np.zeros(len(positions), bool)
+                positions, scores = positions[keep], scores[keep]
+            for i in _top(scores, k):
+                results.append((float(scores[i]), files.record(int(positions[i]))))
+        if tail_vectors:
+            scores = np.asarray(tail_vectors, dtype=np.float32) @ query
+            if case_type is not None:
+                scores[np.asarray(tail_types) != normalize_type(case_type)] = -np.inf
+            for i in _top(scores, k):
+                if np.isfinite(scores[i]):
+                    results.append((float(scores[i]), tail_records[i]))
+        results.sort(key=lambda item: -item[0])
+        return [dict(record, score=round(score, 4)) for score, record in results[:k] if score > 0]
+
+    def prompt_context(self, text, case_type=None, limit=3):
+        """Lines for an LLM prompt describing the decided cases most similar to text"""
+        matches = self.search(text, limit, case_type) or (self.search(text, limit) if case_type else [])
+        lines = []
+        for match in (m for m in matches if m['score'] >= PROMPT_MIN_SCORE):
+            lines.append(f"- {match.get('title')} ({match.get('case_type')}, {match.get('court')}; "
+                         f"similarity {match['score']:.2f})\n"
+                         f"  Facts: {match.get('summary_of_facts') or 'n/a'}\n"
+                         f"  Ratio decidendi: {match.get('ratio_decidendi') or 'n/a'}\n"
+                         f"  Decision: {match.get('final_decision') or 'n/a'}")
+        return '\n'.join(lines)
+
+    def stats(self):
+        files = self._files
+        return {
+            'indexed': 0 if files is None else len(files),
+            'added_since_build': len(self._tail_records),
+            'dims': self.dims,
+            'ivf': files is not None and files.centroids is not None,
+            'built_at': None if files is None else files.meta.get('built_at'),
+            'building': self._building
+        }
+
+
+def dataset_fingerprint(csv_path, dims=DIMENSIONS):
+    """Identifies what an index was built from, so a changed cases.csv or build parameters trigger a rebuild
+
+    Cases added to the collection since are not part of it: they are added in memory, never rebuilt for.
+    """
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return None
+    return f"{os.path.abspath(csv_path)}:{stat.st_size}:{int(stat.st_mtime)}:dims={dims}"
+
+
+def case_source(db=None, csv_path=CASES_CSV):
+    """Historical dataset rows followed by cases collection documents"""
+    def source():
+        try:
+            yield from iter_case_rows(csv_path)
+        except FileNotFoundError:
+            logger.warning("Dataset %s not found, precedent index built from the cases collection only", csv_path)
+        if db is not None:
+            try:
+                # The dataset's own rows are already indexed from the CSV
+                yield from db.cases.find({'source': {'$ne': 'cases.csv'}}, CASE_PROJECTION)
+            except Exception as e:
+                logger.error("Error loading cases for the precedent index: %s", e)
+    return source
+
+
+def recent_cases(db):
+    """Cases collection documents written since a build started (epoch seconds), by their _id time"""
+    def recent(since):
+        # Slack for clocks that disagree with the one that stamped the build
+        start = datetime.datetime.fromtimestamp(since - CATCH_UP_SLACK, datetime.timezone.utc)
+        return db.cases.find({'_id': {'$gte': ObjectId.from_datetime(start)}, 'source': {'$ne': 'cases.csv'}},
+                             CASE_PROJECTION)
+    return recent
+
+
+def build_precedent_index(db=None, csv_path=CASES_CSV, path='precedent_index'):
+    """Index at path, rebuilt in the background from the dataset and cases collection if missing or outdated"""
+    return PrecedentIndex(path, case_source(db, csv_path), fingerprint=dataset_fingerprint(csv_path),
+                          recent=recent_cases(db) if db is not None else None)
+
+
+def prepare_index(db=None, csv_path=CASES_CSV, path='precedent_index'):
+    """Build the index at path now if it is missing or outdated, for a server's preload step"""
+    return ensure_index(path, case_source(db, csv_path), dataset_fingerprint(csv_path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the similar-precedent index")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help="Index cases.csv and the cases collection")
+    build_parser.add_argument('--csv', default=CASES_CSV, help="Historical dataset")
+    build_parser.add_argument('--output', default='precedent_index', help="Index directory")
+    build_parser.add_argument('--dims', type=int, default=DIMENSIONS, help="Hashed vector dimensions")
+    build_parser.add_argument('--ivf', choices=('auto', 'yes', 'no'), default='auto',
+                              help=f"Build the approximate index (auto: above {EXACT_LIMIT:,} cases)")
+    build_parser.add_argument('--no-db', action='store_true', help="Index the CSV only")
+    search_parser = commands.add_parser('search', help="Query a built index")
+    search_parser.add_argument('text')
+    search_parser.add_argument('--index', default='precedent_index', help="Index directory")
+    search_parser.add_argument('-k', type=int, default=5)
+    search_parser.add_argument('--case-type')
+    search_parser.add_argument('--probes', type=int, default=DEFAULT_PROBES, help="IVF clusters scanned")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'search':
+        index = PrecedentIndex(args.index)
+        if not len(index):
+            print(f"❌ No index at {args.index}; run 'python precedent_index.py build' first")
+            return 1
+        started = time.perf_counter()
+        matches = index.search(args.text, args.k, args.case_type, args.probes)
+        elapsed = (time.perf_counter() - started) * 1000
+        for match in matches:
+            print(f"{match['score']:.3f}  {match['case_id']}  {match['title']} ({match['case_type']})")
+        print(f"{len(matches)} matches in {elapsed:.2f} ms")
+        return 0
+
+    db = None
+    if not args.no_db:
+        from dotenv import load_dotenv
+        from pymongo import MongoClient
+        load_dotenv()
+        mongodb_url = os.getenv('MONGODB_URL')
+        if mongodb_url:
+            db = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000).court_db
+        else:
+            print("⚠️  MONGODB_URL not set, indexing the CSV only")
+    ivf = {'auto': None, 'yes': True, 'no': False}[args.ivf]
+    count = build(args.output, case_source(db, args.csv)(), dims=args.dims, ann=ivf,
+                  fingerprint=dataset_fingerprint(args.csv, args.dims))
+    print(f"✅ Indexed {count} cases in {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,27 +1,74 @@
 import pandas as pd
 import joblib
 import os
+import threading
 
+from metrics import MODEL_INFERENCE_SECONDS, MODEL_LOAD_SECONDS
+import tracing
+from party_names import canonicalize_to_categories
+
+def load_artifact(path):
+    """joblib.load with the load time recorded per artifact"""
+    artifact = os.path.basename(path)
+    with tracing.span('model.load', artifact=artifact), MODEL_LOAD_SECONDS.time(artifact=artifact):
+        return joblib.load(path)
+
+MODEL_PATH = 'models/case_outcome_model.pkl'
+ENCODER_PATHS = {
+    'Case Type': 'models/label_encoder_case_type.pkl',
+    'Court Name': 'models/label_encoder_court.pkl',
+    'Plaintiff': 'models/label_encoder_plaintiff.pkl',
+    'Defendant': 'models/label_encoder_defendant.pkl'
+}
+
+class ModelRegistry:
+    """Unpickled model artifacts kept in memory, reloaded when the file on disk changes"""
+
+    def __init__(self):
+        self._artifacts = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        mtime = os.stat(path).st_mtime
+        entry = self._artifacts.get(path)
+        if entry is None or entry[0] != mtime:
+            with self._lock:
+                entry = self._artifacts.get(path)
+                if entry is None or entry[0] != mtime:
+                    entry = self._artifacts[path] = (mtime, load_artifact(path))
+        return entry[1]
+
+    def warm(self, paths=None):
+        """Load every artifact up front; returns {path: error or None}"""
+        results = {}
+        for path in paths or [MODEL_PATH, *ENCODER_PATHS.values()]:
+            try:
+                self.get(path)
+                results[path] = None
+            except Exception as e:
+                results[path] = str(e)
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._artifacts.clear()
+
+registry = ModelRegistry()
+
+@tracing.traced('model.preprocess')
 def preprocess_input(input_data):
     """Preprocess input data for prediction"""
     try:
         # Check if required model files exist
-        required_files = [
-            'models/label_encoder_case_type.pkl',
-            'models/label_encoder_court.pkl',
-            'models/label_encoder_plaintiff.pkl',
-            'models/label_encoder_defendant.pkl'
-        ]
-        
-        missing_files = [f for f in required_files if not os.path.exists(f)]
+        missing_files = [f for f in ENCODER_PATHS.values() if not os.path.exists(f)]
         if missing_files:
             raise FileNotFoundError(f"Missing required model files: {missing_files}")
         
-        # Load encoders
-        le_case_type = joblib.load('models/label_encoder_case_type.pkl')
-        le_court = joblib.load('models/label_encoder_court.pkl')
-        le_plaintiff = joblib.load('models/label_encoder_plaintiff.pkl')
-        le_defendant = joblib.load('models/label_encoder_defendant.pkl')
+        # Load encoders (unpickled once per process, see ModelRegistry)
+        le_case_type = registry.get(ENCODER_PATHS['Case Type'])
+        le_court = registry.get(ENCODER_PATHS['Court Name'])
+        le_plaintiff = registry.get(ENCODER_PATHS['Plaintiff'])
+        le_defendant = registry.get(ENCODER_PATHS['Defendant'])
         
         # Create a copy to avoid modifying original data
         processed_data = input_data.copy()
@@ -38,6 +85,12 @@ def preprocess_input(input_data):
         except ValueError:
             processed_data['Court Name'] = 0
             
+        # Map near-miss party names onto the spellings the encoders were fitted on
+        processed_data['Plaintiff'] = canonicalize_to_categories(
+            processed_data['Plaintiff'].astype(str), le_plaintiff.classes_)
+        processed_data['Defendant'] = canonicalize_to_categories(
+            processed_data['Defendant'].astype(str), le_defendant.classes_)
+
         try:
             processed_data['Plaintiff'] = le_plaintiff.transform(processed_data['Plaintiff'].astype(str))
         except ValueError:
@@ -63,18 +116,19 @@ def predict_outcome(input_data):
     """Predict case outcome using trained model"""
     try:
         # Check if model exists
-        model_path = 'models/case_outcome_model.pkl'
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found: {model_path}")
+        if not os.path.exists(MODEL_PATH):
+            raise FileNotFoundError(f"Model file not found: {MODEL_PATH}")
         
         # Load model
-        model = joblib.load(model_path)
+        model = registry.get(MODEL_PATH)
         
         # Preprocess the input data
         preprocessed_input = preprocess_input(input_data)
         
         # Make prediction
-        prediction = model.predict(preprocessed_input)
+        with tracing.span('model.predict', rows=len(preprocessed_input)), \
+                MODEL_INFERENCE_SECONDS.time(model='case_outcome'):
+            prediction = model.predict(preprocessed_input)
         return prediction
         
     except Exception as e:
@@ -85,19 +139,20 @@ def predict_outcome_with_confidence(input_data):
     """Predict case outcome with confidence scores"""
     try:
         # Check if model exists
-        model_path = 'models/case_outcome_model.pkl'
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found: {model_path}")
+        if not os.path.exists(MODEL_PATH):
+            raise FileNotFoundError(f"Model file not found: {MODEL_PATH}")
         
         # Load model
-        model = joblib.load(model_path)
+        model = registry.get(MODEL_PATH)
         
         # Preprocess the input data
         preprocessed_input = preprocess_input(input_data)
         
         # Make prediction with probabilities
-        prediction = model.predict(preprocessed_input)
-        probabilities = model.predict_proba(preprocessed_input)
+        with tracing.span('model.predict_proba', rows=len(preprocessed_input)), \
+                MODEL_INFERENCE_SECONDS.time(model='case_outcome'):
+            prediction = model.predict(preprocessed_input)
+            probabilities = model.predict_proba(preprocessed_input)
         
         # Get confidence for predicted class
         confidence = max(probabilities[0])
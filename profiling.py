@@ -0,0 +1,242 @@
+"""
+On-demand profiling of a live worker
+
+SamplingProfiler snapshots the Python stack of every thread at a fixed
+interval from the calling thread, so nothing is installed in the profiled
+code and the overhead is one sys._current_frames() call per tick. Results
+come out as collapsed stacks (flamegraph.pl / speedscope input) and a
+top-functions table.
+
+init_app adds a per-request cProfile mode: an admin request sent with an
+X-Profile header runs under cProfile and its response carries an
+X-Profile-Id header naming the stored result, which the /admin/profile
+routes in app.py serve as a pstats table or raw .prof file.
+"""
+
+import collections
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = 60
+PROFILE_HEADER = 'X-Profile'
+KEEP_REQUEST_PROFILES = 20
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls', 'filename')
+
+# A thread whose innermost Python frame is in one of these modules, or is one of
+# these functions blocked in a C-level queue get, is waiting rather than working
+IDLE_MODULES = ('threading.py', 'selectors.py', 'socketserver.py', 'queue.py', 'socket.py', 'ssl.py')
+IDLE_FUNCTIONS = {'handlers.py:QueueListener.dequeue', 'tracing.py:JsonLinesExporter._drain'}
+
+
+def _label(code):
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+class SamplingProfiler:
+    """Counts identical stacks across all threads except the sampling one"""
+
+    _running = threading.Lock()
+
+    def __init__(self, interval=DEFAULT_INTERVAL, include_idle=False, thread_filter=None):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.thread_filter = thread_filter
+        # Keyed by (thread name, code objects innermost first); labels are built once at the end
+        self._raw = collections.Counter()
+        self._names = {}
+        self._idle = {}
+        self.samples = 0
+        self.ticks = 0
+        self.duration = 0.0
+
+    def _thread_name(self, ident):
+        name = self._names.get(ident)
+        if name is None:
+            self._names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._names.get(ident, str(ident))
+        return name
+
+    def _is_idle(self, code):
+        idle = self._idle.get(code)
+        if idle is None:
+            idle = self._idle[code] = (os.path.basename(code.co_filename) in IDLE_MODULES
+                                       or _label(code) in IDLE_FUNCTIONS)
+        return idle
+
+    def sample(self):
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            name = self._thread_name(ident)
+            if self.thread_filter and self.thread_filter not in name:
+                continue
+            if not self.include_idle and self._is_idle(frame.f_code):
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            self._raw[(name, tuple(codes))] += 1
+            self.samples += 1
+        self.ticks += 1
+
+    @property
+    def stacks(self):
+        """Counter of (thread name, outermost label, ..., innermost label) stacks"""
+        labels = {}
+        stacks = collections.Counter()
+        for (name, codes), count in self._raw.items():
+            for code in codes:
+                if code not in labels:
+                    labels[code] = _label(code)
+            stacks[(name,) + tuple(labels[code] for code in reversed(codes))] += count
+        return stacks
+
+    def run(self, seconds):
+        """Sample for the given number of seconds; only one profile runs per process at a time"""
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running in this worker")
+        try:
+            started = time.perf_counter()
+            deadline = started + seconds
+            next_tick = started
+            while True:
+                self.sample()
+                next_tick += self.interval
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if next_tick > now:
+                    time.sleep(next_tick - now)
+                else:
+                    # Fell behind (sampling a very deep process); don't try to catch up
+                    next_tick = now
+            self.duration = time.perf_counter() - started
+        finally:
+            self._running.release()
+        return self
+
+    def collapsed(self, stacks=None):
+        """One 'thread;outer;...;inner count' line per distinct stack"""
+        stacks = stacks or self.stacks
+        return '\n'.join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common())
+
+    def top_functions(self, limit=25, stacks=None):
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in (stacks or self.stacks).items():
+            own[stack[-1]] += count
+            # Recursive functions count once per sample
+            for function in set(stack[1:]):
+                total[function] += count
+        samples = self.samples or 1
+        return [{
+            'function': function,
+            'self_samples': own[function],
+            'total_samples': total[function],
+            'self_percent': round(100.0 * own[function] / samples, 2),
+            'total_percent': round(100.0 * total[function] / samples, 2)
+        } for function, _ in sorted(total.items(), key=lambda item: (own[item[0]], item[1]), reverse=True)[:limit]]
+
+    def summary(self, limit=25):
+        return {
+            'duration': round(self.duration, 3),
+            'interval': self.interval,
+            'ticks': self.ticks,
+            'samples': self.samples,
+            'top': self.top_functions(limit)
+        }
+
+
+def format_stats(profile, sort='cumulative', limit=40):
+    """pstats table of a cProfile.Profile as text"""
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+class RequestProfiles:
+    """Most recent per-request cProfile results of this worker"""
+
+    def __init__(self, keep=KEEP_REQUEST_PROFILES):
+        self._profiles = collections.OrderedDict()
+        self._keep = keep
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # cProfile hooks are per thread, but profiling two requests at once makes both timings worse
+        self.active = threading.Lock()
+
+    def add(self, path, elapsed, profile):
+        profile_id = f"{os.getpid()}-{next(self._ids)}"
+        with self._lock:
+            self._profiles[profile_id] = {'path': path, 'elapsed': elapsed, 'profile': profile,
+                                          'created_at': time.time()}
+            while len(self._profiles) > self._keep:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self):
+        with self._lock:
+            return [{'id': profile_id, 'path': entry['path'], 'elapsed_ms': round(entry['elapsed'] * 1000, 3),
+                     'created_at': entry['created_at']} for profile_id, entry in self._profiles.items()]
+
+
+def dump_stats(profile):
+    """Raw pstats data of a cProfile.Profile, as written by Profile.dump_stats"""
+    stats = pstats.Stats(profile)
+    return marshal.dumps(stats.stats)
+
+
+def init_app(app, is_admin):
+    """Per-request cProfile mode for requests carrying the X-Profile header.
+
+    is_admin is called inside the request; other users' headers are ignored.
+    Returns the RequestProfiles store the admin routes read from.
+    """
+    from flask import g, request
+
+    profiles = RequestProfiles()
+
+    @app.before_request
+    def start_request_profile():
+        if request.headers.get(PROFILE_HEADER) and is_admin() and profiles.active.acquire(blocking=False):
+            g.request_profile = cProfile.Profile()
+            g.request_profile_started = time.perf_counter()
+            g.request_profile.enable()
+
+    @app.after_request
+    def finish_request_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.disable()
+            profiles.active.release()
+            elapsed = time.perf_counter() - g.pop('request_profile_started')
+            response.headers['X-Profile-Id'] = profiles.add(request.path, elapsed, profile)
+        return response
+
+    @app.teardown_request
+    def release_request_profile(exc):
+        # after_request is skipped when the view raised
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.disable()
+            profiles.active.release()
+
+    return profiles
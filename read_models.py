@@ -0,0 +1,315 @@
+import bisect
+import datetime
+import logging
+import threading
+import time
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_RESYNC_INTERVAL = 60
+
+
+def _sort_value(doc, field):
+    # Documents missing the sort field sort as oldest
+    value = doc.get(field)
+    return value if value is not None else datetime.datetime.min
+
+
+class RecentDocuments:
+    """Newest `limit` documents per owner, kept in memory.
+
+    Owners are loaded lazily on first read. Inserts and updates are applied in
+    place; a delete, or an update that pushes a document out of a full list,
+    drops the owner so the next read reloads it.
+    """
+
+    def __init__(self, collection, key='user_id', sort_field='created_at', limit=5, projection=None):
+        self.collection = collection
+        self.key = key
+        self.sort_field = sort_field
+        self.limit = limit
+        self.projection = projection
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = 0
+
+    def get(self, owner):
+        with self._lock:
+            entries = self._entries.get(owner)
+            version = self._version
+        if entries is None:
+            entries = list(self.collection.find({self.key: owner}, self.projection)
+                           .sort(self.sort_field, -1).limit(self.limit))
+            with self._lock:
+                # Only cache the result if no change arrived while it was loading
+                if self._version == version:
+                    self._entries[owner] = entries
+        return list(entries)
+
+    def _project(self, doc):
+        if not self.projection:
+            return dict(doc)
+        return {name: doc[name] for name in ('_id', *self.projection) if name in doc}
+
+    def apply(self, doc):
+        owner = doc.get(self.key)
+        with self._lock:
+            self._version += 1
+            entries = self._entries.get(owner)
+            if entries is None:
+                return
+            present = any(e['_id'] == doc['_id'] for e in entries)
+            full = len(entries) >= self.limit
+            entries = [e for e in entries if e['_id'] != doc['_id']] + [self._project(doc)]
+            entries.sort(key=lambda e: _sort_value(e, self.sort_field), reverse=True)
+            if present and full and entries[-1]['_id'] == doc['_id']:
+                # It moved to the end of a full list; an unseen document may now rank above it
+                del self._entries[owner]
+                return
+            self._entries[owner] = entries[:self.limit]
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._version += 1
+            for owner, entries in list(self._entries.items()):
+                if any(e['_id'] == doc_id for e in entries):
+                    del self._entries[owner]
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+class UpcomingHearings:
+    """The next `capacity` hearings from today onwards, ordered by date.
+
+    Reloaded when the day changes or when a removal leaves a full window with
+    a gap that only the database can fill.
+    """
+
+    def __init__(self, collection, date_field='hearing_date', capacity=500):
+        self.collection = collection
+        self.date_field = date_field
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._day = None
+        self._hearings = None
+        self._complete = True
+        self._version = 0
+
+    @staticmethod
+    def _today():
+        return datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _load(self, today):
+        with self._lock:
+            version = self._version
+        hearings = list(self.collection.find({self.date_field: {'$gte': today}})
+                        .sort(self.date_field, 1).limit(self.capacity))
+        with self._lock:
+            if self._version != version:
+                return hearings
+            self._day = today
+            self._hearings = hearings
+            # A short result means every upcoming hearing is held here
+            self._complete = len(hearings) < self.capacity
+        return hearings
+
+    def _current(self):
+        today = self._today()
+        with self._lock:
+            if self._hearings is not None and self._day == today:
+                return list(self._hearings)
+        return list(self._load(today))
+
+    def upcoming(self, limit=10):
+        return self._current()[:limit]
+
+    def on_day(self, day=None):
+        day = day or self._today()
+        end = day + datetime.timedelta(days=1)
+        return [h for h in self._current() if day <= h.get(self.date_field) < end]
+
+    def apply(self, doc):
+        with self._lock:
+            self._version += 1
+            if self._hearings is None:
+                return
+            hearings = [h for h in self._hearings if h['_id'] != doc['_id']]
+            removed = len(hearings) < len(self._hearings)
+            date = doc.get(self.date_field)
+            if date is not None and date >= self._day:
+                dates = [h[self.date_field] for h in hearings]
+                position = bisect.bisect_right(dates, date)
+                if position < self.capacity and (position < len(hearings) or self._complete):
+                    hearings.insert(position, doc)
+            if len(hearings) > self.capacity:
+                hearings = hearings[:self.capacity]
+                self._complete = False
+            if removed and not self._complete and len(hearings) < self.capacity:
+                self._hearings = None
+                return
+            self._hearings = hearings
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._version += 1
+            if self._hearings is None:
+                return
+            hearings = [h for h in self._hearings if h['_id'] != doc_id]
+            if len(hearings) != len(self._hearings):
+                self._hearings = hearings if self._complete else None
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._hearings = None
+
+
+class ReadModels:
+    """Keeps in-memory views of recently written collections up to date.
+
+    On a replica set one database change stream feeds every view. Standalone
+    servers (and test servers without change streams) fall back to polling
+    for documents with a newer _id every poll_interval seconds and dropping
+    all views every resync_interval seconds, which also picks up updates and
+    deletes. Views therefore lag the database by at most resync_interval.
+    On these routine resyncs a view's resync() is called instead of clear()
+    where it has one, for views too expensive to reload every minute.
+    """
+
+    def __init__(self, db, poll_interval=DEFAULT_POLL_INTERVAL, resync_interval=DEFAULT_RESYNC_INTERVAL):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.resync_interval = resync_interval
+        self.views = {}
+        self.mode = None
+        self.last_sync = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, collection_name, view):
+        self.views.setdefault(collection_name, []).append(view)
+        return view
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='read-models', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self, collection_name, doc):
+        """Apply a write made by this process without waiting for the sync thread"""
+        for view in self.views.get(collection_name, ()):
+            view.apply(doc)
+
+    def invalidate(self, collection_name=None, resync=False):
+        for name, views in self.views.items():
+            if collection_name in (None, name):
+                for view in views:
+                    if resync and hasattr(view, 'resync'):
+                        view.resync()
+                    else:
+                        view.clear()
+
+    def staleness(self):
+        """Seconds since the views were last known to match the database"""
+        return None if self.last_sync is None else time.monotonic() - self.last_sync
+
+    def _dispatch(self, change):
+        views = self.views.get(change['ns']['coll'], ())
+        operation = change['operationType']
+        if operation in ('insert', 'update', 'replace'):
+            doc = change.get('fullDocument')
+            for view in views:
+                if doc is not None:
+                    view.apply(doc)
+                else:
+                    view.remove(change['documentKey']['_id'])
+        elif operation == 'delete':
+            for view in views:
+                view.remove(change['documentKey']['_id'])
+        elif operation in ('drop', 'rename', 'invalidate'):
+            for view in views:
+                view.clear()
+
+    def _run(self):
+        try:
+            self._watch()
+        except OperationFailure as e:
+            logger.info("Change streams unavailable (%s), polling every %ss", e.code, self.poll_interval)
+        except Exception as e:
+            logger.error("Read model change stream failed, falling back to polling: %s", e)
+        if not self._stop.is_set():
+            self._poll()
+
+    def _watch(self):
+        pipeline = [{'$match': {'ns.coll': {'$in': list(self.views)}}}]
+        resume_token = None
+        while not self._stop.is_set():
+            try:
+                with self.db.watch(pipeline, full_document='updateLookup', resume_after=resume_token,
+                                   max_await_time_ms=1000) as stream:
+                    if self.mode != 'change_stream':
+                        # Anything written before the stream opened is picked up by a reload
+                        self.invalidate()
+                        self.mode = 'change_stream'
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        self.last_sync = time.monotonic()
+                        if change is not None:
+                            self._dispatch(change)
+                        resume_token = stream.resume_token
+            except OperationFailure:
+                if self.mode != 'change_stream':
+                    raise
+                # Resume token fell off the oplog: start over from fresh views
+                logger.warning("Read model change stream could not resume, reloading views")
+                resume_token = None
+                self.mode = None
+            except PyMongoError as e:
+                logger.error("Read model change stream error: %s", e)
+                self._stop.wait(self.poll_interval)
+
+    def _latest_id(self, name):
+        latest = self.db[name].find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        return latest['_id'] if latest else None
+
+    def _poll(self):
+        self.mode = 'polling'
+        high_water = None
+        last_resync = None
+        while True:
+            started = time.monotonic()
+            try:
+                if high_water is None:
+                    # Retried every tick until the database answers
+                    latest = {name: self._latest_id(name) for name in self.views}
+                    self.invalidate()
+                    high_water = latest
+                    last_resync = started
+                elif started - last_resync >= self.resync_interval:
+                    high_water = {name: self._latest_id(name) for name in self.views}
+                    self.invalidate(resync=True)
+                    last_resync = started
+                else:
+                    for name in self.views:
+                        query = {'_id': {'$gt': high_water[name]}} if high_water[name] is not None else {}
+                        for doc in self.db[name].find(query).sort('_id', 1):
+                            self.notify(name, doc)
+                            high_water[name] = doc['_id']
+                self.last_sync = started
+            except Exception as e:
+                logger.error("Read model poll failed: %s", e)
+            if self._stop.wait(self.poll_interval):
+                break
@@ -0,0 +1,318 @@
+"""
+Pre-forking multi-worker HTTP server for production
+
+The master binds the listening socket and runs a preload hook (main.py
+warms the model registry and builds a missing precedent index there) once,
+then forks workers that share both copy-on-write. Each worker builds its own app, and with it its own MongoDB
+client, which must not cross a fork. It serves the shared socket from a
+bounded thread pool and only accepts a connection when a thread is free, so
+a busy worker leaves new connections to its siblings.
+
+Signals to the master:
+    SIGHUP           rerun the preload hook, fork a new generation of
+                     workers, then drain the old one once all of them are
+                     ready (or stop the new ones and keep the old if not)
+    SIGTERM, SIGINT  stop accepting, let in-flight requests finish for up
+                     to graceful_timeout seconds, then exit
+"""
+
+import logging
+import os
+import secrets
+import select
+import signal
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+import logging_pipeline
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THREADS = 4
+GRACEFUL_TIMEOUT = 30
+KEEPALIVE_TIMEOUT = 5
+# A worker that dies sooner than this after starting is respawned with a delay
+MIN_WORKER_LIFETIME = 1.0
+
+
+def default_workers():
+    """WEB_CONCURRENCY, else two per CPU plus one: requests spend most of their time waiting on Mongo or Gemini"""
+    return int(os.getenv('WEB_CONCURRENCY') or 2 * (os.cpu_count() or 1) + 1)
+
+
+def default_threads():
+    return int(os.getenv('WEB_THREADS') or DEFAULT_THREADS)
+
+
+class _RequestHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # An idle keep-alive connection gives its pool thread back after this many seconds
+    timeout = KEEPALIVE_TIMEOUT
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server on an inherited socket, handling connections on a fixed thread pool"""
+
+    multithread = True
+
+    def __init__(self, app, sock, threads=DEFAULT_THREADS):
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, app, handler=_RequestHandler, fd=sock.fileno())
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='http')
+        self._slots = threading.BoundedSemaphore(threads)
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def get_request(self):
+        # Wait for a free thread before taking the connection off the shared socket
+        self._slots.acquire()
+        try:
+            return super().get_request()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self._active += 1
+        try:
+            self.pool.submit(self._handle, request, client_address)
+        except RuntimeError:
+            self._done()
+            self.shutdown_request(request)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._done()
+
+    def _done(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def drain(self, timeout):
+        """Wait for in-flight connections to finish; True if they all did"""
+        deadline = time.monotonic() + timeout
+        while self._active and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.pool.shutdown(wait=False)
+        return not self._active
+
+
+def _run_worker(app_factory, sock, threads, graceful_timeout, ready_fd):
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    # The log writer thread does not survive fork
+    logging_pipeline.configure_logging()
+    app = app_factory()
+    server = PooledWSGIServer(app, sock, threads)
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.5},
+                     name='http-accept', daemon=True).start()
+    logger.info("Worker %s serving with %d threads", os.getpid(), threads)
+    try:
+        os.write(ready_fd, b'1')
+    except BrokenPipeError:
+        # The master only listens for readiness during a reload
+        pass
+    os.close(ready_fd)
+
+    stop.wait()
+    server.shutdown()
+    if not server.drain(graceful_timeout):
+        logger.warning("Worker %s exiting with requests still in flight", os.getpid())
+    server.server_close()
+
+
+def _wait_ready(fds, timeout):
+    """Wait until each pipe reports ready or closes; returns the fds that reported ready"""
+    pending = set(fds)
+    ready = set()
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        readable, _, _ = select.select(list(pending), [], [], max(0.0, deadline - time.monotonic()))
+        for fd in readable:
+            if os.read(fd, 1):
+                ready.add(fd)
+            pending.discard(fd)
+            os.close(fd)
+    for fd in pending:
+        os.close(fd)
+    return ready
+
+
+class Master:
+    """Forks and supervises the worker processes"""
+
+    def __init__(self, app_factory, host='0.0.0.0', port=5000, workers=None, threads=None,
+                 graceful_timeout=GRACEFUL_TIMEOUT, preload=None):
+        self.app_factory = app_factory
+        self.host = host
+        self.port = port
+        self.workers = workers or default_workers()
+        self.threads = threads or default_threads()
+        self.graceful_timeout = graceful_timeout
+        self.preload = preload
+        self.generation = 0
+        # Highest generation ever started; a failed reload's number is never reused
+        self._last_generation = 0
+        self.sock = None
+        self._children = {}  # pid -> (generation, started)
+        self._reload = False
+        self._stopping = False
+
+    def _prepare_environment(self):
+        # Every worker must sign and check sessions with the same keys
+        for name in ('FLASK_SECRET_KEY', 'JWT_SECRET_KEY'):
+            if not os.getenv(name):
+                logger.warning("%s is not set; generated one for this server run", name)
+                os.environ[name] = secrets.token_hex(32)
+        # Workers pick a cache backend they share when there are several of them (cache.default_cache_type)
+        os.environ['WEB_CONCURRENCY'] = str(self.workers)
+        # Let /metrics in any worker report the totals of all of them
+        directory = os.environ.setdefault('METRICS_MULTIPROC_DIR',
+                                          tempfile.mkdtemp(prefix='court-metrics-'))
+        os.makedirs(directory, exist_ok=True)
+        metrics.clear_multiprocess_dir(directory)
+
+    def _spawn(self):
+        """Fork a worker; returns its pid and a pipe that becomes readable once it serves"""
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(ready_write)
+            self._children[pid] = (self.generation, time.monotonic())
+            return pid, ready_read
+        os.close(ready_read)
+        code = 0
+        try:
+            _run_worker(self.app_factory, self.sock, self.threads, self.graceful_timeout, ready_write)
+        except BaseException:
+            logger.exception("Worker %s failed", os.getpid())
+            code = 1
+        finally:
+            # Never unwind into the master's frames; flush what atexit would have
+            tracing.flush()
+            metrics.REGISTRY.flush()
+            logging_pipeline.shutdown_logging()
+            os._exit(code)
+
+    def _run_preload(self):
+        if self.preload is not None:
+            started = time.perf_counter()
+            self.preload()
+            logger.info("Preload finished in %.2fs", time.perf_counter() - started)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation, started = self._children.pop(pid, (None, 0))
+            if generation == self.generation and not self._stopping:
+                logger.warning("Worker %s exited with status %s; replacing it", pid, os.waitstatus_to_exitcode(status))
+                if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                    time.sleep(MIN_WORKER_LIFETIME)
+                os.close(self._spawn()[1])
+
+    def reload(self):
+        """Preload again and replace every worker, old ones draining in the background.
+
+        The old generation is only stopped once every new worker reports
+        ready; otherwise the new generation is stopped and the old one keeps
+        serving.
+        """
+        old = list(self._children)
+        try:
+            self._run_preload()
+        except Exception:
+            logger.exception("Preload failed; keeping the current workers")
+            return
+        previous = self.generation
+        self._last_generation += 1
+        self.generation = self._last_generation
+        spawned = [self._spawn() for _ in range(self.workers)]
+        # Old workers keep serving until the new generation is up
+        ready = _wait_ready([fd for _, fd in spawned], self.graceful_timeout)
+        if len(ready) < self.workers:
+            logger.error("Only %d of %d new workers started; keeping generation %d",
+                         len(ready), self.workers, previous)
+            # Ready ones drain like any worker; the rest may be stuck in create_app, past caring for SIGTERM
+            for pid, fd in spawned:
+                self._signal(pid, signal.SIGTERM if fd in ready else signal.SIGKILL)
+            self.generation = previous
+            return
+        for pid in old:
+            self._signal(pid, signal.SIGTERM)
+        logger.info("Reloaded: generation %d started, %d old workers draining", self.generation, len(old))
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def stop(self):
+        self._stopping = True
+        for pid in list(self._children):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + KEEPALIVE_TIMEOUT
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self._children):
+            logger.warning("Killing worker %s after the graceful timeout", pid)
+            self._signal(pid, signal.SIGKILL)
+        while self._children:
+            self._reap()
+            time.sleep(0.05)
+
+    def run(self):
+        self._prepare_environment()
+        self.sock = socket.create_server((self.host, self.port), backlog=2048)
+        # Workers race for each connection; the losers must not block in accept()
+        self.sock.setblocking(False)
+        self._run_preload()
+
+        def request_reload(*_):
+            self._reload = True
+
+        def request_stop(*_):
+            self._stopping = True
+
+        signal.signal(signal.SIGHUP, request_reload)
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        for _ in range(self.workers):
+            os.close(self._spawn()[1])
+        logger.info("Master %s listening on %s:%s with %d workers x %d threads",
+                    os.getpid(), self.host, self.port, self.workers, self.threads)
+        try:
+            while not self._stopping:
+                time.sleep(0.2)
+                self._reap()
+                if self._reload:
+                    self._reload = False
+                    self.reload()
+        finally:
+            self.stop()
+            self.sock.close()
+        logger.info("Master %s stopped", os.getpid())
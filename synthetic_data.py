@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+Synthetic court data at production scale
+
+    python synthetic_data.py --cases 1000000 --workers 8 --mongo-url mongodb://localhost:27017
+    python synthetic_data.py --cases 20000 --output synthetic/     # NDJSON files plus cases.csv
+
+Value frequencies are taken from the historical dataset (cases.csv): courts,
+judges per court, outcome per case type, time to judgment, claim amounts,
+scores, party names and the vocabulary of the free-text columns. Cases,
+users, filings, hearings, hearing schedules, predictions and legal
+resources are generated in those proportions, in the shapes the application
+writes them (models.py, case_loader.row_to_case, filings.build_filing,
+hearing_scheduler.hearing_document and the /predict route).
+
+Every document has a deterministic _id derived from its collection and
+index, so references line up across worker processes without lookups and a
+rerun with the same seed skips what is already stored. Chunks are generated
+and written by a process pool with unordered insert_many; indexes are built
+once at the end. All synthetic users share one password (--password); a
+share of them are admins only when that password is not the published
+default. Only a local mongod is seeded, never the MONGODB_URL from .env.
+"""
+
+import argparse
+import csv
+import datetime
+import glob
+import logging
+import os
+import shutil
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import numpy as np
+from bson import ObjectId, json_util
+
+from case_data import CASES_CSV, iter_case_rows
+from case_loader import row_to_case
+from case_numbers import format_case_number
+from filings import build_filing
+from hearing_index import DAY_START
+from hearing_scheduler import hearing_document
+import models
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ('users', 'cases', 'case_filings', 'hearings', 'hearing_schedules', 'predictions',
+               'legal_resources')
+# Documents per generated case
+RATIOS = {
+    'users': 0.05,
+    'cases': 1,
+    'case_filings': 1,
+    'hearings': 1.5,
+    'hearing_schedules': 1.5,
+    'predictions': 0.5,
+    'legal_resources': 0.02
+}
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_SEED = 2024
+DEFAULT_PASSWORD = 'synthetic-password'
+USERNAME_FORMAT = 'synthetic{:07d}'
+CASE_ID_FORMAT = 'SYN-{:07d}'
+ADMIN_SHARE = 0.005
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+# Cases.csv column order, used for the synthetic dataset export
+DATASET_COLUMNS = [
+    'Case ID', 'Court Name', 'Judge Name', 'Date Filed', 'Date of Judgment', 'Case Type', 'Case Outcome',
+    'Key Legal Issues', 'Relevant Statutes', 'Plaintiff', 'Defendant', 'Summary of Facts', 'Claim Amount',
+    "Plaintiff's Arguments", "Defendant's Arguments", 'Cited Precedents', 'Final Decision', 'Legal Principles',
+    'Precedents Applied', 'Statutory Provisions', 'Ratio Decidendi', 'Legal Arguments Score',
+    'Precedent Strength', 'Judicial Precedent Consistency', 'Outcome Likelihood'
+]
+CATEGORICAL_COLUMNS = ('Court Name', 'Case Type', 'Key Legal Issues', 'Relevant Statutes', 'Cited Precedents',
+                       'Legal Principles', 'Precedents Applied', 'Statutory Provisions')
+TEXT_COLUMNS = ('Summary of Facts', "Plaintiff's Arguments", "Defendant's Arguments", 'Ratio Decidendi')
+NUMERIC_COLUMNS = ('Claim Amount', 'Legal Arguments Score', 'Precedent Strength',
+                   'Judicial Precedent Consistency', 'Outcome Likelihood')
+
+# The live application's vocabularies, which differ from the dataset's
+FILING_CASE_TYPES = ['civil', 'commercial', 'corporate', 'bankruptcy']
+FILING_STATUSES = {'pending': 0.55, 'scheduled': 0.25, 'closed': 0.2}
+HEARING_TYPES = ['Initial Hearing', 'Evidence', 'Arguments', 'Interim Application', 'Final Hearing', 'Judgment']
+RESOURCE_CATEGORIES = {'statute': 0.3, 'judgment': 0.35, 'article': 0.2, 'guide': 0.15}
+SITTING_HOURS = 7
+FILING_YEARS = 5
+# Hearing schedules run from this many days ago into the future
+SCHEDULE_START_DAYS = 730
+SCHEDULE_DAYS = 1095
+
+
+def object_id(collection, index):
+    """Deterministic ObjectId: one byte for the collection, eleven for the index"""
+    return ObjectId(bytes([COLLECTIONS.index(collection) + 1]) + int(index).to_bytes(11, 'big'))
+
+
+def plan_counts(cases):
+    return {name: max(1, int(cases * ratio)) for name, ratio in RATIOS.items()}
+
+
+class Distribution:
+    """Empirical distribution over observed values"""
+
+    def __init__(self, counter):
+        values, weights = zip(*counter.most_common()) if counter else ((None,), (1,))
+        self.values = list(values)
+        self.p = np.asarray(weights, dtype=float) / sum(weights)
+
+    def sample(self, rng, size):
+        return [self.values[i] for i in rng.choice(len(self.values), size=size, p=self.p)]
+
+
+class DatasetProfile:
+    """What the generator needs to know about the historical dataset"""
+
+    def __init__(self, rows):
+        if not rows:
+            raise ValueError("The dataset has no rows to learn from")
+        column = lambda name: Counter(row.get(name, '') for row in rows if row.get(name))
+        self.categorical = {name: Distribution(column(name)) for name in CATEGORICAL_COLUMNS}
+
+        by_court = defaultdict(Counter)
+        by_type = defaultdict(Counter)
+        by_outcome = defaultdict(Counter)
+        for row in rows:
+            by_court[row.get('Court Name')][row.get('Judge Name')] += 1
+            by_type[row.get('Case Type')][row.get('Case Outcome')] += 1
+            by_outcome[row.get('Case Outcome')][row.get('Final Decision')] += 1
+        self.judges = {court: Distribution(judges) for court, judges in by_court.items()}
+        self.outcomes = {case_type: Distribution(outcomes) for case_type, outcomes in by_type.items()}
+        self.decisions = {outcome: Distribution(decisions) for outcome, decisions in by_outcome.items()}
+        self.all_judges = sorted({judge for judges in by_court.values() for judge in judges if judge})
+
+        filed = [self._date(row.get('Date Filed')) for row in rows]
+        durations = [(self._date(row.get('Date of Judgment')) - start).days
+                     for row, start in zip(rows, filed) if start and self._date(row.get('Date of Judgment'))]
+        self.days_to_judgment = np.asarray([d for d in durations if d >= 0] or [180])
+        years = [d.year for d in filed if d]
+        self.years = (min(years), max(years)) if years else (2010, 2024)
+
+        self.numeric = {name: np.asarray([float(row[name]) for row in rows if self._number(row.get(name))])
+                        for name in NUMERIC_COLUMNS}
+        self.parties = Distribution(Counter(row.get(side) for row in rows
+                                            for side in ('Plaintiff', 'Defendant') if row.get(side)))
+        words = Counter()
+        self.text_lengths = {}
+        for name in TEXT_COLUMNS:
+            lengths = []
+            for row in rows:
+                tokens = row.get(name, '').rstrip('.').lower().split()
+                words.update(tokens)
+                lengths.append(len(tokens))
+            self.text_lengths[name] = np.asarray([n for n in lengths if n] or [12])
+        common = words.most_common() or [('case', 1)]
+        self.words = np.asarray([word for word, _ in common])
+        self.word_p = np.asarray([count for _, count in common], dtype=float) / sum(count for _, count in common)
+
+    @staticmethod
+    def _date(value):
+        try:
+            return datetime.date.fromisoformat(value) if value else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _number(value):
+        try:
+            float(value)
+            return True
+        except (TypeError, ValueError):
+            return False
+
+    @classmethod
+    def from_csv(cls, path=CASES_CSV):
+        return cls(list(iter_case_rows(path)))
+
+
+class SyntheticData:
+    """Generates chunks of any collection; the same (seed, collection, start) always gives the same documents"""
+
+    def __init__(self, profile, counts, seed=DEFAULT_SEED, password_hash='', today=None, admin_share=ADMIN_SHARE):
+        self.profile = profile
+        self.counts = counts
+        self.seed = seed
+        self.password_hash = password_hash
+        self.admin_share = admin_share
+        self.today = today or datetime.date.today()
+        self.filing_start = self.today - datetime.timedelta(days=365 * FILING_YEARS)
+
+    # References by index, so any worker can compute them
+
+    def username(self, index):
+        return USERNAME_FORMAT.format(index)
+
+    def filing_date(self, index):
+        # Filings accumulate in index order over the last FILING_YEARS years
+        span = (self.today - self.filing_start).days
+        return self.filing_start + datetime.timedelta(days=int(index) * span // self.counts['case_filings'])
+
+    def filing_case_number(self, index):
+        return format_case_number(self.filing_date(index), int(index), prefix='SYN')
+
+    def _rng(self, collection, start):
+        return np.random.default_rng([self.seed, COLLECTIONS.index(collection), start])
+
+    def _text(self, rng, column, size):
+        lengths = rng.choice(self.profile.text_lengths[column], size=size)
+        indexes = rng.choice(len(self.profile.words), size=int(lengths.sum()), p=self.profile.word_p)
+        texts = []
+        offset = 0
+        for length in lengths:
+            sentence = ' '.join(self.profile.words[indexes[offset:offset + length]])
+            texts.append(sentence[:1].upper() + sentence[1:] + '.')
+            offset += length
+        return texts
+
+    def _users(self, rng, size):
+        return rng.integers(self.counts['users'], size=size)
+
+    def generate(self, collection, start, stop):
+        """Documents start..stop-1 of collection"""
+        rng = self._rng(collection, start)
+        return getattr(self, f"_generate_{collection}")(rng, start, stop - start)
+
+    def _generate_users(self, rng, start, size):
+        documents = []
+        admins = rng.random(size) < self.admin_share
+        joined = rng.integers(365 * FILING_YEARS, size=size)
+        seen = rng.integers(0, 90, size=size)
+        for offset in range(size):
+            index = start + offset
+            user = models.create_user(self.username(index), self.password_hash,
+                                      role='admin' if admins[offset] else 'user',
+                                      email=f"{self.username(index)}@example.com")
+            user['_id'] = object_id('users', index)
+            user['created_at'] = datetime.datetime.combine(
+                self.today - datetime.timedelta(days=int(joined[offset])), datetime.time(9))
+            user['last_login'] = datetime.datetime.combine(
+                self.today - datetime.timedelta(days=int(seen[offset])), datetime.time(11))
+            documents.append(user)
+        return documents
+
+    def dataset_rows(self, rng, start, size):
+        """Rows with the cases.csv columns"""
+        profile = self.profile
+        columns = {name: profile.categorical[name].sample(rng, size) for name in CATEGORICAL_COLUMNS}
+        for name in TEXT_COLUMNS:
+            columns[name] = self._text(rng, name, size)
+        for name in NUMERIC_COLUMNS:
+            values = profile.numeric[name]
+            columns[name] = rng.choice(values, size=size) if len(values) else np.zeros(size)
+        first_year, last_year = profile.years
+        filed_days = rng.integers((datetime.date(last_year, 12, 31) - datetime.date(first_year, 1, 1)).days,
+                                  size=size)
+        durations = rng.choice(profile.days_to_judgment, size=size)
+        parties = profile.parties.sample(rng, 2 * size)
+        # Most historical cases are decided; a few are still open
+        decided = rng.random(size) < 0.9
+
+        rows = []
+        for i in range(size):
+            court = columns['Court Name'][i]
+            case_type = columns['Case Type'][i]
+            filed = datetime.date(first_year, 1, 1) + datetime.timedelta(days=int(filed_days[i]))
+            judges = profile.judges.get(court)
+            outcomes = profile.outcomes.get(case_type)
+            outcome = outcomes.sample(rng, 1)[0] if outcomes and decided[i] else ''
+            decisions = profile.decisions.get(outcome)
+            row = {name: columns[name][i] for name in CATEGORICAL_COLUMNS + TEXT_COLUMNS}
+            row.update({
+                'Case ID': CASE_ID_FORMAT.format(start + i),
+                'Judge Name': judges.sample(rng, 1)[0] if judges else '',
+                'Date Filed': filed.isoformat(),
+                'Date of Judgment': (filed + datetime.timedelta(days=int(durations[i]))).isoformat() if outcome else '',
+                'Case Outcome': outcome,
+                'Plaintiff': parties[2 * i],
+                'Defendant': parties[2 * i + 1],
+                'Final Decision': decisions.sample(rng, 1)[0] if decisions else ''
+            })
+            for name in NUMERIC_COLUMNS:
+                value = float(columns[name][i])
+                row[name] = str(int(value)) if value.is_integer() else f"{value:g}"
+            rows.append(row)
+        return rows
+
+    def _generate_cases(self, rng, start, size):
+        # Rows first, so the exported dataset matches the collection row for row
+        rows = self.dataset_rows(rng, start, size)
+        users = self._users(rng, size)
+        documents = []
+        for offset, row in enumerate(rows):
+            case = row_to_case(row, filed_by=str(object_id('users', users[offset])))
+            case['_id'] = object_id('cases', start + offset)
+            case['source'] = 'synthetic'
+            documents.append(case)
+        return documents
+
+    def _generate_case_filings(self, rng, start, size):
+        users = self._users(rng, size)
+        case_types = rng.choice(FILING_CASE_TYPES, size=size)
+        statuses = rng.choice(list(FILING_STATUSES), size=size, p=list(FILING_STATUSES.values()))
+        parties = self.profile.parties.sample(rng, 2 * size)
+        descriptions = self._text(rng, 'Summary of Facts', size)
+        lawyers = rng.integers(2000, size=size)
+        documents = []
+        for offset in range(size):
+            index = start + offset
+            filed = datetime.datetime.combine(self.filing_date(index), datetime.time(10))
+            filing = build_filing({
+                'case_type': str(case_types[offset]),
+                'filing_date': filed,
+                'plaintiff_name': parties[2 * offset],
+                'defendant_name': parties[2 * offset + 1],
+                'case_description': descriptions[offset],
+                'court_name': None,
+                'lawyer_name': f"Advocate {lawyers[offset]:04d}"
+            }, str(object_id('users', users[offset])), self.username(users[offset]))
+            filing.update({
+                '_id': object_id('case_filings', index),
+                'case_number': self.filing_case_number(index),
+                'status': str(statuses[offset]),
+                'created_at': filed,
+                'document_ids': []
+            })
+            documents.append(filing)
+        return documents
+
+    def _generate_hearings(self, rng, start, size):
+        cases = rng.integers(self.counts['cases'], size=size)
+        days = rng.integers(-SCHEDULE_START_DAYS, SCHEDULE_DAYS - SCHEDULE_START_DAYS, size=size)
+        hours = rng.integers(SITTING_HOURS, size=size)
+        judges = rng.integers(len(self.profile.all_judges), size=size)
+        rooms = rng.integers(1, 41, size=size)
+        types = rng.choice(HEARING_TYPES, size=size)
+        documents = []
+        for offset in range(size):
+            day = self.today + datetime.timedelta(days=int(days[offset]))
+            hearing = models.create_hearing(
+                object_id('cases', cases[offset]),
+                datetime.datetime.combine(day, DAY_START) + datetime.timedelta(hours=int(hours[offset])),
+                self.profile.all_judges[judges[offset]], f"Courtroom {rooms[offset]}", str(types[offset]))
+            hearing['_id'] = object_id('hearings', start + offset)
+            hearing['status'] = 'scheduled' if days[offset] >= 0 else 'completed'
+            documents.append(hearing)
+        return documents
+
+    def _generate_hearing_schedules(self, rng, start, size):
+        """Conflict-free by construction: each index owns one (courtroom, day, hour) slot"""
+        total = self.counts['hearing_schedules']
+        rooms = max(1, -(-total // (SITTING_HOURS * SCHEDULE_DAYS)))
+        judges = self._judge_pool(rooms)
+        filings = rng.integers(self.counts['case_filings'], size=size)
+        types = rng.choice(HEARING_TYPES, size=size)
+        first_day = self.today - datetime.timedelta(days=SCHEDULE_START_DAYS)
+        documents = []
+        for offset in range(size):
+            index = start + offset
+            hour, slot = index % SITTING_HOURS, index // SITTING_HOURS
+            room, day = slot % rooms, slot // rooms
+            begins = datetime.datetime.combine(first_day + datetime.timedelta(days=day), DAY_START) \
+                + datetime.timedelta(hours=hour)
+            hearing = hearing_document({'case_number': self.filing_case_number(filings[offset])},
+                                       judges[room], f"Courtroom {room + 1}", begins,
+                                       hearing_type=str(types[offset]))
+            hearing['_id'] = object_id('hearing_schedules', index)
+            hearing['created_at'] = begins - datetime.timedelta(days=30)
+            hearing['status'] = 'scheduled' if begins.date() >= self.today else 'completed'
+            documents.append(hearing)
+        return documents
+
+    def _judge_pool(self, size):
+        """At least size distinct judge names: the dataset's, then recombinations of their names"""
+        judges = list(self.profile.all_judges)
+        first = sorted({j.split()[-2] for j in judges if len(j.split()) >= 3})
+        last = sorted({j.split()[-1] for j in judges if len(j.split()) >= 3})
+        seen = set(judges)
+        for f in first:
+            for l in last:
+                if len(judges) >= size:
+                    return judges
+                name = f"Justice {f} {l}"
+                if name not in seen:
+                    seen.add(name)
+                    judges.append(name)
+        while len(judges) < size:
+            judges.append(f"Justice Bench {len(judges) + 1}")
+        return judges
+
+    def _generate_predictions(self, rng, start, size):
+        rows = self.dataset_rows(rng, start, size)
+        filings = rng.integers(self.counts['case_filings'], size=size)
+        users = self._users(rng, size)
+        ages = rng.integers(365 * FILING_YEARS * 24 * 3600, size=size)
+        analyses = self._text(rng, 'Ratio Decidendi', size)
+        documents = []
+        for offset, row in enumerate(rows):
+            created = datetime.datetime.combine(self.today, datetime.time()) - datetime.timedelta(
+                seconds=int(ages[offset]))
+            documents.append({
+                '_id': object_id('predictions', start + offset),
+                'case_id': self.filing_case_number(filings[offset]),
+                'case_type': row['Case Type'],
+                'plaintiff_name': row['Plaintiff'],
+                'plaintiff_args': row["Plaintiff's Arguments"],
+                'defendant_name': row['Defendant'],
+                'defendant_args': row["Defendant's Arguments"],
+                'date_filed': row['Date Filed'],
+                'legal_principles': row['Legal Principles'],
+                'judge_name': row['Judge Name'],
+                'court_name': row['Court Name'],
+                'user_id': str(object_id('users', users[offset])),
+                'username': self.username(users[offset]),
+                'created_at': created,
+                'status': 'completed',
+                'ipc_analysis': f"Applicable provisions: {row['Statutory Provisions']}. {analyses[offset]}",
+                'judgment_prediction': f"{row['Final Decision'] or 'Pending'}. {row['Ratio Decidendi']}",
+                'completed_at': created + datetime.timedelta(seconds=6)
+            })
+        return documents
+
+    def _generate_legal_resources(self, rng, start, size):
+        categories = rng.choice(list(RESOURCE_CATEGORIES), size=size, p=list(RESOURCE_CATEGORIES.values()))
+        statutes = self.profile.categorical['Relevant Statutes'].sample(rng, size)
+        principles = self.profile.categorical['Legal Principles'].sample(rng, size)
+        issues = self.profile.categorical['Key Legal Issues'].sample(rng, size)
+        bodies = [' '.join(parts) for parts in zip(*(self._text(rng, column, size) for column in TEXT_COLUMNS))]
+        documents = []
+        for offset in range(size):
+            index = start + offset
+            category = str(categories[offset])
+            documents.append({
+                '_id': object_id('legal_resources', index),
+                'title': f"{principles[offset]} and {issues[offset].lower()} under the {statutes[offset]}",
+                'content': f"{issues[offset]}. {principles[offset]}. {bodies[offset]}",
+                'category': category,
+                'url': f"https://resources.example.com/{category}/{index}"
+            })
+        return documents
+
+
+# Seeding, one process per worker
+
+_worker = {}
+
+
+def _init_worker(data, mongodb_url, output):
+    _worker['data'] = data
+    _worker['output'] = output
+    if mongodb_url:
+        from pymongo import MongoClient
+        _worker['db'] = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000).court_db
+
+
+def _write_chunk(collection, start, stop):
+    """Generate and store one chunk; returns (collection, generated, inserted)"""
+    data = _worker['data']
+    documents = data.generate(collection, start, stop)
+    if _worker['output']:
+        path = os.path.join(_worker['output'], 'parts', f"{collection}.{start:010d}.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for document in documents:
+                f.write(json_util.dumps(document) + '\n')
+        return collection, len(documents), len(documents)
+
+    from pymongo.errors import BulkWriteError
+    try:
+        inserted = len(_worker['db'][collection].insert_many(documents, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        # Duplicate _ids are documents an earlier run already stored
+        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+        inserted = e.details.get('nInserted', 0)
+    return collection, len(documents), inserted
+
+
+def _write_dataset_chunk(start, stop):
+    data = _worker['data']
+    path = os.path.join(_worker['output'], 'parts', f"dataset.{start:010d}.csv")
+    rows = data.dataset_rows(data._rng('cases', start), start, stop - start)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.DictWriter(f, DATASET_COLUMNS).writerows(rows)
+    return 'cases.csv', len(rows), len(rows)
+
+
+def ensure_indexes(db):
+    """The indexes the application creates, built once after the bulk load"""
+    db.users.create_index('username', unique=True)
+    db.cases.create_index('case_number', unique=True)
+    db.cases.create_index('filed_by')
+    db.cases.create_index('plaintiff.id')
+    db.cases.create_index('defendant.id')
+    db.hearings.create_index([('case_id', 1), ('date', 1)])
+    db.hearings.create_index([('status', 1), ('date', 1)])
+    db.case_filings.create_index([('case_number', 1)], unique=True)
+    db.case_filings.create_index([('status', 1), ('filing_date', 1)])
+    db.hearing_schedules.create_index([('case_id', 1), ('hearing_date', 1)])
+    db.hearing_schedules.create_index([('status', 1), ('hearing_date', 1)])
+    db.legal_resources.create_index([('title', 'text'), ('content', 'text')])
+
+
+def _merge_parts(output):
+    """Concatenate the per-chunk files in index order"""
+    parts = sorted(glob.glob(os.path.join(output, 'parts', '*')))
+    for name in sorted({os.path.basename(p).split('.')[0] for p in parts}):
+        target = os.path.join(output, 'cases.csv' if name == 'dataset' else f"{name}.jsonl")
+        with open(target, 'w', encoding='utf-8', newline='') as out:
+            if name == 'dataset':
+                csv.writer(out).writerow(DATASET_COLUMNS)
+            for part in (p for p in parts if os.path.basename(p).split('.')[0] == name):
+                with open(part, encoding='utf-8') as f:
+                    shutil.copyfileobj(f, out)
+    shutil.rmtree(os.path.join(output, 'parts'))
+
+
+def seed(data, collections=COLLECTIONS, workers=4, chunk_size=DEFAULT_CHUNK_SIZE, mongodb_url=None, output=None):
+    """Generate collections with a process pool; returns {collection: (generated, inserted)}
+
+    With output, NDJSON files are written there instead, plus cases.csv when cases are generated.
+    """
+    if output:
+        os.makedirs(os.path.join(output, 'parts'), exist_ok=True)
+    totals = defaultdict(lambda: [0, 0])
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data, mongodb_url, output)) as pool:
+        futures = [pool.submit(_write_chunk, collection, start, min(start + chunk_size, data.counts[collection]))
+                   for collection in collections
+                   for start in range(0, data.counts[collection], chunk_size)]
+        if output and 'cases' in collections:
+            futures += [pool.submit(_write_dataset_chunk, start, min(start + chunk_size, data.counts['cases']))
+                        for start in range(0, data.counts['cases'], chunk_size)]
+        done = 0
+        for future in as_completed(futures):
+            name, generated, inserted = future.result()
+            totals[name][0] += generated
+            totals[name][1] += inserted
+            done += 1
+            if done % max(1, len(futures) // 20) == 0:
+                documents = sum(generated for generated, _ in totals.values())
+                print(f"   {done}/{len(futures)} chunks, {documents:,} documents "
+                      f"({documents / (time.perf_counter() - started):,.0f}/s)")
+    if output:
+        _merge_parts(output)
+    return {name: tuple(counts) for name, counts in totals.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic court data")
+    parser.add_argument('--cases', type=int, default=100000,
+                        help="Cases to generate; other collections are sized from it (default: 100000)")
+    parser.add_argument('--only', help=f"Comma-separated subset of: {', '.join(COLLECTIONS)}")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help="Generator processes")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Documents per insert_many")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--csv', default=CASES_CSV, help="Dataset to take the distributions from")
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help="Password of every synthetic user")
+    parser.add_argument('--mongo-url', help="Local mongod to seed, e.g. mongodb://localhost:27017")
+    parser.add_argument('--output', help="Write NDJSON files and a cases.csv-style dataset here instead of MongoDB")
+    parser.add_argument('--drop', action='store_true', help="Drop the generated collections before seeding")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    collections = [name for name in args.only.split(',') if name] if args.only else list(COLLECTIONS)
+    unknown = set(collections) - set(COLLECTIONS)
+    if unknown:
+        parser.error(f"Unknown collections: {', '.join(sorted(unknown))}")
+    if not args.output:
+        if not args.mongo_url:
+            parser.error("--mongo-url or --output is required")
+        # The seed writes and --drop removes users, cases and filings; keep it off shared servers
+        if urlparse(args.mongo_url).hostname not in LOCAL_HOSTS:
+            parser.error("Only a local mongod is seeded; pass a localhost --mongo-url or use --output")
+    elif args.drop:
+        parser.error("--drop only applies when seeding a local mongod")
+
+    from werkzeug.security import generate_password_hash
+    profile = DatasetProfile.from_csv(args.csv)
+    counts = plan_counts(args.cases)
+    # Admin accounts with a password printed in the docs would be an open door
+    admin_share = ADMIN_SHARE if args.password != DEFAULT_PASSWORD else 0
+    if not admin_share:
+        print(f"   No admin users: pass a --password other than {DEFAULT_PASSWORD!r} to create some")
+    # One hash for everyone: hashing a million passwords would take hours
+    data = SyntheticData(profile, counts, seed=args.seed, password_hash=generate_password_hash(args.password),
+                         admin_share=admin_share)
+
+    mongodb_url = None
+    db = None
+    if not args.output:
+        from pymongo import MongoClient
+        mongodb_url = args.mongo_url
+        db = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000).court_db
+        if args.drop:
+            for collection in collections:
+                db[collection].drop()
+
+    print(f"Generating {sum(counts[name] for name in collections):,} documents with {args.workers} workers: "
+          + ', '.join(f"{name} {counts[name]:,}" for name in collections))
+    started = time.perf_counter()
+    totals = seed(data, collections, args.workers, args.chunk_size, mongodb_url, args.output)
+    elapsed = time.perf_counter() - started
+    if db is not None:
+        print("Building indexes...")
+        ensure_indexes(db)
+
+    for name, (generated, inserted) in sorted(totals.items()):
+        print(f"   {name:18s} {generated:>12,} generated {inserted:>12,} written")
+    generated = sum(generated for generated, _ in totals.values())
+    print(f"✅ {generated:,} documents in {elapsed:.1f}s ({generated / elapsed:,.0f}/s)"
+          + (f", files in {args.output}" if args.output else ''))
+    print(f"   Users log in as {USERNAME_FORMAT.format(0)}..{USERNAME_FORMAT.format(counts['users'] - 1)}"
+          f" with password {args.password!r}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,85 @@
+"""
+Incremental refreshes and snapshots of the outcome analytics cube:
+    python -m pytest test_analytics_cube.py
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from analytics_cube import DIMENSIONS, OutcomeCube, _Cells
+
+
+def row(case_id, court='High Court', case_type='Civil', outcome='Allowed', filed='2020-01-10',
+        decided='2020-03-10', judge='Justice A. Rao'):
+    return {'Case ID': case_id, 'Court Name': court, 'Case Type': case_type, 'Judge Name': judge,
+            'Date Filed': filed, 'Date of Judgment': decided, 'Case Outcome': outcome}
+
+
+def test_merge_retracts_negative_deltas_and_drops_emptied_cells():
+    sizes = (2, 1, 1, 1)
+    cells = OutcomeCube._merge(_Cells.empty(), [(1, (0, 0, 0, 0), 0, 60), (1, (1, 0, 0, 0), 1, -1)], sizes, 2)
+    assert len(cells) == 2
+    # The first case is retracted; the second moves from outcome 1 to outcome 0 with a known duration
+    cells = OutcomeCube._merge(cells, [(-1, (0, 0, 0, 0), 0, 60), (-1, (1, 0, 0, 0), 1, -1),
+                                       (1, (1, 0, 0, 0), 0, 30)], sizes, 2)
+    assert cells.codes.tolist() == [[1, 0, 0, 0]]
+    assert cells.cases.tolist() == [1]
+    assert cells.outcomes.tolist() == [[1, 0]]
+    assert cells.timed.tolist() == [1]
+    assert cells.days_sum.tolist() == [30]
+    assert cells.histogram.sum() == 1
+
+
+def test_changed_cases_replace_what_they_contributed():
+    cube = OutcomeCube()
+    cube.add(row('C-1'))
+    cube.add(row('C-2', outcome='Dismissed'))
+    assert cube.query()[0]['outcomes'] == {'Allowed': 1, 'Dismissed': 1}
+    cube.add(row('C-1', outcome='Dismissed', court='District Court'))
+    results = {r['court']: r for r in cube.query(group_by=['court'])}
+    assert results['High Court']['outcomes'] == {'Dismissed': 1}
+    assert results['District Court']['outcomes'] == {'Dismissed': 1}
+    cube.add(row('C-1', outcome='Dismissed', court='High Court'))
+    assert [r['court'] for r in cube.query(group_by=['court'])] == ['High Court']
+    assert cube.stats()['cells'] == 1
+
+
+def test_a_snapshot_decodes_with_its_own_dictionaries():
+    cube = OutcomeCube()
+    cube.add(row('C-1', court='High Court'))
+    before = cube.snapshot()
+
+    # A rebuild from a source in another order assigns different codes to the same values
+    cube.source = lambda: iter([row('C-9', court='Supreme Court'), row('C-1', court='High Court')])
+    cube.rebuild()
+    after = cube.snapshot()
+    court = DIMENSIONS.index('court')
+    assert before.dictionaries['court'][1][before.cells.codes[0, court]] == 'High Court'
+    assert after.dictionaries['court'][1][0] == 'Supreme Court'
+    assert {r['court']: r['cases'] for r in cube.query(group_by=['court'])} == {'High Court': 1, 'Supreme Court': 1}
+    assert cube.dimensions()['court'] == ['High Court', 'Supreme Court']
+    assert np.array_equal(before.cells.cases, [1])
+
+
+def test_the_first_build_runs_in_the_background_and_keeps_cases_added_meanwhile():
+    release = threading.Event()
+
+    def source():
+        release.wait(10)
+        yield from [row('C-1'), row('C-2', outcome='Dismissed')]
+
+    cube = OutcomeCube(source).start()
+    # Queries do not wait for the build; a case arriving meanwhile is counted before and after it
+    cube.add(row('C-3'))
+    assert cube.query()[0]['cases'] == 1
+    assert cube.stats()['rebuilding']
+    release.set()
+    deadline = time.monotonic() + 10
+    while cube.stats()['rebuilding']:
+        assert time.monotonic() < deadline, "timed out waiting for the background build"
+        time.sleep(0.01)
+    assert cube.query()[0]['outcomes'] == {'Allowed': 2, 'Dismissed': 1}
+    cube.resync()
+    assert not cube.stats()['stale']
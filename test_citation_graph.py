@@ -0,0 +1,76 @@
+"""
+Background refreshes of the precedent citation graph:
+    python -m pytest test_citation_graph.py
+"""
+
+import threading
+import time
+
+from citation_graph import CitationGraph
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the background refresh"
+        time.sleep(0.01)
+
+
+def add_cases(graph, count, start=0):
+    for case in range(start, start + count):
+        graph.add_case(f"C-{case}", f"Party {case} vs State", 'Civil', cited='Landmark vs State')
+
+
+def test_queries_serve_the_last_snapshot_while_the_source_loads():
+    loading = threading.Event()
+    release = threading.Event()
+
+    def source():
+        loading.set()
+        release.wait(5)
+        yield {'Case ID': 'C-1', 'Plaintiff': 'Party 1', 'Defendant': 'State', 'Case Type': 'Civil',
+               'Cited Precedents': 'Landmark vs State'}
+
+    graph = CitationGraph(source).start()
+    assert loading.wait(5)
+    # The first query does not wait for the load
+    assert graph.authoritative() == []
+    release.set()
+    wait_for(lambda: graph.authoritative())
+    assert graph.authoritative()[0]['precedent'] == 'Landmark vs State'
+
+
+def test_new_cases_are_merged_in_the_background_at_most_every_refresh_interval():
+    graph = CitationGraph(refresh_interval=60)
+    add_cases(graph, 3)
+    assert graph.features(['Landmark vs State'])['precedent_authority_max'] == 0.0
+    wait_for(lambda: graph.features(['Landmark vs State'])['precedent_authority_max'] > 0)
+
+    add_cases(graph, 3, start=3)
+    graph.snapshot()
+    time.sleep(0.1)
+    assert graph.stats()['pending_edges'] == 3
+    graph._refreshed_at -= 60
+    graph.snapshot()
+    wait_for(lambda: not graph._updating)
+    assert graph.stats()['pending_edges'] == 0
+    assert graph.authoritative()[0]['citations'] == 6
+
+
+def test_routine_resyncs_keep_the_graph_but_a_clear_rebuilds_it():
+    loads = []
+
+    def source():
+        loads.append(time.monotonic())
+        yield {'Case ID': 'C-1', 'Plaintiff': 'Party 1', 'Defendant': 'State', 'Case Type': 'Civil',
+               'Cited Precedents': 'Landmark vs State'}
+
+    graph = CitationGraph(source, rebuild_interval=0).start()
+    wait_for(lambda: graph.authoritative())
+    graph.resync()
+    graph.snapshot()
+    time.sleep(0.1)
+    assert len(loads) == 1 and not graph.stats()['stale']
+    graph.clear()
+    graph.snapshot()
+    wait_for(lambda: len(loads) == 2 and not graph._updating)
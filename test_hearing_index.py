@@ -0,0 +1,170 @@
+"""
+Booking conflicts in the hearing index and the hearing status route:
+    python -m pytest test_hearing_index.py
+
+The index and route tests run against mongomock and are skipped without it.
+"""
+
+import datetime
+
+import jwt
+import pytest
+from bson import ObjectId
+
+from hearing_index import CalendarBusy, CalendarLocks, HearingConflict, HearingIndex, IntervalIndex, resource_key
+
+T = datetime.datetime(2030, 1, 7, 10, 0)
+MINUTES = datetime.timedelta(minutes=1)
+
+
+def hearing(hour, minute=0, judge='Justice A. Rao', courtroom='Courtroom 1', duration=60, **fields):
+    return dict({
+        'hearing_date': datetime.datetime(2030, 1, 7),
+        'hearing_time': datetime.datetime(1900, 1, 1, hour, minute),
+        'duration_minutes': duration,
+        'judge_name': judge,
+        'courtroom': courtroom,
+        'status': 'scheduled'
+    }, **fields)
+
+
+# IntervalIndex
+
+def test_overlapping_uses_half_open_intervals():
+    index = IntervalIndex()
+    index.add('judge', T, T + 60 * MINUTES, 'a')
+    assert [i for _, _, i in index.overlapping('judge', T + 30 * MINUTES, T + 90 * MINUTES)] == ['a']
+    assert [i for _, _, i in index.overlapping('judge', T - 30 * MINUTES, T + MINUTES)] == ['a']
+    # Back-to-back hearings do not clash
+    assert index.overlapping('judge', T + 60 * MINUTES, T + 120 * MINUTES) == []
+    assert index.overlapping('judge', T - 60 * MINUTES, T) == []
+    assert index.overlapping('courtroom', T, T + 60 * MINUTES) == []
+
+
+def test_overlapping_finds_long_intervals_that_started_earlier():
+    index = IntervalIndex()
+    index.add('judge', T, T + 300 * MINUTES, 'long')
+    for offset in range(10):
+        start = T + (10 + 30 * offset) * MINUTES
+        index.add('judge', start, start + 5 * MINUTES, f"short-{offset}")
+    found = {i for _, _, i in index.overlapping('judge', T + 280 * MINUTES, T + 281 * MINUTES)}
+    assert found == {'long', 'short-9'}
+
+
+def test_remove_only_drops_the_given_item():
+    index = IntervalIndex()
+    index.add('judge', T, T + 60 * MINUTES, 'a')
+    index.add('judge', T, T + 30 * MINUTES, 'b')
+    assert index.remove('judge', T, 'a')
+    assert not index.remove('judge', T, 'a')
+    assert [i for _, _, i in index.overlapping('judge', T, T + 60 * MINUTES)] == ['b']
+    assert len(index) == 1
+
+
+def test_conflicts_match_judges_and_courtrooms_case_insensitively():
+    index = HearingIndex()
+    index.book(dict(hearing(10), _id=ObjectId()))
+    clashes = index.conflicts(T + 15 * MINUTES, T + 45 * MINUTES, judge='justice  a. RAO', courtroom='Courtroom 2')
+    assert [resource for resource, _, _ in clashes] == ['judge']
+    with pytest.raises(HearingConflict):
+        index.book(hearing(10, 30, judge='Justice B. Iyer', courtroom='COURTROOM 1'))
+    index.book(hearing(11, judge='Justice B. Iyer'))
+
+
+# HearingIndex against a shared collection, as seen by separate worker processes
+
+@pytest.fixture
+def db():
+    mongomock = pytest.importorskip('mongomock')
+    return mongomock.MongoClient().court_db
+
+
+def test_book_rechecks_the_collection_for_other_workers_bookings(db):
+    first, second = HearingIndex(db.hearing_schedules).load(), HearingIndex(db.hearing_schedules).load()
+    first.book(hearing(10))
+    # second's in-memory index has not seen the booking yet
+    assert not second.conflicts(T, T + 60 * MINUTES, judge='Justice A. Rao')
+    with pytest.raises(HearingConflict):
+        second.book(hearing(10, 30, courtroom='Courtroom 2'))
+    second.book(hearing(11, courtroom='Courtroom 2'))
+    assert db.hearing_schedules.count_documents({}) == 2
+    assert db.hearing_locks.count_documents({}) == 0
+
+
+def test_book_waits_for_a_held_calendar_lease(db):
+    index = HearingIndex(db.hearing_schedules, locks=CalendarLocks(db.hearing_locks, wait_seconds=0.1)).load()
+    other = CalendarLocks(db.hearing_locks)
+    held, owner = other.acquire([CalendarLocks.lock_id(resource_key('judge', 'Justice A. Rao'), T.date())])
+    with pytest.raises(CalendarBusy):
+        index.book(hearing(10))
+    other.release(held, owner)
+    index.book(hearing(10))
+
+
+def test_expired_leases_are_taken_over(db):
+    locks = CalendarLocks(db.hearing_locks, lock_seconds=-1)
+    locks.acquire(['judge:x:20300107'])
+    held, _ = CalendarLocks(db.hearing_locks, wait_seconds=0).acquire(['judge:x:20300107'])
+    assert held == ['judge:x:20300107']
+
+
+def test_set_status_rejects_malformed_ids_and_taken_slots(db):
+    index = HearingIndex(db.hearing_schedules).load()
+    postponed = index.book(hearing(10, status='postponed'))
+    index.book(hearing(10, 30, courtroom='Courtroom 2'))
+    assert index.set_status('not-an-id', 'cancelled') is False
+    assert index.set_status(str(ObjectId()), 'cancelled') is False
+    with pytest.raises(HearingConflict):
+        index.set_status(str(postponed['_id']), 'scheduled')
+    assert db.hearing_schedules.find_one({'_id': postponed['_id']})['status'] == 'postponed'
+
+
+# The status route
+
+@pytest.fixture(scope='module')
+def app_module():
+    pytest.importorskip('mongomock')
+    import pymongo
+    from benchmarks.suite import use_mongo
+    original = pymongo.MongoClient
+    use_mongo(None)
+    try:
+        import app
+    finally:
+        pymongo.MongoClient = original
+    return app
+
+
+@pytest.fixture(scope='module')
+def flask_app(app_module):
+    flask_app = app_module.create_app()
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+
+def login(client, flask_app, user_id, role='user'):
+    token = jwt.encode({'user_id': user_id, 'role': role}, flask_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+    with client.session_transaction() as session:
+        session.update(token=token, user_id=user_id, username=user_id, role=role)
+
+
+def test_status_route_checks_ids_ownership_and_conflicts(app_module, flask_app):
+    collection = app_module.hearing_schedules_collection
+    collection.delete_many({})
+    owner, stranger = str(ObjectId()), str(ObjectId())
+    postponed = collection.insert_one(hearing(10, user_id=owner, status='postponed')).inserted_id
+    taken = collection.insert_one(hearing(10, 30, courtroom='Courtroom 2', user_id=stranger)).inserted_id
+    client = flask_app.test_client()
+
+    login(client, flask_app, owner)
+    assert client.post('/api/hearings/not-an-id/status', data={'status': 'cancelled'}).status_code == 404
+    assert client.post(f'/api/hearings/{ObjectId()}/status', data={'status': 'cancelled'}).status_code == 404
+    assert client.post(f'/api/hearings/{taken}/status', data={'status': 'cancelled'}).status_code == 403
+    response = client.post(f'/api/hearings/{postponed}/status', data={'status': 'scheduled'})
+    assert response.status_code == 409
+    assert response.get_json()['conflict_with'] == str(taken)
+
+    login(client, flask_app, str(ObjectId()), role='admin')
+    assert client.post(f'/api/hearings/{taken}/status', data={'status': 'cancelled'}).status_code == 200
+    assert client.post(f'/api/hearings/{postponed}/status', data={'status': 'scheduled'}).status_code == 200
+    assert collection.find_one({'_id': postponed})['status'] == 'scheduled'
@@ -0,0 +1,52 @@
+"""
+Trigram Dice scoring and thresholds of the party-name index:
+    python -m pytest test_party_names.py
+"""
+
+import pytest
+
+from party_names import PartyNameIndex, name_ngrams, normalize_name
+
+
+def dice(a, b):
+    grams_a, grams_b = name_ngrams(normalize_name(a)), name_ngrams(normalize_name(b))
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def test_normalize_name_drops_suffixes_and_punctuation():
+    assert normalize_name('Tata Motors Pvt. Ltd.') == 'tata motors'
+    assert normalize_name('Smith & Sons') == 'smith and sons'
+    assert normalize_name('Café Noir') == 'cafe noir'
+    assert normalize_name('Company Ltd') == 'company ltd'
+
+
+def test_scores_are_trigram_dice():
+    names = ['Ramesh Kumar', 'Rakesh Kumar', 'State of Maharashtra']
+    index = PartyNameIndex(names)
+    scores = index.scores('Ramesh Kumaar')
+    for name, score in zip(names, scores):
+        assert score == pytest.approx(dice('Ramesh Kumaar', name))
+    assert index.scores('Ramesh Kumar')[0] == pytest.approx(1.0)
+    assert index.scores('zzzz')[0] == 0
+
+
+def test_spellings_share_one_canonical_name():
+    index = PartyNameIndex(['Tata Motors Ltd', 'TATA MOTORS PVT LTD', 'Tata Steel'])
+    assert len(index) == 2
+    assert index.canonicalize('tata motors') == 'Tata Motors Ltd'
+    assert index.variants('Tata Motors', threshold=0.9) == ['Tata Motors Ltd', 'TATA MOTORS PVT LTD']
+
+
+def test_match_and_variants_agree_at_the_threshold():
+    index = PartyNameIndex(['Ramesh Kumar', 'Rakesh Kumar'])
+    threshold = float(index.scores('Rakesh Kumar')[0])
+    matched = [name for name, _ in index.match('Rakesh Kumar', k=2, min_score=threshold)]
+    assert matched == ['Rakesh Kumar', 'Ramesh Kumar']
+    assert index.variants('Rakesh Kumar', threshold=threshold) == matched
+    assert index.canonicalize('Rakesh Kumaar', threshold=1.0) == 'Rakesh Kumaar'
+
+
+def test_match_never_returns_unrelated_names():
+    index = PartyNameIndex(['Ramesh Kumar', 'State of Kerala'])
+    assert [name for name, _ in index.match('Ramesh', k=5)] == ['Ramesh Kumar']
+    assert PartyNameIndex().match('anything') == []
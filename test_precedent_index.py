@@ -0,0 +1,96 @@
+"""
+Building and opening the similar-precedent index:
+    python -m pytest test_precedent_index.py
+"""
+
+import os
+import threading
+import time
+
+from precedent_index import DIMENSIONS, PrecedentIndex, build, dataset_fingerprint, read_meta
+
+FACTS = ['breach of a supply contract for steel', 'wrongful dismissal of a factory worker',
+         'boundary dispute over agricultural land', 'defamation in a newspaper article']
+
+
+def rows(count, prefix='C'):
+    return [{'Case ID': f"{prefix}-{i}", 'Plaintiff': f"Party {i}", 'Defendant': 'State', 'Case Type': 'Civil',
+             'Summary of Facts': FACTS[i % len(FACTS)]} for i in range(count)]
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the background build"
+        time.sleep(0.01)
+
+
+def test_concurrent_builds_of_one_path_do_not_clobber_each_other(tmp_path):
+    path = str(tmp_path / 'index')
+    errors = []
+
+    def run(prefix):
+        try:
+            build(path, iter(rows(200, prefix)), fingerprint=prefix)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(prefix,)) for prefix in 'ABCD']
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert read_meta(path)['count'] == 200
+    assert sorted(os.listdir(tmp_path)) == ['index', 'index.lock']
+
+
+def test_queries_search_new_cases_while_a_missing_index_builds(tmp_path):
+    release = threading.Event()
+
+    def source():
+        release.wait(10)
+        yield from rows(40)
+
+    index = PrecedentIndex(str(tmp_path / 'index'), source, fingerprint='v1')
+    index.add({'case_number': 'NEW-1', 'title': 'Mill vs Supplier', 'case_type': 'Civil',
+               'details': {'summary_of_facts': 'breach of a supply contract for cotton'}})
+    # The first query does not wait for the build
+    assert [m['case_id'] for m in index.search('supply contract', k=1)] == ['NEW-1']
+    assert index.stats()['building']
+    release.set()
+    wait_for(lambda: not index.stats()['building'])
+    assert index.stats()['indexed'] == 40
+    assert index.stats()['added_since_build'] == 1
+    assert len(index.search('supply contract', k=20)) == 11
+
+
+def test_fingerprint_covers_the_csv_and_build_parameters_only(tmp_path):
+    csv_path = tmp_path / 'cases.csv'
+    csv_path.write_text('Case ID\n')
+    fingerprint = dataset_fingerprint(str(csv_path))
+    assert fingerprint == dataset_fingerprint(str(csv_path), DIMENSIONS)
+    assert fingerprint != dataset_fingerprint(str(csv_path), 2 * DIMENSIONS)
+    csv_path.write_text('Case ID\nC-1\n')
+    assert fingerprint != dataset_fingerprint(str(csv_path))
+
+
+def test_opening_a_current_index_adds_cases_written_since_its_build(tmp_path):
+    path = str(tmp_path / 'index')
+    unnumbered = dict(rows(1)[0], **{'Case ID': '', 'Plaintiff': 'Mill', 'Defendant': 'Supplier'})
+    build(path, iter(rows(20) + [unnumbered]), fingerprint='v1')
+    since = []
+
+    def recent(started_at):
+        since.append(started_at)
+        return iter([{'case_number': 'NEW-1', 'title': 'Mill vs Supplier', 'case_type': 'Civil',
+                      'details': {'summary_of_facts': 'breach of a supply contract for cotton'}}])
+
+    index = PrecedentIndex(path, fingerprint='v1', recent=recent)
+    assert len(index) == 21
+    wait_for(lambda: index.stats()['added_since_build'] == 1)
+    assert since == [read_meta(path)['started_at']]
+    assert not index.add(rows(20)[3])
+    # A case without a number is recognised in the files by its title, as add() keys it
+    assert not index.add(unnumbered)
+    assert 'NEW-1' in [m['case_id'] for m in index.search('supply contract cotton', k=3)]
@@ -0,0 +1,27 @@
+"""
+Startup-time budget for the web app
+
+Imports app and calls create_app() in a fresh interpreter and fails when
+that takes longer than STARTUP_BUDGET_SECONDS (default 2) or pulls in a
+heavy dependency that should only load on the routes that use it.
+MONGODB_URL is blanked so the measurement does not include a server
+connection:
+    python -m pytest test_startup.py
+"""
+
+import os
+
+from benchmarks.import_profile import profile
+
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', 2.0))
+
+
+def test_create_app_startup_budget():
+    env = dict(os.environ, MONGODB_URL='', GOOGLE_API_KEY='startup-test')
+    entries, imported, created, heavy = profile('app', create_app=True, env=env)
+    slowest = sorted(entries, key=lambda entry: entry[2], reverse=True)[:5]
+
+    assert imported + created < STARTUP_BUDGET_SECONDS, (
+        f"import app + create_app() took {imported + created:.2f}s (budget {STARTUP_BUDGET_SECONDS}s); "
+        f"slowest imports: {[(name, f'{cumulative / 1e6:.2f}s') for name, _, cumulative, _ in slowest]}")
+    assert not heavy, f"Heavy modules loaded at startup: {heavy}"
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Lightweight in-process tracing with JSON-lines export
+
+Spans nest through a context variable, so work started inside a span (and
+threads started with tracing.wrap / tracing.start_thread) is recorded under
+it. Tracing is off unless TRACE_EXPORT names a file or a local collector URL:
+    TRACE_EXPORT=traces.jsonl python app.py
+    python tracing.py traces.jsonl --top 5
+"""
+
+import argparse
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('current_span', default=None)
+_exporter = None
+_sample_rate = 1.0
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start', 'duration', 'attributes', 'error',
+                 '_started', '_token')
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.trace_id = parent.trace_id if parent else os.urandom(8).hex()
+        self.span_id = os.urandom(4).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start = time.time()
+        self.duration = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self._started = time.perf_counter()
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if _exporter is not None:
+            _exporter.export(self.to_dict())
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span that is not recorded; also marks an unsampled trace as current"""
+    __slots__ = ('_token',)
+
+    def __init__(self):
+        self._token = None
+
+    def set(self, **attributes):
+        return self
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def enabled():
+    return _exporter is not None
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name, **attributes):
+    """Open a span as a child of the current one and make it current; end with end_span"""
+    parent = _current.get()
+    if _exporter is None or isinstance(parent, _NoopSpan):
+        return None
+    if parent is None and random.random() >= _sample_rate:
+        # Keep the whole trace out, not just its root
+        unsampled = _NoopSpan()
+        unsampled._token = _current.set(unsampled)
+        return unsampled
+    span = Span(name, parent, attributes)
+    span._token = _current.set(span)
+    return span
+
+
+def end_span(span, error=None):
+    if span is None:
+        return
+    try:
+        _current.reset(span._token)
+    except ValueError:
+        # Ended from a different context than it was started in
+        _current.set(None)
+    if isinstance(span, Span):
+        span.finish(error)
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """with tracing.span('gemini.generate', call='ipc') as s: ..."""
+    opened = start_span(name, **attributes)
+    try:
+        yield opened if opened is not None else NOOP_SPAN
+    except BaseException as e:
+        end_span(opened, e)
+        raise
+    end_span(opened)
+
+
+def traced(name=None):
+    """Decorator form of span(), named after the function by default"""
+    def decorator(f):
+        span_name = name or f"{f.__module__}.{f.__qualname__}"
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return f(*args, **kwargs)
+            with span(span_name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def wrap(fn):
+    """Bind fn to the current trace context so it can run on another thread"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return run
+
+
+def start_thread(target, name=None, daemon=True, args=()):
+    thread = threading.Thread(target=wrap(target), name=name, daemon=daemon, args=args)
+    thread.start()
+    return thread
+
+
+def record(name, start, duration, **attributes):
+    """Record an already-finished operation as a child of the current span"""
+    parent = _current.get()
+    if _exporter is None or not isinstance(parent, Span):
+        return
+    finished = Span(name, parent, attributes)
+    finished.start = start
+    finished.duration = duration
+    _exporter.export(finished.to_dict())
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Adds a span for each Mongo command issued inside a traced operation.
+
+    Listener callbacks run on the thread that issued the command, so the
+    current span at start time is the right parent.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        if _exporter is not None and isinstance(_current.get(), Span):
+            collection = event.command.get(event.command_name)
+            self._pending[(event.connection_id, event.request_id)] = (
+                time.time(), collection if isinstance(collection, str) else None)
+
+    def _finish(self, event, error=None):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is not None:
+            start, collection = pending
+            attributes = {'database': event.database_name, 'collection': collection}
+            if error:
+                attributes['error'] = error
+            record(f"mongo.{event.command_name}", start, event.duration_micros / 1e6, **attributes)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, error=str(event.failure))
+
+
+class JsonLinesExporter:
+    """Appends finished spans to a file, or POSTs batches to a local collector, from a background thread"""
+
+    def __init__(self, target, batch_size=256, flush_interval=1.0):
+        self.target = target
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._thread.start()
+
+    def export(self, span_dict):
+        self._queue.put(span_dict)
+
+    def _write(self, batch):
+        if self.target.startswith(('http://', 'https://')):
+            body = '\n'.join(json.dumps(s, default=str) for s in batch).encode('utf-8')
+            request = urllib.request.Request(self.target, data=body,
+                                             headers={'Content-Type': 'application/x-ndjson'})
+            urllib.request.urlopen(request, timeout=5).close()
+        else:
+            with open(self.target, 'a', encoding='utf-8') as f:
+                for s in batch:
+                    f.write(json.dumps(s, default=str) + '\n')
+
+    def _drain(self, block):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        if batch:
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.warning("Dropped %d spans: %s", len(batch), e)
+        return len(batch)
+
+    def _run(self):
+        while True:
+            self._drain(block=True)
+
+    def flush(self):
+        while self._drain(block=False):
+            pass
+
+
+def configure(target=None, sample_rate=None):
+    """Enable export to a JSON-lines file or collector URL (TRACE_EXPORT / TRACE_SAMPLE_RATE)"""
+    global _exporter, _sample_rate
+    target = target or os.getenv('TRACE_EXPORT')
+    if not target:
+        return None
+    _sample_rate = float(sample_rate if sample_rate is not None else os.getenv('TRACE_SAMPLE_RATE', 1.0))
+    _exporter = JsonLinesExporter(target)
+    atexit.register(_exporter.flush)
+    return _exporter
+
+
+def flush():
+    """Write out spans still queued for export"""
+    if _exporter is not None:
+        _exporter.flush()
+
+
+def init_app(app):
+    """Open a root span per request, tagged with the route and response status"""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_span():
+        g.trace_span = start_span(f"{request.method} {request.path}", method=request.method)
+
+    @app.after_request
+    def tag_request_span(response):
+        opened = g.get('trace_span')
+        if opened is not None:
+            opened.set(status=response.status_code,
+                       route=request.url_rule.rule if request.url_rule is not None else None)
+        return response
+
+    @app.teardown_request
+    def end_request_span(exc):
+        end_span(g.pop('trace_span', None), exc)
+
+
+# Waterfall CLI
+
+def load_traces(path):
+    traces = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                s = json.loads(line)
+                traces.setdefault(s['trace_id'], []).append(s)
+    return traces
+
+
+def waterfall(spans, width=50):
+    """Text waterfall of one trace: indented span names with offset bars"""
+    by_parent = {}
+    ids = {s['span_id'] for s in spans}
+    for s in spans:
+        parent = s['parent_id'] if s['parent_id'] in ids else None
+        by_parent.setdefault(parent, []).append(s)
+    roots = sorted(by_parent.get(None, []), key=lambda s: s['start'])
+    origin = min(s['start'] for s in spans)
+    total = max(s['start'] + s['duration_ms'] / 1000 for s in spans) - origin or 1e-9
+
+    lines = []
+
+    def walk(s, depth):
+        offset = int((s['start'] - origin) / total * width)
+        length = max(1, int(s['duration_ms'] / 1000 / total * width))
+        bar = ' ' * offset + '█' * min(length, width - offset)
+        label = ('  ' * depth + s['name'])[:40]
+        suffix = ' !' if s.get('error') else ''
+        lines.append(f"{label:40s} {s['duration_ms']:10.1f} ms |{bar:{width}s}|{suffix}")
+        for child in sorted(by_parent.get(s['span_id'], []), key=lambda c: c['start']):
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print waterfalls for the slowest recorded traces")
+    parser.add_argument('path', nargs='?', default=os.getenv('TRACE_EXPORT', 'traces.jsonl'))
+    parser.add_argument('--top', type=int, default=5, help="Number of traces to show")
+    parser.add_argument('--name', help="Only traces whose root span name contains this text")
+    args = parser.parse_args(argv)
+
+    ranked = []
+    for trace_id, spans in load_traces(args.path).items():
+        roots = [s for s in spans if s['parent_id'] is None]
+        if not roots or (args.name and args.name not in roots[0]['name']):
+            continue
+        ranked.append((roots[0]['duration_ms'], trace_id, roots[0]['name'], spans))
+    ranked.sort(reverse=True)
+
+    for duration, trace_id, name, spans in ranked[:args.top]:
+        print(f"\n{name}  ({duration:.1f} ms, trace {trace_id}, {len(spans)} spans)")
+        print(waterfall(spans))
+    if not ranked:
+        print("No traces found")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
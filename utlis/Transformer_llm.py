@@ -92,37 +92,41 @@ ff_dim = 128        # Feed-forward dimension
 num_layers = 4      # Number of transformer layers
 dropout_rate = 0.1  # Dropout rate
 
-# Instantiate the tokenizer and model
-tokenizer = Tokenizer(vocab_size)
-model = TransformerModel(vocab_size, max_len, embed_dim, num_heads, ff_dim, num_layers, dropout_rate)
-model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
-
 # Generate some dummy data for demonstration
 def generate_dummy_data(num_samples, max_len, vocab_size):
     texts = [' '.join(np.random.choice(vocab_size, max_len).astype(str)) for _ in range(num_samples)]
     labels = [' '.join(np.random.choice(vocab_size, max_len).astype(str)) for _ in range(num_samples)]
     return texts, labels
 
-num_samples = 1000
-texts, labels = generate_dummy_data(num_samples, max_len, vocab_size)
-
-# Prepare data
-tokenizer.fit_on_texts(texts)
-X_train = preprocess_data(texts, tokenizer, max_len)
-y_train = preprocess_data(labels, tokenizer, max_len)
-X_val, y_val = X_train[:num_samples // 10], y_train[:num_samples // 10]
-
-# Define callbacks
-early_stopping = EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True)
-checkpoint = ModelCheckpoint('transformer_model.h5', save_best_only=True, monitor='val_loss')
-custom_callback = CustomCallback()
-
-# Train the model
-history = model.fit(X_train, y_train, epochs=10, batch_size=64, validation_data=(X_val, y_val), callbacks=[early_stopping, checkpoint, custom_callback])
-
-# Evaluate the model
-eval_results = model.evaluate(X_val, y_val)
-print(f"Validation Loss: {eval_results[0]}")
-print(f"Validation Accuracy: {eval_results[1]}")
-
-# Load and use the model
+def train_demo(num_samples=1000):
+    """Build and train the model on dummy data; run this module as a script to call it"""
+    # Instantiate the tokenizer and model
+    tokenizer = Tokenizer(vocab_size)
+    model = TransformerModel(vocab_size, max_len, embed_dim, num_heads, ff_dim, num_layers, dropout_rate)
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+
+    texts, labels = generate_dummy_data(num_samples, max_len, vocab_size)
+
+    # Prepare data
+    tokenizer.fit_on_texts(texts)
+    X_train = preprocess_data(texts, tokenizer, max_len)
+    y_train = preprocess_data(labels, tokenizer, max_len)
+    X_val, y_val = X_train[:num_samples // 10], y_train[:num_samples // 10]
+
+    # Define callbacks
+    early_stopping = EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True)
+    checkpoint = ModelCheckpoint('transformer_model.h5', save_best_only=True, monitor='val_loss')
+    custom_callback = CustomCallback()
+
+    # Train the model
+    history = model.fit(X_train, y_train, epochs=10, batch_size=64, validation_data=(X_val, y_val), callbacks=[early_stopping, checkpoint, custom_callback])
+
+    # Evaluate the model
+    eval_results = model.evaluate(X_val, y_val)
+    print(f"Validation Loss: {eval_results[0]}")
+    print(f"Validation Accuracy: {eval_results[1]}")
+    return model, tokenizer, history
+
+# Training used to run at import time; it now only runs as a script
+if __name__ == '__main__':
+    train_demo()
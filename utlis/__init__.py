@@ -1,3 +1,16 @@
-from .model_utils import load_model, preprocess_data
+# Submodules load on first attribute access, so importing the package stays cheap
+_EXPORTS = {
+    'load_model': 'model_utils',
+    'preprocess_data': 'model_utils',
+    'add_missing_features': 'data_preprocessing'
+}
 
-from .data_preprocessing import add_missing_features
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+        value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = list(_EXPORTS)